@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class DiaryTodoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Diary_todo'
+
+    def ready(self):
+        from . import stats  # noqa: F401  (connects the DailyStats receivers)
+        from . import sync  # noqa: F401  (connects the Tombstone receivers)
+        from .search import ensure_search_index
+
+        post_migrate.connect(ensure_search_index, sender=self)
@@ -0,0 +1,177 @@
+"""
+Native async versions of the read-heavy endpoints, for ASGI deployments
+(``uvicorn my_day.asgi:application``).
+
+DRF's dispatch is sync only, so under ASGI every ``@api_view`` request is
+handed to a worker thread. These are plain Django async views using the
+async ORM and ``aauthenticate`` instead. Bodies, ETags and Link headers
+match the DRF views in ``views``.
+"""
+from datetime import datetime
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import NotFound
+
+from my_day.compression import compress_exempt
+from my_day.metrics import timed
+from my_day.renderers import ORJSONRenderer
+from user_authentication.tokens import aauthenticate
+from . import feed
+from .cache import acached_day_payload, aday_version, day_etag
+from .models import Diary, Todo
+from .pagination import KeysetPagination
+from .recurrence import aoccurrences_between
+from .serializer import DiarySerializer
+from .utils import day_bounds
+from .views import etag_matches, serialize_todos, with_day_todos, with_etag
+
+
+def json_response(data, status=200):
+    # Same bytes as the DRF views' renderer.
+    return HttpResponse(ORJSONRenderer().render(data), status=status, content_type="application/json")
+
+
+def page_response(data, next_link):
+    response = json_response({"results": data, "next": next_link})
+    if next_link:
+        response["Link"] = f'<{next_link}>; rel="next"'
+    return response
+
+
+def jwt_required(view=None, *, allow_query_token=False):
+    """Authenticate the request's bearer token and set ``request.user``, else 401."""
+    if view is None:
+        return lambda view: jwt_required(view, allow_query_token=allow_query_token)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user, error = await aauthenticate(request, allow_query_token)
+        if error:
+            response = json_response({"detail": error, "code": "token_not_valid"}, status=401)
+            response["WWW-Authenticate"] = 'Bearer realm="api"'
+            return response
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def not_modified(request, etag):
+    if etag_matches(request, etag):
+        return with_etag(HttpResponse(status=304), etag)
+    return None
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+@require_GET
+@jwt_required
+async def get_all_todos(request):
+    user = request.user
+    date_str = request.GET.get("date")
+
+    todos = Todo.objects.filter(user=user)
+
+    if date_str:
+        try:
+            selected_date = parse_date(date_str)
+        except ValueError:
+            return json_response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=400)
+        day_start, day_end = day_bounds(selected_date, user.get_timezone())
+        todos = todos.filter(start_time__gte=day_start, start_time__lt=day_end, recurrence__isnull=True)
+
+    paginator = KeysetPagination("start_time")
+
+    async def build_page():
+        occurrences = await aoccurrences_between(user, selected_date, selected_date) if date_str else ()
+        page = await paginator.apaginate_queryset(todos, request, occurrences)
+        return {"data": serialize_todos(page), "next": paginator.get_next_link()}
+
+    try:
+        if not date_str:
+            payload = await build_page()
+            return page_response(payload["data"], payload["next"])
+
+        cursor = request.GET.get(paginator.cursor_query_param)
+        variant = f"{paginator.get_page_size(request)}:{cursor or ''}"
+        version = await aday_version(user.id, selected_date)
+        etag = day_etag(user.id, selected_date, "todos", version, variant)
+        response = not_modified(request, etag)
+        if response:
+            return response
+
+        if cursor:
+            payload = await build_page()
+        else:
+            payload = await acached_day_payload(user.id, selected_date, "todos", build_page, variant, version)
+    except NotFound as e:
+        return json_response({"detail": str(e.detail)}, status=404)
+    return with_etag(page_response(payload["data"], payload["next"]), etag)
+
+
+@require_GET
+@jwt_required
+async def get_diary_by_date(request):
+    user = request.user
+    date_str = request.GET.get("date")
+    if date_str:
+        try:
+            selected_date = parse_date(date_str)
+        except ValueError:
+            return json_response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=400)
+    else:
+        selected_date = timezone.localdate(timezone=user.get_timezone())
+
+    async def build_payload():
+        diary = await Diary.objects.filter(user=user, pub_date=selected_date).afirst()
+        if diary:
+            return {"date": diary.pub_date, "content": diary.text, "version": diary.version, "status": "found"}
+        return {"date": selected_date, "content": "", "version": 0, "status": "not_found"}
+
+    version = await aday_version(user.id, selected_date)
+    etag = day_etag(user.id, selected_date, "diary", version)
+    response = not_modified(request, etag)
+    if response:
+        return response
+
+    payload = await acached_day_payload(user.id, selected_date, "diary", build_payload, version=version)
+    return with_etag(json_response(payload), etag)
+
+
+@require_GET
+@jwt_required
+async def user_diaries(request, user_id):
+    paginator = KeysetPagination("pub_date")
+    try:
+        diaries = await paginator.apaginate_queryset(with_day_todos(Diary.objects.filter(user_id=user_id)), request)
+    except NotFound as e:
+        return json_response({"detail": str(e.detail)}, status=404)
+    with timed("serializer"):
+        data = DiarySerializer(diaries, many=True).data
+    return page_response(data, paginator.get_next_link())
+
+
+@compress_exempt
+@require_GET
+@jwt_required(allow_query_token=True)
+async def change_feed(request):
+    """
+    Server-Sent Events announcing the user's writes (see ``feed``). Open it
+    with ``new EventSource(url + "?access_token=...")``; on each event, pull
+    the changes from ``/sync/``.
+    """
+    broker = feed.get_broker()
+    subscription = broker.subscribe(request.user.id)
+    response = StreamingHttpResponse(
+        feed.stream(subscription, broker, settings.CHANGE_FEED_HEARTBEAT_SECONDS),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
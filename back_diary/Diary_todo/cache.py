@@ -0,0 +1,127 @@
+"""
+Read-through cache for the per-day payloads behind the dashboard.
+
+Entries are keyed by ``(user_id, date)`` plus a version made of a per-user
+generation and a per-day counter. Writes never delete payloads, they bump the
+relevant version so stale entries simply stop being addressed and age out.
+Counters start from ``time.time_ns()`` so a version evicted from the cache
+can never come back with a value an old entry was stored under.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import feed
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _timeout():
+    return getattr(settings, "DAY_CACHE_TIMEOUT", 300)
+
+
+def _user_key(user_id):
+    return f"day:{user_id}:generation"
+
+
+def _day_key(user_id, day):
+    return f"day:{user_id}:{day}:version"
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def day_version(user_id, day):
+    """Return the current version string of ``user_id``'s data for ``day``."""
+    keys = [_user_key(user_id), _day_key(user_id, day)]
+    found = cache.get_many(keys)
+    parts = []
+    for key in keys:
+        value = found.get(key)
+        if value is None:
+            cache.add(key, time.time_ns(), timeout=None)
+            value = cache.get(key)
+        parts.append(value)
+    return "%s.%s" % tuple(parts)
+
+
+async def aday_version(user_id, day):
+    """Async ``day_version``."""
+    keys = [_user_key(user_id), _day_key(user_id, day)]
+    found = await cache.aget_many(keys)
+    parts = []
+    for key in keys:
+        value = found.get(key)
+        if value is None:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+            value = await cache.aget(key)
+        parts.append(value)
+    return "%s.%s" % tuple(parts)
+
+
+def invalidate_day(user_id, day):
+    """Call after any write touching ``user_id``'s data on ``day``; also tells its change feed."""
+    _bump(_day_key(user_id, day))
+    event = {"type": "day", "date": str(day)}
+    transaction.on_commit(lambda: feed.publish(user_id, event))
+
+
+def invalidate_user(user_id):
+    """Call after a write that shifts every day at once (e.g. a timezone change)."""
+    _bump(_user_key(user_id))
+    transaction.on_commit(lambda: feed.publish(user_id, {"type": "user"}))
+
+
+def day_etag(user_id, day, kind, version, variant=""):
+    """Strong ETag for a day payload; it changes whenever the day's version does."""
+    return f'"{kind}-{user_id}-{day}-{version}-{variant}"'
+
+
+def cached_day_payload(user_id, day, kind, build, variant="", version=None):
+    """Return the cached ``kind`` payload for the day, building it on a miss."""
+    if version is None:
+        version = day_version(user_id, day)
+    key = f"day:{user_id}:{day}:{kind}:{variant}:{version}"
+    payload = cache.get(key)
+    if payload is not None:
+        _record("hits")
+        return payload
+    _record("misses")
+    payload = build()
+    cache.set(key, payload, timeout=_timeout())
+    return payload
+
+
+async def acached_day_payload(user_id, day, kind, build, variant="", version=None):
+    """Async ``cached_day_payload``; ``build`` is a coroutine function."""
+    if version is None:
+        version = await aday_version(user_id, day)
+    key = f"day:{user_id}:{day}:{kind}:{variant}:{version}"
+    payload = await cache.aget(key)
+    if payload is not None:
+        _record("hits")
+        return payload
+    _record("misses")
+    payload = await build()
+    await cache.aset(key, payload, timeout=_timeout())
+    return payload
+
+
+def _record(counter):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def stats():
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_ratio": round(hits / total, 4) if total else 0.0}
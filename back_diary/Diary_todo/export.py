@@ -0,0 +1,125 @@
+"""
+Streaming export of one user's diaries and todos.
+
+Rows are read with ``.iterator(chunk_size=...)`` as plain tuples and encoded
+straight into byte chunks, so memory stays flat however long the history is.
+The NDJSON format starts with an ``export`` header line followed by one
+``diary`` or ``todo`` object per line, which is also what the importer reads.
+"""
+import csv
+import io
+import zipfile
+from itertools import chain
+
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Diary, Todo
+
+EXPORT_VERSION = 1
+CHUNK_SIZE = 2000
+FLUSH_BYTES = 64 * 1024
+
+CSV_COLUMNS = ["type", "date", "text", "id", "title", "description", "start_time", "end_time", "status", "recurrence"]
+RECURRENCE_FIELDS = ["frequency", "interval", "weekdays", "until", "count"]
+
+
+def header(user):
+    return {
+        "type": "export",
+        "version": EXPORT_VERSION,
+        "username": user.username,
+        "timezone": user.timezone,
+        "exported_at": timezone.now(),
+    }
+
+
+def records(user, chunk_size=CHUNK_SIZE):
+    """Yield the user's diaries, then todos, as export dicts."""
+    diaries = Diary.objects.filter(user=user).order_by("pub_date").values_list("pub_date", "text")
+    for pub_date, text in diaries.iterator(chunk_size=chunk_size):
+        yield {"type": "diary", "date": pub_date, "text": text}
+
+    todos = (
+        Todo.objects.filter(user=user).order_by("start_time", "id")
+        .values_list(
+            "id", "title", "description", "start_time", "end_time", "status",
+            "recurrence__id", *(f"recurrence__{field}" for field in RECURRENCE_FIELDS),
+        )
+    )
+    for pk, title, description, start_time, end_time, status, rule_id, *rule in todos.iterator(chunk_size=chunk_size):
+        yield {
+            "type": "todo", "id": pk, "title": title, "description": description,
+            "start_time": start_time, "end_time": end_time, "status": status,
+            "recurrence": dict(zip(RECURRENCE_FIELDS, rule)) if rule_id else None,
+        }
+
+
+def _buffered(pieces):
+    """Join small str pieces into ~FLUSH_BYTES byte chunks."""
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= FLUSH_BYTES:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def ndjson_chunks(user):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    yield from _buffered(encoder.encode(record) + "\n" for record in chain([header(user)], records(user)))
+
+
+def csv_chunks(user):
+    encoder = JSONEncoder(separators=(",", ":"))
+    line = io.StringIO()
+    writer = csv.DictWriter(line, CSV_COLUMNS, extrasaction="ignore")
+
+    def rows():
+        writer.writeheader()
+        for record in records(user):
+            if record["type"] == "todo":
+                record["start_time"] = encoder.default(record["start_time"])
+                record["end_time"] = encoder.default(record["end_time"])
+                record["recurrence"] = encoder.encode(record["recurrence"]) if record["recurrence"] else ""
+            writer.writerow(record)
+            yield line.getvalue()
+            line.seek(0)
+            line.truncate()
+        yield line.getvalue()
+
+    yield from _buffered(rows())
+
+
+class _Sink:
+    """Write-only file object that ``zipfile`` writes into and the stream drains."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def zipped(chunks, filename):
+    """Compress ``chunks`` into a single-entry zip archive, streamed as it is built."""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(filename, "w", force_zip64=True) as entry:
+            for chunk in chunks:
+                entry.write(chunk)
+                if sink.buffer:
+                    yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,193 @@
+"""
+Per-user change feed for open tabs and devices, served as Server-Sent Events.
+
+Every write already ends in ``cache.invalidate_day``/``invalidate_user``;
+those publish a small event once the transaction commits::
+
+    {"type": "day", "date": "2025-03-10"}   one day changed
+    {"type": "user"}                        everything may have changed
+    {"type": "resync"}                      events were dropped, see below
+
+Events only say *what* changed. Clients fetch the data itself with
+``/sync/`` (or the day endpoints), so a missed event costs a refetch rather
+than a wrong replica.
+
+``LocalBroker`` fans events out to the subscribers of this process; point
+``CHANGE_FEED_BROKER`` at ``RedisBroker`` when several workers serve the
+feed. Each subscriber holds at most ``CHANGE_FEED_QUEUE_SIZE`` undelivered
+events. A client that stops reading (the ASGI server stops pulling once the
+socket buffer is full) has its queue replaced by a single ``resync`` event
+instead of growing without bound. An idle stream gets a comment line every
+``CHANGE_FEED_HEARTBEAT_SECONDS`` so proxies keep it open.
+"""
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+
+import orjson
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+RESYNC = {"type": "resync"}
+
+
+class Subscription:
+    """One open stream: a bounded queue of events, woken from any thread."""
+    __slots__ = ("user_id", "loop", "maxsize", "events", "waiter")
+
+    def __init__(self, user_id, loop, maxsize):
+        self.user_id = user_id
+        self.loop = loop
+        self.maxsize = maxsize
+        self.events = deque()
+        self.waiter = None
+
+    def put(self, event):
+        """Queue ``event``; runs on the subscriber's loop."""
+        if event in self.events:
+            return
+        if len(self.events) >= self.maxsize:
+            self.events.clear()
+            event = RESYNC
+        self.events.append(event)
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    async def get(self, timeout):
+        """Every queued event, or an empty list after ``timeout`` seconds without one."""
+        if not self.events:
+            self.waiter = self.loop.create_future()
+            try:
+                await asyncio.wait_for(self.waiter, timeout)
+            except asyncio.TimeoutError:
+                return []
+            finally:
+                self.waiter = None
+        events = list(self.events)
+        self.events.clear()
+        return events
+
+
+class Broker(ABC):
+    """Subscribers of this process, keyed by user id."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Register a stream for ``user_id``; call from the event loop that will read it."""
+        subscription = Subscription(user_id, asyncio.get_running_loop(), settings.CHANGE_FEED_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    @abstractmethod
+    def publish(self, user_id, event):
+        """Send ``event`` to ``user_id``'s streams; safe to call from any thread."""
+
+    def deliver(self, user_id, event):
+        """Hand ``event`` to this process's subscribers of ``user_id``."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:  # the subscriber's loop has been closed
+                self.unsubscribe(subscription)
+
+
+class LocalBroker(Broker):
+    """In-process fan-out; enough for a single ASGI worker."""
+
+    def publish(self, user_id, event):
+        self.deliver(user_id, event)
+
+
+class RedisBroker(Broker):
+    """
+    Fan-out across workers through Redis pub/sub (needs ``redis``). Events go
+    to the ``CHANGE_FEED_REDIS_URL`` server, and one listener thread per
+    process delivers them to its own subscribers.
+    """
+    channel_prefix = "my_day:feed:"
+
+    def __init__(self):
+        import redis
+
+        super().__init__()
+        self.client = redis.Redis.from_url(settings.CHANGE_FEED_REDIS_URL)
+        self._listener = None
+
+    def subscribe(self, user_id):
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(target=self._listen, name="change-feed", daemon=True)
+                    self._listener.start()
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, event):
+        self.client.publish(f"{self.channel_prefix}{user_id}", orjson.dumps(event))
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(f"{self.channel_prefix}*")
+        for message in pubsub.listen():
+            try:
+                user_id = int(message["channel"].decode().removeprefix(self.channel_prefix))
+                self.deliver(user_id, orjson.loads(message["data"]))
+            except (ValueError, orjson.JSONDecodeError):
+                logger.warning("ignored malformed change feed message on %s", message["channel"])
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.CHANGE_FEED_BROKER)()
+    return _broker
+
+
+def publish(user_id, event):
+    try:
+        get_broker().publish(user_id, event)
+    except Exception:
+        # A feed outage must not fail the write that triggered it.
+        logger.exception("change feed publish failed")
+
+
+def encode(event):
+    return b"data: " + orjson.dumps(event) + b"\n\n"
+
+
+async def stream(subscription, broker, heartbeat):
+    """The SSE body of ``subscription``; unsubscribes when the client goes away."""
+    try:
+        yield b"retry: %d\n\n" % settings.CHANGE_FEED_RETRY_MS
+        while True:
+            events = await subscription.get(heartbeat)
+            yield b"".join(map(encode, events)) if events else b": ping\n\n"
+    finally:
+        broker.unsubscribe(subscription)
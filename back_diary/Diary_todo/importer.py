@@ -0,0 +1,378 @@
+"""
+Bulk import of diaries and todos from NDJSON (the ``export`` format) or
+iCalendar (each VEVENT becomes a todo).
+
+Input is parsed line by line and written ``chunk_size`` records at a time,
+each chunk in its own transaction: diaries as one upsert on
+``(user, pub_date)``, todos as one ``bulk_create``. Todos already present
+with the same title and times are skipped, so re-running an import is
+harmless. A bad record is reported with its line number and skipped; it
+never aborts the rest of the file. Bytes that are not UTF-8 do: everything
+before them is kept, and the report says where the import stopped.
+"""
+import json
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .cache import invalidate_day, invalidate_user
+from .models import Diary, RecurrenceRule, Todo
+from .serializer import RecurrenceRuleSerializer
+from . import stats as daily_stats
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+TODO_STATUSES = {value for value, _ in Todo.STATUS_CHOICES}
+TITLE_MAX_LENGTH = Todo._meta.get_field("title").max_length
+
+
+class InvalidRecord(ValueError):
+    """A record that cannot be imported; the message is reported to the user."""
+
+
+class ImportReport:
+    def __init__(self):
+        self.diaries = 0
+        self.todos = 0
+        self.skipped = 0
+        self.errors = []
+        self.error_count = 0
+        # Why the import stopped before the end of the file, if it did.
+        self.aborted = None
+        self.started = time.perf_counter()
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self):
+        seconds = time.perf_counter() - self.started
+        rows = self.diaries + self.todos + self.skipped + self.error_count
+        return {
+            "diaries": self.diaries,
+            "todos": self.todos,
+            "skipped": self.skipped,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "aborted": self.aborted,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+        }
+
+
+# ------------------------------ NDJSON ------------------------------------
+
+def parse_ndjson(lines):
+    """Yield ``(line_number, record or InvalidRecord)`` from NDJSON ``lines`` (str or bytes)."""
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, InvalidRecord(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(record, dict):
+            yield number, InvalidRecord("Each line must be a JSON object.")
+        elif record.get("type") != "export":
+            yield number, record
+
+
+# ------------------------------ iCalendar ---------------------------------
+
+ICS_WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+
+
+def _unfold(lines):
+    """Join RFC 5545 folded lines, yielding ``(line_number, logical_line)``."""
+    pending, pending_number = None, 0
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending_number, pending
+        pending, pending_number = line, number
+    if pending is not None:
+        yield pending_number, pending
+
+
+def _ics_text(value):
+    return (
+        value.replace("\\n", "\n").replace("\\N", "\n")
+        .replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+    )
+
+
+def _ics_datetime(value, params, tz):
+    """Return ``(aware datetime, all_day)`` for a DTSTART/DTEND value."""
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        day = datetime.strptime(value, "%Y%m%d")
+        return timezone.make_aware(day, tz), True
+    if value.endswith("Z"):
+        return datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=ZoneInfo("UTC")), False
+    if "TZID" in params:
+        try:
+            tz = ZoneInfo(params["TZID"])
+        except (ZoneInfoNotFoundError, ValueError):
+            raise InvalidRecord(f"Unknown TZID {params['TZID']!r}.")
+    return timezone.make_aware(datetime.strptime(value, "%Y%m%dT%H%M%S"), tz), False
+
+
+def _ics_duration(value):
+    sign = -1 if value.startswith("-") else 1
+    value = value.lstrip("+-")
+    if not value.startswith("P"):
+        raise InvalidRecord(f"Invalid DURATION {value!r}.")
+    total, number, in_time = timedelta(), "", False
+    units = {"W": timedelta(weeks=1), "D": timedelta(days=1)}
+    time_units = {"H": timedelta(hours=1), "M": timedelta(minutes=1), "S": timedelta(seconds=1)}
+    for char in value[1:]:
+        if char == "T":
+            in_time = True
+        elif char.isdigit():
+            number += char
+        else:
+            unit = (time_units if in_time else units).get(char)
+            if unit is None or not number:
+                raise InvalidRecord(f"Invalid DURATION {value!r}.")
+            total += int(number) * unit
+            number = ""
+    return sign * total
+
+
+def _ics_rrule(value):
+    parts = dict(part.split("=", 1) for part in value.split(";") if "=" in part)
+    frequency = parts.get("FREQ", "").lower()
+    if frequency not in ("daily", "weekly"):
+        raise InvalidRecord(f"Unsupported RRULE frequency {parts.get('FREQ')!r}.")
+    rule = {"frequency": frequency, "interval": int(parts.get("INTERVAL", 1))}
+    if "BYDAY" in parts:
+        rule["weekdays"] = sorted(ICS_WEEKDAYS[day[-2:]] for day in parts["BYDAY"].split(","))
+    if "UNTIL" in parts:
+        rule["until"] = datetime.strptime(parts["UNTIL"][:8], "%Y%m%d").date().isoformat()
+    if "COUNT" in parts:
+        rule["count"] = int(parts["COUNT"])
+    return rule
+
+
+def _ics_event(props, tz):
+    if "DTSTART" not in props:
+        raise InvalidRecord("VEVENT without DTSTART.")
+    start, all_day = _ics_datetime(*props["DTSTART"], tz)
+    if "DTEND" in props:
+        end, _ = _ics_datetime(*props["DTEND"], tz)
+    elif "DURATION" in props:
+        end = start + _ics_duration(props["DURATION"][0])
+    else:
+        end = start + (timedelta(days=1) if all_day else timedelta(minutes=30))
+    status = props.get("STATUS", ("",))[0].upper()
+    if status == "CANCELLED":
+        return None
+    return {
+        "type": "todo",
+        "title": _ics_text(props.get("SUMMARY", ("Untitled",))[0]),
+        "description": _ics_text(props.get("DESCRIPTION", ("",))[0]),
+        "start_time": start,
+        "end_time": end,
+        "status": "completed" if status == "COMPLETED" else "not_started",
+        "recurrence": _ics_rrule(props["RRULE"][0]) if "RRULE" in props else None,
+    }
+
+
+def parse_ics(lines, tz):
+    """Yield ``(line_number, todo record or InvalidRecord)`` for each VEVENT."""
+    props, started_at = None, 0
+    for number, line in _unfold(lines):
+        if line == "BEGIN:VEVENT":
+            props, started_at = {}, number
+        elif line == "END:VEVENT" and props is not None:
+            try:
+                record = _ics_event(props, tz)
+            except (InvalidRecord, ValueError, KeyError) as e:
+                record = e if isinstance(e, InvalidRecord) else InvalidRecord(f"Invalid VEVENT: {e}")
+            if record is not None:
+                yield started_at, record
+            props = None
+        elif props is not None and ":" in line:
+            name_and_params, value = line.split(":", 1)
+            name, *params = name_and_params.split(";")
+            props.setdefault(name.upper(), (value, dict(p.split("=", 1) for p in params if "=" in p)))
+
+
+# ------------------------------ writing -----------------------------------
+
+def _as_datetime(value, tz):
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = parse_datetime(str(value)) if value else None
+    if parsed is None:
+        raise InvalidRecord(f"Invalid datetime {value!r}.")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed, tz)
+
+
+def _as_date(value):
+    parsed = value if isinstance(value, date) else parse_date(str(value or ""))
+    if parsed is None:
+        raise InvalidRecord(f"Invalid date {value!r}. Use YYYY-MM-DD.")
+    return parsed
+
+
+def _build(user, record, tz):
+    """Validate one record into an unsaved Diary, or a (Todo, rule data) pair."""
+    kind = record.get("type")
+    if kind == "diary":
+        text = record.get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise InvalidRecord("Diary text is required.")
+        return Diary(user=user, pub_date=_as_date(record.get("date")), text=text)
+    if kind != "todo":
+        raise InvalidRecord(f"Unknown record type {kind!r}.")
+
+    title = record.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise InvalidRecord("Todo title is required.")
+    if len(title) > TITLE_MAX_LENGTH:
+        raise InvalidRecord(f"Todo title is longer than {TITLE_MAX_LENGTH} characters.")
+    start = _as_datetime(record.get("start_time"), tz)
+    end = _as_datetime(record.get("end_time"), tz)
+    if start >= end:
+        raise InvalidRecord("Start time must be before end time")
+    status = record.get("status") or "not_started"
+    if status not in TODO_STATUSES:
+        raise InvalidRecord(f"Invalid status {status!r}.")
+    todo = Todo(
+        user=user, title=title, description=record.get("description") or "",
+        start_time=start, end_time=end, status=status, day=Todo.local_day(start, user),
+    )
+    return todo, record.get("recurrence")
+
+
+def _first_error(errors):
+    """``"field: message"`` for the first of a serializer's (possibly nested) errors."""
+    if isinstance(errors, dict):
+        field, nested = next(iter(errors.items()))
+        message = _first_error(nested)
+        return message if isinstance(field, int) else f"{field}: {message}"
+    return _first_error(errors[0]) if isinstance(errors, list) else str(errors)
+
+
+def _rule(todo, data):
+    """A RecurrenceRule for ``todo``, validated like ``add_todo``'s ``recurrence``."""
+    if not isinstance(data, dict):
+        raise InvalidRecord("Invalid recurrence.")
+    serializer = RecurrenceRuleSerializer(data=data)
+    if not serializer.is_valid():
+        raise InvalidRecord(f"Invalid recurrence {_first_error(serializer.errors)}")
+    return RecurrenceRule(todo=todo, **serializer.validated_data)
+
+
+def _write_chunk(user, chunk, report):
+    diaries, todos = {}, []
+    for number, built in chunk:
+        if isinstance(built, Diary):
+            diaries[built.pub_date] = built  # last entry for a day wins
+        else:
+            todos.append((number, built))
+
+    existing = set()
+    if todos:
+        starts = {todo.start_time for _, (todo, _) in todos}
+        existing = set(
+            Todo.objects.filter(user=user, start_time__in=starts).values_list("title", "start_time", "end_time")
+        )
+
+    new_todos, rules = [], []
+    for number, (todo, recurrence) in todos:
+        key = (todo.title, todo.start_time, todo.end_time)
+        if key in existing:
+            report.skipped += 1
+            continue
+        if recurrence:
+            try:
+                rules.append(_rule(todo, recurrence))
+            except (InvalidRecord, TypeError, ValueError) as e:
+                report.error(number, str(e))
+                continue
+        existing.add(key)
+        new_todos.append(todo)
+
+    with transaction.atomic(), daily_stats.batched():
+        Diary.objects.bulk_create(
+            diaries.values(), update_conflicts=True, unique_fields=["user", "pub_date"], update_fields=["text", "updated_at"],
+        )
+        # The upsert cannot increment in SQL; bump the versions so pending patches 409.
+        Diary.objects.filter(user=user, pub_date__in=diaries).update(version=F("version") + 1)
+        Todo.objects.bulk_create(new_todos)
+        RecurrenceRule.objects.bulk_create(rules)
+        touched = set(diaries) | {todo.day for todo in new_todos}
+        daily_stats.refresh_days(user.id, touched)
+    if rules:
+        # Recurring todos appear on days other than their own.
+        invalidate_user(user.id)
+    else:
+        for day in touched:
+            invalidate_day(user.id, day)
+
+    report.diaries += len(diaries)
+    report.todos += len(new_todos)
+
+
+def import_records(user, records, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Import ``(line_number, record)`` pairs from ``parse_ndjson``/``parse_ics``.
+    ``progress(report)`` is called after every chunk.
+    """
+    tz = user.get_timezone()
+    report = ImportReport()
+    chunk, last = [], 0
+    try:
+        for number, record in records:
+            last = number
+            if isinstance(record, InvalidRecord):
+                report.error(number, str(record))
+                continue
+            try:
+                chunk.append((number, _build(user, record, tz)))
+            except (InvalidRecord, TypeError, ValueError) as e:
+                report.error(number, str(e))
+                continue
+            if len(chunk) >= chunk_size:
+                _write_chunk(user, chunk, report)
+                chunk = []
+                if progress:
+                    progress(report)
+    except UnicodeDecodeError:
+        # Earlier chunks are committed already; finish the lines read so far
+        # so the report describes exactly what was imported.
+        report.aborted = f"The file is not valid UTF-8 after line {last}; the rest was not imported."
+    if chunk:
+        _write_chunk(user, chunk, report)
+        if progress:
+            progress(report)
+    return report
+
+
+def parse(stream, fmt, user):
+    """Records of an uploaded file; ``fmt`` is ``"ndjson"`` or ``"ics"``."""
+    if fmt == "ics":
+        return parse_ics(stream, user.get_timezone())
+    return parse_ndjson(stream)
+
+
+def detect_format(filename, requested=None):
+    if requested:
+        return requested
+    return "ics" if str(filename).lower().endswith((".ics", ".ical", ".ifb")) else "ndjson"
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from user_authentication.models import User
+from Diary_todo.stats import backfill
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyStats rollup from existing todos and diaries, a chunk of users at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500, help="Users per transaction.")
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Only these user ids.")
+
+    def handle(self, *args, chunk_size, users, **options):
+        user_ids = users or User.objects.order_by("id").values_list("id", flat=True)
+        done = rows = 0
+        for chunk_users, chunk_rows in backfill(user_ids, chunk_size=chunk_size):
+            done += chunk_users
+            rows += chunk_rows
+            self.stdout.write(f"{done} users, {rows} day rows")
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {rows} day rows for {done} users."))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from user_authentication.models import User
+from Diary_todo import importer
+
+
+class Command(BaseCommand):
+    help = "Import diaries and todos for one user from an NDJSON export or an iCalendar file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("user", help="Email or username of the owner.")
+        parser.add_argument("path")
+        parser.add_argument("--input", dest="fmt", choices=["ndjson", "ics"], help="Defaults to the file extension.")
+        parser.add_argument("--chunk-size", type=int, default=importer.CHUNK_SIZE)
+
+    def handle(self, *args, user, path, fmt, chunk_size, **options):
+        try:
+            owner = User.objects.get(Q(email=user) | Q(username=user))
+        except User.DoesNotExist:
+            raise CommandError(f"No user {user!r}.")
+
+        def progress(report):
+            done = report.diaries + report.todos + report.skipped + report.error_count
+            self.stdout.write(f"{done} rows ({report.error_count} errors)")
+
+        with open(path, "rb") as stream:
+            records = importer.parse(stream, importer.detect_format(path, fmt), owner)
+            result = importer.import_records(owner, records, chunk_size=chunk_size, progress=progress).as_dict()
+
+        for error in result["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['diaries']} diaries and {result['todos']} todos, skipped {result['skipped']} "
+            f"existing, {result['error_count']} errors in {result['seconds']}s ({result['rows_per_sec']} rows/s)."
+        ))
+        if result["aborted"]:
+            raise CommandError(result["aborted"])
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from Diary_todo.reminders import BATCH_SIZE, REFILL_INTERVAL, ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = "Email reminders for todos that are about to start. Runs until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Send what is due now and exit (e.g. from cron).")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Pending todos held in memory.")
+        parser.add_argument(
+            "--refill-seconds", type=float, default=REFILL_INTERVAL.total_seconds(),
+            help="How often new and moved todos are picked up.",
+        )
+
+    def handle(self, *args, once, batch_size, refill_seconds, **options):
+        scheduler = ReminderScheduler(batch_size=batch_size, refill_interval=timedelta(seconds=refill_seconds))
+        try:
+            scheduler.run(once=once)
+        except KeyboardInterrupt:
+            pass
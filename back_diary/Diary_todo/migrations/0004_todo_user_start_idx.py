@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Diary_todo', '0003_alter_todo_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='diary',
+            name='pub_date',
+            field=models.DateField(),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['user', 'start_time'], name='todo_user_start_idx'),
+        ),
+    ]
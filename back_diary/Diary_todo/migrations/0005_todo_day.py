@@ -0,0 +1,58 @@
+import django.db.models.deletion
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_day(apps, schema_editor):
+    Todo = apps.get_model("Diary_todo", "Todo")
+    zones = {}
+    batch = []
+    for todo in Todo.objects.select_related("user").only("start_time", "user__timezone").iterator(chunk_size=2000):
+        name = todo.user.timezone
+        if name not in zones:
+            try:
+                zones[name] = ZoneInfo(name)
+            except (ZoneInfoNotFoundError, ValueError):
+                zones[name] = ZoneInfo(settings.TIME_ZONE)
+        todo.day = timezone.localtime(todo.start_time, zones[name]).date()
+        batch.append(todo)
+        if len(batch) >= 2000:
+            Todo.objects.bulk_update(batch, ["day"])
+            batch = []
+    if batch:
+        Todo.objects.bulk_update(batch, ["day"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Diary_todo', '0004_todo_user_start_idx'),
+        ('user_authentication', '0002_user_timezone'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='day',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_day, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='todo',
+            name='day',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='diary',
+            field=models.ForeignObject(from_fields=['user', 'day'], on_delete=django.db.models.deletion.DO_NOTHING, related_name='todos', to='Diary_todo.diary', to_fields=['user', 'pub_date']),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['user', 'day'], name='todo_user_day_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Diary_todo', '0005_todo_day'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['user', 'end_time'], name='todo_user_end_idx'),
+        ),
+    ]
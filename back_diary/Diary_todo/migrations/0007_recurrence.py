@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Diary_todo', '0006_todo_user_end_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurrenceRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly')], max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1)),
+                ('weekdays', models.JSONField(blank=True, default=list)),
+                ('until', models.DateField(blank=True, null=True)),
+                ('count', models.PositiveIntegerField(blank=True, null=True)),
+                ('todo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recurrence', to='Diary_todo.todo')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecurrenceOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('occurrence', models.DateField()),
+                ('status', models.CharField(blank=True, choices=[('not_started', 'Not Started'), ('completed', 'Completed')])),
+                ('cancelled', models.BooleanField(default=False)),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='overrides', to='Diary_todo.recurrencerule')),
+            ],
+            options={
+                'unique_together': {('rule', 'occurrence')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_started(apps, schema_editor):
+    # Todos that already started get no reminder when the worker first runs.
+    Todo = apps.get_model("Diary_todo", "Todo")
+    Todo.objects.filter(start_time__lte=timezone.now()).update(reminded=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Diary_todo', '0009_daily_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='reminded',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_started, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('reminded', False)), fields=['start_time'], name='todo_reminder_due_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Diary_todo', '0011_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diary',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -1,18 +1,36 @@
 from user_authentication.models import User
 from django.db import models
+from django.utils import timezone
 
 
 class Diary(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="diaries")
     pub_date = models.DateField()  
     text = models.TextField()  
+    updated_at = models.DateTimeField(auto_now=True)
+    # Incremented by every write; patch_diary applies edits only on top of
+    # the version they were made against.
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     class Meta:
         unique_together = ("user", "pub_date")
+        indexes = [
+            models.Index(fields=["user", "updated_at"], name="diary_user_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.pub_date.strftime('%Y-%m-%d')}"
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            # Incremented in SQL so concurrent saves never share a version;
+            # refresh_from_db(fields=["version"]) to read the new one.
+            self.version = models.F("version") + 1
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "version"}
+        super().save(*args, **kwargs)
+
 
 class Todo(models.Model):
     STATUS_CHOICES = [
@@ -27,6 +45,133 @@ class Todo(models.Model):
     end_time = models.DateTimeField()
     status = models.CharField(choices=STATUS_CHOICES, default="not_started"
     )
+    # Local date of start_time in the owner's timezone. Together with user it
+    # links the todo to that day's diary entry through ``diary`` below.
+    day = models.DateField(editable=False)
+    diary = models.ForeignObject(
+        Diary,
+        on_delete=models.DO_NOTHING,
+        from_fields=["user", "day"],
+        to_fields=["user", "pub_date"],
+        related_name="todos",
+    )
+    # Set once the reminder worker has handled this start_time; moving the
+    # todo clears it. Only the pending rows are in todo_reminder_due_idx.
+    reminded = models.BooleanField(default=False, editable=False)
+    # Bumped by every write a client can see, including the series' recurrence
+    # overrides; ``sync`` pages on (user, updated_at). Bulk paths set it themselves.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "start_time"], name="todo_user_start_idx"),
+            models.Index(fields=["user", "day"], name="todo_user_day_idx"),
+            models.Index(fields=["user", "end_time"], name="todo_user_end_idx"),
+            models.Index(
+                fields=["start_time"], condition=models.Q(reminded=False), name="todo_reminder_due_idx",
+            ),
+            models.Index(fields=["user", "updated_at"], name="todo_user_updated_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The day as stored, so a write that moves the todo can refresh both days.
+        instance._stored_day = instance.__dict__.get("day")
+        instance._stored_start = instance.__dict__.get("start_time")
+        return instance
+
+    @staticmethod
+    def local_day(start_time, user):
+        return timezone.localtime(start_time, user.get_timezone()).date()
+
+    def save(self, *args, **kwargs):
+        self.day = self.local_day(self.start_time, self.user)
+        if self.start_time != getattr(self, "_stored_start", self.start_time):
+            self.reminded = False
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = {*update_fields, "updated_at"}
+            if "start_time" in update_fields:
+                update_fields |= {"day", "reminded"}
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+        self._stored_start = self.start_time
 
     def __str__(self):
         return f"{self.title} [{self.get_status_display()}]"
+
+
+class RecurrenceRule(models.Model):
+    """
+    Repeats a todo (its time of day and duration) without materialising rows.
+    Occurrences are expanded on read, only for the window being requested.
+    """
+    FREQUENCY_CHOICES = [
+        ("daily", "Daily"),
+        ("weekly", "Weekly"),
+    ]
+
+    todo = models.OneToOneField(Todo, on_delete=models.CASCADE, related_name="recurrence")
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES)
+    interval = models.PositiveSmallIntegerField(default=1)
+    # Weekday numbers (Monday=0) for weekly rules; empty means the start weekday.
+    weekdays = models.JSONField(default=list, blank=True)
+    until = models.DateField(null=True, blank=True)
+    count = models.PositiveIntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.todo.title} ({self.get_frequency_display()})"
+
+
+class RecurrenceOverride(models.Model):
+    """Sparse per-occurrence state: a status change or a cancelled occurrence."""
+    rule = models.ForeignKey(RecurrenceRule, on_delete=models.CASCADE, related_name="overrides")
+    occurrence = models.DateField()
+    status = models.CharField(choices=Todo.STATUS_CHOICES, blank=True)
+    cancelled = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ("rule", "occurrence")
+
+
+class DailyStats(models.Model):
+    """
+    Per-user, per-day rollup of todos and diary writing for the dashboard.
+    Recomputed for the touched days on every todo/diary write (see ``stats``),
+    so reading N days of statistics reads N rows. Recurring todos count once,
+    on the day their series starts.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="daily_stats")
+    day = models.DateField()
+    todos_planned = models.PositiveIntegerField(default=0)
+    todos_completed = models.PositiveIntegerField(default=0)
+    scheduled_minutes = models.PositiveIntegerField(default=0)
+    diary_words = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "day")
+
+    def __str__(self):
+        return f"{self.user_id} {self.day}: {self.todos_completed}/{self.todos_planned}"
+
+
+class Tombstone(models.Model):
+    """A deleted todo or diary, kept so ``sync`` can tell clients to drop their copy."""
+    KIND_CHOICES = [
+        ("todo", "Todo"),
+        ("diary", "Diary"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="tombstones")
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "deleted_at"], name="tombstone_user_deleted_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
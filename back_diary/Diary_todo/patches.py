@@ -0,0 +1,49 @@
+"""
+Character-range edits for diary autosave.
+
+A patch is a list of ``{"start", "end", "text"}`` ops, each replacing
+``text[start:end]`` of the *base* document, in ascending, non-overlapping
+order. Offsets count UTF-16 code units, as JavaScript string indices do, so
+a browser editor can send its selection offsets as they are.
+"""
+MAX_OPS = 1000
+
+
+class InvalidPatch(ValueError):
+    pass
+
+
+def _offset(op, key):
+    value = op.get(key)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise InvalidPatch(f"{key} must be a non-negative integer.")
+    return value
+
+
+def apply_ops(text, ops):
+    """``text`` with ``ops`` applied; ``InvalidPatch`` if they do not fit it."""
+    if not isinstance(ops, list):
+        raise InvalidPatch("ops must be a list.")
+    if len(ops) > MAX_OPS:
+        raise InvalidPatch(f"At most {MAX_OPS} ops per patch.")
+
+    base = text.encode("utf-16-le")
+    length = len(base) // 2
+    pieces, position = [], 0
+    for op in ops:
+        if not isinstance(op, dict):
+            raise InvalidPatch("Each op must be an object.")
+        start, end = _offset(op, "start"), _offset(op, "end")
+        insert = op.get("text", "")
+        if not isinstance(insert, str):
+            raise InvalidPatch("text must be a string.")
+        if not position <= start <= end <= length:
+            raise InvalidPatch("Ops must be in order, must not overlap and must lie within the base text.")
+        pieces += [base[2 * position:2 * start], insert.encode("utf-16-le", "surrogatepass")]
+        position = end
+    pieces.append(base[2 * position:])
+
+    try:
+        return b"".join(pieces).decode("utf-16-le")
+    except UnicodeDecodeError:
+        raise InvalidPatch("An op splits a surrogate pair.")
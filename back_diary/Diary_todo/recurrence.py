@@ -0,0 +1,128 @@
+"""
+Lazy expansion of recurring todos.
+
+A recurring todo is stored once (the master ``Todo`` plus its
+``RecurrenceRule``); occurrences only exist as unsaved ``Todo`` instances
+built for the window a view asks for, so the work per request is bounded by
+the window length rather than by how long the series runs.
+"""
+from datetime import datetime, timedelta
+
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from .models import RecurrenceOverride, RecurrenceRule, Todo
+from .utils import day_bounds
+
+
+def _weekdays(rule, first_day):
+    return sorted(set(rule.weekdays)) or [first_day.weekday()]
+
+
+def occurrence_index(rule, first_day, day):
+    """Zero-based position of ``day`` in the series, or ``None`` if it is not an occurrence."""
+    if day < first_day:
+        return None
+    if rule.frequency == "daily":
+        offset = (day - first_day).days
+        if offset % rule.interval:
+            return None
+        return offset // rule.interval
+
+    weekdays = _weekdays(rule, first_day)
+    if day.weekday() not in weekdays:
+        return None
+    first_monday = first_day - timedelta(days=first_day.weekday())
+    week = (day - timedelta(days=day.weekday()) - first_monday).days // 7
+    if week % rule.interval:
+        return None
+    return (
+        week // rule.interval * len(weekdays)
+        + sum(1 for weekday in weekdays if weekday < day.weekday())
+        - sum(1 for weekday in weekdays if weekday < first_day.weekday())
+    )
+
+
+def is_occurrence(rule, day, tz):
+    first_day = timezone.localtime(rule.todo.start_time, tz).date()
+    index = occurrence_index(rule, first_day, day)
+    return (
+        index is not None
+        and (rule.count is None or index < rule.count)
+        and (rule.until is None or day <= rule.until)
+    )
+
+
+def expand(rule, start_day, end_day, tz):
+    """Yield the occurrences of ``rule`` between two local dates (inclusive)."""
+    master = rule.todo
+    local_start = timezone.localtime(master.start_time, tz)
+    first_day = local_start.date()
+    duration = master.end_time - master.start_time
+    overrides = {override.occurrence: override for override in rule.overrides.all()}
+
+    day = max(start_day, first_day)
+    last_day = min(end_day, rule.until) if rule.until else end_day
+    while day <= last_day:
+        index = occurrence_index(rule, first_day, day)
+        override = overrides.get(day)
+        if index is not None and (rule.count is None or index < rule.count) and not (override and override.cancelled):
+            start = timezone.make_aware(datetime.combine(day, local_start.time()), tz)
+            occurrence = Todo(
+                id=master.id,
+                user_id=master.user_id,
+                title=master.title,
+                description=master.description,
+                start_time=start,
+                end_time=start + duration,
+                status=(override.status if override and override.status else "not_started"),
+                day=day,
+            )
+            occurrence.occurrence = day
+            yield occurrence
+        day += timedelta(days=1)
+
+
+def occurrences_between(user, start_day, end_day):
+    """All of ``user``'s recurring occurrences between two local dates, by start time."""
+    return _expand_all(_rules_between(user, start_day, end_day), start_day, end_day, user.get_timezone())
+
+
+async def aoccurrences_between(user, start_day, end_day):
+    """Async ``occurrences_between``."""
+    rules = [rule async for rule in _rules_between(user, start_day, end_day)]
+    return _expand_all(rules, start_day, end_day, user.get_timezone())
+
+
+def overlapping_occurrences(user, start, end):
+    """
+    ``user``'s recurring occurrences intersecting ``[start, end)``, the
+    counterpart of ``utils.overlapping`` for stored todos.
+    """
+    tz = user.get_timezone()
+    # An occurrence starting the evening before can run past midnight.
+    start_day = timezone.localtime(start, tz).date() - timedelta(days=1)
+    end_day = timezone.localtime(end, tz).date()
+    return [
+        occurrence for occurrence in occurrences_between(user, start_day, end_day)
+        if occurrence.start_time < end and occurrence.end_time > start
+    ]
+
+
+def _rules_between(user, start_day, end_day):
+    _, window_end = day_bounds(end_day, user.get_timezone())
+    return (
+        RecurrenceRule.objects.filter(todo__user=user, todo__start_time__lt=window_end)
+        .filter(Q(until__isnull=True) | Q(until__gte=start_day))
+        .select_related("todo")
+        .prefetch_related(Prefetch(
+            "overrides",
+            queryset=RecurrenceOverride.objects.filter(occurrence__gte=start_day, occurrence__lte=end_day),
+        ))
+    )
+
+
+def _expand_all(rules, start_day, end_day, tz):
+    occurrences = [occurrence for rule in rules for occurrence in expand(rule, start_day, end_day, tz)]
+    occurrences.sort(key=lambda todo: (todo.start_time, todo.id))
+    return occurrences
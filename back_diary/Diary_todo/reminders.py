@@ -0,0 +1,162 @@
+"""
+Reminder emails for todos that are about to start.
+
+``ReminderScheduler`` is driven by ``manage.py run_reminders``. Every refill it
+reads the earliest pending todos (``reminded=False``, due before the next
+refill) from the partial ``todo_reminder_due_idx``, at most ``batch_size`` of
+them, into a min-heap keyed on when each reminder is due, then sleeps until
+the head of the heap or the next refill, whichever is first. A tick therefore
+costs an index range scan of one batch, however many todos are stored.
+
+Due todos are claimed by flipping ``reminded`` in a transaction before the
+broker sees them, so a restarted (or second) worker never sends a reminder
+twice; a failed delivery is released again and retried on a later refill,
+backing off exponentially (up to ``MAX_RETRY_DELAY``) while the broker keeps
+failing.
+Todos that were moved since they were loaded are left for the next refill,
+and reminders more than ``REMINDER_MAX_LATENESS_MINUTES`` late (the worker
+was down) are marked handled without being sent.
+"""
+import heapq
+import logging
+import time
+from abc import ABC, abstractmethod
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Todo
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+REFILL_INTERVAL = timedelta(seconds=30)
+RETRY_DELAY = timedelta(seconds=5)
+MAX_RETRY_DELAY = timedelta(minutes=5)
+
+
+class Broker(ABC):
+    """
+    Delivers claimed reminders. Point ``REMINDER_BROKER`` at a subclass to
+    hand them to a queue or push service instead of sending mail in-process.
+    """
+
+    @abstractmethod
+    def deliver(self, todos):
+        """Deliver reminders for ``todos`` (``user`` is loaded); return the ones that failed."""
+
+
+class EmailBroker(Broker):
+    """Sends one email per todo through the configured ``EMAIL_BACKEND``."""
+
+    def message(self, todo):
+        starts = timezone.localtime(todo.start_time, todo.user.get_timezone())
+        body = f"{todo.title} starts at {starts:%H:%M} on {starts:%Y-%m-%d} ({todo.user.timezone})."
+        if todo.description:
+            body += f"\n\n{todo.description}"
+        return EmailMessage(f"Starting soon: {todo.title}", body, to=[todo.user.email])
+
+    def deliver(self, todos):
+        failed = []
+        with get_connection() as mail:
+            for todo in todos:
+                try:
+                    mail.send_messages([self.message(todo)])
+                except Exception:
+                    logger.exception("reminder for todo %s failed", todo.id)
+                    failed.append(todo)
+        return failed
+
+
+def get_broker():
+    return import_string(settings.REMINDER_BROKER)()
+
+
+class ReminderScheduler:
+    def __init__(self, broker=None, lead=None, max_lateness=None, batch_size=BATCH_SIZE,
+                 refill_interval=REFILL_INTERVAL, retry_delay=RETRY_DELAY, clock=timezone.now):
+        self.broker = broker or get_broker()
+        self.lead = lead if lead is not None else timedelta(minutes=settings.REMINDER_LEAD_MINUTES)
+        self.max_lateness = (
+            max_lateness if max_lateness is not None
+            else timedelta(minutes=settings.REMINDER_MAX_LATENESS_MINUTES)
+        )
+        self.batch_size = batch_size
+        self.refill_interval = refill_interval
+        self.retry_delay = retry_delay
+        # Consecutive ticks whose deliveries all failed.
+        self.failures = 0
+        self.clock = clock
+        # (due_at, todo_id, start_time) of the earliest pending todos.
+        self.heap = []
+        self.next_refill = None
+
+    def refill(self, now):
+        missed = Todo.objects.filter(reminded=False, start_time__lt=now - self.max_lateness).update(reminded=True)
+        if missed:
+            logger.warning("skipped %s reminders more than %s late", missed, self.max_lateness)
+        pending = list(
+            Todo.objects.filter(reminded=False, start_time__lte=now + self.lead + self.refill_interval)
+            .order_by("start_time").values_list("id", "start_time")[:self.batch_size]
+        )
+        self.heap = [(start_time - self.lead, pk, start_time) for pk, start_time in pending]
+        heapq.heapify(self.heap)
+        self.next_refill = now + self.refill_interval
+        if len(pending) == self.batch_size:
+            # More may be waiting behind a full batch; come back once it is drained.
+            self.next_refill = min(self.next_refill, max(now, pending[-1][1] - self.lead))
+
+    def claim(self, due):
+        """Mark the ``due`` entries still pending at their loaded start time as reminded."""
+        expected = {pk: start_time for _, pk, start_time in due}
+        with transaction.atomic():
+            rows = Todo.objects.filter(id__in=expected, reminded=False).select_related("user")
+            if connection.features.has_select_for_update_skip_locked:
+                rows = rows.select_for_update(skip_locked=True, of=("self",))
+            claimed = [todo for todo in rows if todo.start_time == expected[todo.id]]
+            Todo.objects.filter(id__in=[todo.id for todo in claimed]).update(reminded=True)
+        return claimed
+
+    def tick(self):
+        """Refill if it is time, then send every reminder that is due. Returns how many were sent."""
+        now = self.clock()
+        if self.next_refill is None or now >= self.next_refill:
+            self.refill(now)
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due.append(heapq.heappop(self.heap))
+        if not due:
+            return 0
+        claimed = self.claim(due)
+        failed = self.broker.deliver(claimed) if claimed else []
+        if failed:
+            Todo.objects.filter(id__in=[todo.id for todo in failed]).update(reminded=False)
+        if claimed and len(failed) == len(claimed):
+            # The released rows come back with the next refill; hold it off so
+            # a broker outage is not retried in a tight loop.
+            self.failures += 1
+            backoff = min(self.retry_delay * 2 ** (self.failures - 1), MAX_RETRY_DELAY)
+            self.next_refill = max(self.next_refill, now + backoff)
+        elif claimed:
+            self.failures = 0
+        return len(claimed) - len(failed)
+
+    def next_wakeup(self):
+        if self.heap:
+            return min(self.heap[0][0], self.next_refill)
+        return self.next_refill
+
+    def run(self, once=False, sleep=time.sleep):
+        while True:
+            sent = self.tick()
+            if sent:
+                logger.info("sent %s reminders", sent)
+            if once:
+                return
+            delay = (self.next_wakeup() - self.clock()).total_seconds()
+            if delay > 0:
+                sleep(delay)
@@ -0,0 +1,222 @@
+"""
+Full-text search over diary text and todo titles/descriptions.
+
+On SQLite the index is a pair of external-content FTS5 tables kept in sync by
+triggers, so every write path (ORM saves, bulk_create, queryset.update, raw
+SQL) updates it in the same transaction. ``user_id`` is indexed as a column,
+making a user's matches a posting-list intersection instead of a filter over
+every user's hits. On PostgreSQL, GIN expression indexes back ``SearchVector``
+queries built from the same expressions.
+"""
+import html
+import re
+from datetime import timezone as dt_timezone
+
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+FTS_TABLES = {
+    "diary": ("diary_todo_diary_fts", "Diary_todo_diary", ["user_id", "text"]),
+    "todo": ("diary_todo_todo_fts", "Diary_todo_todo", ["user_id", "title", "description"]),
+}
+
+POSTGRES_INDEXES = {
+    "diary_todo_diary_tsv": """CREATE INDEX IF NOT EXISTS diary_todo_diary_tsv ON "Diary_todo_diary"
+        USING GIN (to_tsvector('simple'::regconfig, COALESCE(("text")::text, '')))""",
+    "diary_todo_todo_tsv": """CREATE INDEX IF NOT EXISTS diary_todo_todo_tsv ON "Diary_todo_todo"
+        USING GIN (to_tsvector('simple'::regconfig,
+            COALESCE(("title")::text, '') || ' ' || COALESCE(("description")::text, '')))""",
+}
+
+SNIPPET_TOKENS = 12
+# Control characters mark matches until the text has been HTML-escaped.
+OPEN, CLOSE = "\x02", "\x03"
+
+
+def _sqlite_ddl(fts, table, columns):
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    insert_new = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});"
+    return {
+        "table": f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {cols}, content='{table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2')""",
+        "triggers": {
+            f"{fts}_ai": f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END",
+            f"{fts}_ad": f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+            f"{fts}_au": f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} "
+                         f"BEGIN {delete_old} {insert_new} END",
+        },
+    }
+
+
+def install(conn):
+    """
+    Create the search index for ``conn``'s backend if anything is missing.
+
+    Safe to call repeatedly: SQLite drops a table's triggers whenever a
+    migration rebuilds that table, so this also runs after every migrate and
+    re-syncs the FTS table when a trigger had to be recreated.
+    """
+    with conn.cursor() as cursor:
+        if conn.vendor == "sqlite":
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+            existing = {row[0] for row in cursor.fetchall()}
+            for fts, table, columns in FTS_TABLES.values():
+                if table not in existing:
+                    continue
+                ddl = _sqlite_ddl(fts, table, columns)
+                cursor.execute(ddl["table"])
+                missing = [sql for name, sql in ddl["triggers"].items() if name not in existing]
+                for sql in missing:
+                    cursor.execute(sql)
+                if missing:
+                    cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        elif conn.vendor == "postgresql":
+            for sql in POSTGRES_INDEXES.values():
+                cursor.execute(sql)
+
+
+def uninstall(conn):
+    with conn.cursor() as cursor:
+        if conn.vendor == "sqlite":
+            for fts, table, columns in FTS_TABLES.values():
+                for name in _sqlite_ddl(fts, table, columns)["triggers"]:
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+                cursor.execute(f"DROP TABLE IF EXISTS {fts}")
+        elif conn.vendor == "postgresql":
+            for name in POSTGRES_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def ensure_search_index(sender, using, **kwargs):
+    """post_migrate receiver."""
+    from django.db import connections
+
+    install(connections[using])
+
+
+def fts_query(text):
+    """
+    Turn free text into a safe FTS5 expression: every word is quoted (so
+    operators and punctuation are literal) and the last one is a prefix.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = ['"%s"' % word.replace('"', '""') for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def matching_ids(kind, text):
+    """
+    SQL fragment selecting the ids of every ``kind`` row matching ``text``
+    across all users, for ``filter(id__in=...)``; ``None`` when there is no
+    FTS index to use (non-SQLite backends, or no searchable words).
+    """
+    from django.db.models.expressions import RawSQL
+
+    query = fts_query(text)
+    if connection.vendor != "sqlite" or query is None:
+        return None
+    fts, _, columns = FTS_TABLES[kind]
+    return RawSQL(
+        f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s",
+        ["{%s} : (%s)" % (" ".join(columns[1:]), query)],
+    )
+
+
+def search(user, text, kind="all", limit=20, offset=0):
+    """
+    Return up to ``limit`` ranked hits after ``offset``, plus whether more
+    exist. Each hit is a dict with ``type``, ``id``, ``rank`` and a
+    ``snippet`` where matches are wrapped in ``<mark>``.
+    """
+    kinds = ["diary", "todo"] if kind == "all" else [kind]
+    fetch = limit + offset + 1
+    if connection.vendor == "postgresql":
+        hits = [hit for k in kinds for hit in _postgres_search(user, text, k, fetch)]
+        hits.sort(key=lambda hit: -hit["rank"])
+    else:
+        query = fts_query(text)
+        if query is None:
+            return [], False
+        hits = [hit for k in kinds for hit in _sqlite_search(user, query, k, fetch)]
+        hits.sort(key=lambda hit: hit["rank"])  # bm25: lower is better
+    page = hits[offset:offset + limit]
+    return page, len(hits) > offset + limit
+
+
+def _highlighted(text):
+    """Escape user text and turn the raw match markers into ``<mark>`` tags."""
+    return html.escape(text or "").replace(OPEN, "<mark>").replace(CLOSE, "</mark>")
+
+
+def _sqlite_search(user, query, kind, limit):
+    fts, table, fts_columns = FTS_TABLES[kind]
+    marks = "%s, %s"
+    # user_id (column 0) gets zero weight so it only narrows the match.
+    if kind == "diary":
+        rank = f"bm25({fts}, 0.0, 1.0)"
+        columns = f"t.pub_date, '', snippet({fts}, 1, {marks}, '…', {SNIPPET_TOKENS})"
+        params = [OPEN, CLOSE]
+    else:
+        rank = f"bm25({fts}, 0.0, 4.0, 1.0)"
+        columns = f"t.start_time, highlight({fts}, 1, {marks}), snippet({fts}, 2, {marks}, '…', {SNIPPET_TOKENS})"
+        params = [OPEN, CLOSE, OPEN, CLOSE]
+    sql = (
+        f"SELECT t.id, {columns}, {rank} AS rank FROM {fts} "
+        f"JOIN {table} t ON t.id = {fts}.rowid "
+        f"WHERE {fts} MATCH %s ORDER BY rank LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        match = 'user_id : "%s" AND {%s} : (%s)' % (user.id, " ".join(fts_columns[1:]), query)
+        cursor.execute(sql, params + [match, limit])
+        rows = cursor.fetchall()
+
+    hits = []
+    for pk, when, title, snippet, rank in rows:
+        hit = {"type": kind, "id": pk, "rank": rank, "snippet": _highlighted(snippet)}
+        if kind == "diary":
+            hit["date"] = when
+        else:
+            hit["title"] = _highlighted(title)
+            when = parse_datetime(when) if isinstance(when, str) else when
+            hit["start_time"] = timezone.make_aware(when, dt_timezone.utc) if timezone.is_naive(when) else when
+        hits.append(hit)
+    return hits
+
+
+def _postgres_search(user, text, kind, limit):
+    from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+
+    from .models import Diary, Todo
+
+    query = SearchQuery(text, config="simple", search_type="websearch")
+    if kind == "diary":
+        vector = SearchVector("text", config="simple")
+        queryset, headline_source, fields = Diary.objects.filter(user=user), "text", {"date": "pub_date"}
+    else:
+        vector = SearchVector("title", "description", config="simple")
+        queryset, headline_source, fields = Todo.objects.filter(user=user), "description", {
+            "title": "title", "start_time": "start_time",
+        }
+    rows = (
+        queryset.annotate(document=vector)
+        .filter(document=query)
+        .annotate(
+            rank=SearchRank(vector, query),
+            snippet=SearchHeadline(headline_source, query, config="simple", start_sel=OPEN, stop_sel=CLOSE),
+        )
+        .order_by("-rank")
+        .values("id", "rank", "snippet", *fields.values())[:limit]
+    )
+    return [
+        {"type": kind, "id": row["id"], "rank": row["rank"], "snippet": _highlighted(row["snippet"]),
+         **{key: row[source] for key, source in fields.items()}}
+        for row in rows
+    ]
@@ -1,6 +1,8 @@
-from .models import Todo , Diary 
+from django.utils import timezone
 from rest_framework import serializers
 
+from .models import Todo , Diary , RecurrenceRule
+
 
 
 class TodoSerializer(serializers.ModelSerializer):
@@ -10,6 +12,32 @@ class TodoSerializer(serializers.ModelSerializer):
         model = Todo
         fields = ["id", "title", "description", "start_time", "end_time", "status", "status_display"]
 
+    def validate(self, attrs):
+        start = attrs.get("start_time", getattr(self.instance, "start_time", None))
+        end = attrs.get("end_time", getattr(self.instance, "end_time", None))
+        if start and end and start >= end:
+            raise serializers.ValidationError("Start time must be before end time")
+        return attrs
+
+
+class OccurrenceSerializer(TodoSerializer):
+    """An expanded occurrence of a recurring todo; ``id`` is the series' todo."""
+    occurrence = serializers.DateField(read_only=True)
+
+    class Meta(TodoSerializer.Meta):
+        fields = TodoSerializer.Meta.fields + ["occurrence"]
+
+
+class RecurrenceRuleSerializer(serializers.ModelSerializer):
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6), required=False
+    )
+
+    class Meta:
+        model = RecurrenceRule
+        fields = ["frequency", "interval", "weekdays", "until", "count"]
+        extra_kwargs = {"interval": {"min_value": 1}, "count": {"min_value": 1}}
+
 
 class DiarySerializer(serializers.ModelSerializer):
     todos = TodoSerializer(many=True, read_only=True)
@@ -17,3 +45,59 @@ class DiarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Diary
         fields = ["id", "pub_date", "text", "todos"]
+
+
+# Read-only fast path for list endpoints. These build the same dicts as
+# TodoSerializer / DiarySerializer from ``.values()`` rows, without a field
+# object and a ``get_status_display`` call per value.
+
+TODO_FIELDS = ["id", "title", "description", "start_time", "end_time", "status"]
+STATUS_LABELS = {value: str(label) for value, label in Todo.STATUS_CHOICES}
+
+
+def datetime_repr(value):
+    """DRF's ISO 8601 ``DateTimeField`` output: the current timezone, ``Z`` for UTC."""
+    value = value.astimezone(timezone.get_current_timezone()).isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+def todo_values(todo):
+    """The ``todo_rows`` dict of a model instance, e.g. an expanded occurrence."""
+    row = {field: getattr(todo, field) for field in TODO_FIELDS}
+    if hasattr(todo, "occurrence"):
+        row["occurrence"] = todo.occurrence
+    return row
+
+
+def todo_data(row):
+    """TodoSerializer (or OccurrenceSerializer, given an ``occurrence``) output for a row."""
+    data = {
+        "id": row["id"],
+        "title": row["title"],
+        "description": row["description"],
+        "start_time": datetime_repr(row["start_time"]),
+        "end_time": datetime_repr(row["end_time"]),
+        "status": row["status"],
+        "status_display": STATUS_LABELS.get(row["status"], row["status"]),
+    }
+    if "occurrence" in row:
+        data["occurrence"] = row["occurrence"].isoformat()
+    return data
+
+
+def diaries_data(rows, user_id):
+    """
+    DiarySerializer output for ``.values("id", "pub_date", "text")`` rows of
+    one user, with each day's todos read in a single query.
+    """
+    todos = {}
+    day_todos = (
+        Todo.objects.filter(user_id=user_id, day__in=[row["pub_date"] for row in rows])
+        .order_by("start_time", "id").values("day", *TODO_FIELDS)
+    )
+    for todo in day_todos:
+        todos.setdefault(todo["day"], []).append(todo_data(todo))
+    return [
+        {"id": row["id"], "pub_date": row["pub_date"].isoformat(), "text": row["text"], "todos": todos.get(row["pub_date"], [])}
+        for row in rows
+    ]
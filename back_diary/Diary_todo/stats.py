@@ -0,0 +1,202 @@
+"""
+Maintenance of the ``DailyStats`` rollup.
+
+Every todo or diary write recomputes the rollup rows of the days it touched
+(an indexed aggregate over one user's day) instead of applying deltas, so the
+table cannot drift from the raw rows. ``post_save``/``post_delete`` receivers
+cover ORM saves and deletes. Bulk paths (``bulk_create``, ``bulk_update``,
+``QuerySet.update``) send no signals and call ``refresh_days`` themselves,
+usually inside ``batched()`` so a large batch refreshes each day once.
+"""
+import contextvars
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import DailyStats, Diary, Todo
+from .utils import deleted_with_user
+
+STAT_FIELDS = ["todos_planned", "todos_completed", "scheduled_minutes", "diary_words"]
+
+_pending = contextvars.ContextVar("daily_stats_pending", default=None)
+
+
+def _rollup(todos, diaries):
+    """Unsaved ``DailyStats`` rows for the given todo and diary querysets."""
+    rows = {}
+
+    def row(user_id, day):
+        key = (user_id, day)
+        if key not in rows:
+            rows[key] = DailyStats(user_id=user_id, day=day)
+        return rows[key]
+
+    per_day = (
+        todos.order_by().values("user_id", "day")
+        .annotate(
+            planned=Count("id"),
+            completed=Count("id", filter=Q(status="completed")),
+            scheduled=Sum(ExpressionWrapper(F("end_time") - F("start_time"), output_field=DurationField())),
+        )
+    )
+    for values in per_day:
+        stats = row(values["user_id"], values["day"])
+        stats.todos_planned = values["planned"]
+        stats.todos_completed = values["completed"]
+        stats.scheduled_minutes = max(0, int((values["scheduled"] or timedelta()).total_seconds() // 60))
+
+    for user_id, day, text in diaries.order_by().values_list("user_id", "pub_date", "text").iterator(chunk_size=2000):
+        row(user_id, day).diary_words = len(text.split())
+    return list(rows.values())
+
+
+def refresh_days(user_id, days):
+    """Recompute ``user_id``'s rollup rows for ``days``, dropping days left empty."""
+    days = {day for day in days if day is not None}
+    if not days:
+        return
+    pending = _pending.get()
+    if pending is not None:
+        pending.update((user_id, day) for day in days)
+        return
+    rows = _rollup(
+        Todo.objects.filter(user_id=user_id, day__in=days),
+        Diary.objects.filter(user_id=user_id, pub_date__in=days),
+    )
+    with transaction.atomic(savepoint=False):
+        DailyStats.objects.filter(user_id=user_id, day__in=days - {stats.day for stats in rows}).delete()
+        DailyStats.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=["user", "day"], update_fields=STAT_FIELDS,
+        )
+
+
+@contextmanager
+def batched():
+    """Collect ``refresh_days`` calls and run them once per user on exit."""
+    if _pending.get() is not None:
+        yield
+        return
+    pending = set()
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    by_user = {}
+    for user_id, day in pending:
+        by_user.setdefault(user_id, set()).add(day)
+    for user_id, days in by_user.items():
+        refresh_days(user_id, days)
+
+
+def backfill(user_ids, chunk_size=500):
+    """Rebuild the rollup of ``user_ids`` from raw rows, ``chunk_size`` users at a time."""
+    user_ids = list(user_ids)
+    for offset in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[offset:offset + chunk_size]
+        rows = _rollup(Todo.objects.filter(user_id__in=chunk), Diary.objects.filter(user_id__in=chunk))
+        with transaction.atomic():
+            DailyStats.objects.filter(user_id__in=chunk).delete()
+            DailyStats.objects.bulk_create(rows, batch_size=2000)
+        yield len(chunk), len(rows)
+
+
+def rebuild_user(user_id):
+    """Rebuild one user's rollup, e.g. after a timezone change moved every ``Todo.day``."""
+    for _ in backfill([user_id]):
+        pass
+
+
+def _bucket(start, end, rows):
+    bucket = {"start": start, "end": end, **{field: sum(getattr(r, field) for r in rows) for field in STAT_FIELDS}}
+    planned = bucket["todos_planned"]
+    bucket["completion_rate"] = round(bucket["todos_completed"] / planned, 4) if planned else None
+    return bucket
+
+
+def current_streak(user_id, end_day):
+    """
+    Consecutive days up to ``end_day`` with at least one completed todo. An
+    ``end_day`` with nothing completed yet does not break the streak.
+    """
+    streak, expected = 0, end_day
+    days = (
+        DailyStats.objects.filter(user_id=user_id, day__lte=end_day, todos_completed__gt=0)
+        .order_by("-day").values_list("day", flat=True)
+    )
+    for day in days.iterator(chunk_size=366):
+        if streak == 0 and day == end_day - timedelta(days=1):
+            expected = day
+        if day != expected:
+            break
+        streak += 1
+        expected = day - timedelta(days=1)
+    return streak
+
+
+def summary(user_id, start_day, end_day, group="day"):
+    """Dashboard numbers for ``[start_day, end_day]`` from at most one row per day."""
+    by_day = {
+        row.day: row
+        for row in DailyStats.objects.filter(user_id=user_id, day__gte=start_day, day__lte=end_day)
+    }
+    span = (end_day - start_day).days + 1
+    days = [start_day + timedelta(days=i) for i in range(span)]
+
+    buckets = []
+    if group == "week":
+        week_start = start_day - timedelta(days=start_day.weekday())
+        while week_start <= end_day:
+            week_end = week_start + timedelta(days=6)
+            week = (week_start + timedelta(days=i) for i in range(7))
+            rows = [by_day[day] for day in week if day in by_day]
+            buckets.append(_bucket(week_start, week_end, rows))
+            week_start += timedelta(days=7)
+    else:
+        buckets = [_bucket(day, day, [by_day[day]] if day in by_day else []) for day in days]
+
+    longest = run = 0
+    for day in days:
+        run = run + 1 if day in by_day and by_day[day].todos_completed else 0
+        longest = max(longest, run)
+
+    totals = _bucket(start_day, end_day, list(by_day.values()))
+    return {
+        "group": group,
+        "buckets": buckets,
+        "totals": totals,
+        "streak": {"current": current_streak(user_id, end_day), "longest": longest},
+    }
+
+
+@receiver(post_save, sender=Todo)
+def todo_saved(sender, instance, **kwargs):
+    refresh_days(instance.user_id, {instance.day, getattr(instance, "_stored_day", None)})
+    instance._stored_day = instance.day
+
+
+@receiver(post_delete, sender=Todo)
+def todo_deleted(sender, instance, origin=None, **kwargs):
+    # Rows of a deleted user go with it; skip the per-todo refresh.
+    if not deleted_with_user(origin):
+        refresh_days(instance.user_id, {instance.day})
+
+
+def _diary_day(diary):
+    # update_or_create(pub_date="2025-03-01") leaves the string on the instance.
+    return Diary._meta.get_field("pub_date").to_python(diary.pub_date)
+
+
+@receiver(post_save, sender=Diary)
+def diary_saved(sender, instance, **kwargs):
+    refresh_days(instance.user_id, {_diary_day(instance)})
+
+
+@receiver(post_delete, sender=Diary)
+def diary_deleted(sender, instance, origin=None, **kwargs):
+    if not deleted_with_user(origin):
+        refresh_days(instance.user_id, {_diary_day(instance)})
@@ -0,0 +1,210 @@
+"""
+Incremental sync for clients that keep a local copy of their todos and diaries.
+
+``changes(user, cursor)`` returns the rows written since ``cursor`` and the
+ids deleted since then, plus the cursor to send next time. Each of the three
+streams (todos and diaries by ``updated_at``, tombstones by ``deleted_at``)
+is paged on its own ``(timestamp, id)`` keyset over a ``(user, timestamp)``
+index, so a refresh costs O(changes) rather than O(history).
+
+``updated_at`` is set when a row is written, not when its transaction
+commits, so a slow transaction can become visible behind a cursor that has
+already passed it. Cursors therefore never advance past ``now -
+SYNC_SETTLE_SECONDS`` once a stream is drained: the last few seconds are sent
+again on the next sync, and clients upsert by id.
+
+Deletes stay hard deletes; a ``post_delete`` receiver records a
+``Tombstone`` for each one (one INSERT per bulk delete inside ``batched()``).
+Tombstones are pruned after ``SYNC_TOMBSTONE_DAYS`` (``manage.py
+prune_tombstones``), and cursors older than that are rejected so the client
+re-syncs from scratch.
+"""
+import base64
+import contextvars
+import json
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .export import RECURRENCE_FIELDS
+from .models import Diary, RecurrenceOverride, Todo, Tombstone
+from .serializer import TODO_FIELDS, datetime_repr, todo_data
+from .utils import deleted_with_user
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+
+STREAMS = ("todo", "diary", "tombstone")
+
+_pending = contextvars.ContextVar("tombstones_pending", default=None)
+
+
+class CursorExpired(Exception):
+    """The cursor predates the oldest tombstone still kept."""
+
+
+def encode_cursor(positions):
+    raw = json.dumps(
+        {stream: [value.isoformat(), pk] for stream, (value, pk) in positions.items()},
+        separators=(",", ":"),
+    ).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(encoded):
+    """``{stream: (datetime, id)}`` from ``encode_cursor``; ``ValueError`` if it is malformed."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)))
+        positions = {stream: (datetime.fromisoformat(raw[stream][0]), int(raw[stream][1])) for stream in STREAMS}
+    except (TypeError, KeyError, IndexError, AttributeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if any(timezone.is_naive(value) for value, _ in positions.values()):
+        raise ValueError("Invalid cursor")
+    return positions
+
+
+def touch_todo(pk):
+    """Bump a todo whose visible state changed without a save, e.g. a recurrence override."""
+    Todo.objects.filter(pk=pk).update(updated_at=timezone.now())
+
+
+def _after(queryset, field, position, limit):
+    if position:
+        value, pk = position
+        queryset = queryset.filter(Q(**{f"{field}__gt": value}) | Q(**{field: value, "id__gt": pk}))
+    return list(queryset.order_by(field, "id")[:limit + 1])
+
+
+def _todos_data(rows):
+    overrides = {}
+    rule_ids = [row["recurrence__id"] for row in rows if row["recurrence__id"]]
+    if rule_ids:
+        for override in RecurrenceOverride.objects.filter(rule_id__in=rule_ids).order_by("occurrence"):
+            overrides.setdefault(override.rule_id, []).append({
+                "occurrence": override.occurrence.isoformat(),
+                "status": override.status or None,
+                "cancelled": override.cancelled,
+            })
+
+    data = []
+    for row in rows:
+        todo = todo_data(row)
+        todo["updated_at"] = datetime_repr(row["updated_at"])
+        rule_id = row["recurrence__id"]
+        if rule_id:
+            rule = {field: row[f"recurrence__{field}"] for field in RECURRENCE_FIELDS}
+            if rule["until"]:
+                rule["until"] = rule["until"].isoformat()
+            rule["overrides"] = overrides.get(rule_id, [])
+            todo["recurrence"] = rule
+        else:
+            todo["recurrence"] = None
+        data.append(todo)
+    return data
+
+
+def changes(user, cursor=None, limit=DEFAULT_LIMIT, now=None):
+    """
+    Everything in ``user``'s replica that changed after ``cursor`` (all of it
+    when ``cursor`` is ``None``), at most ``limit`` rows per stream. Keep
+    calling with the returned cursor while ``has_more`` is true.
+    """
+    now = now or timezone.now()
+    positions = decode_cursor(cursor) if cursor else {}
+    if positions and positions["tombstone"][0] < now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+        raise CursorExpired
+
+    todo_rows = _after(
+        Todo.objects.filter(user=user).values(
+            *TODO_FIELDS, "updated_at", "recurrence__id", *(f"recurrence__{field}" for field in RECURRENCE_FIELDS),
+        ),
+        "updated_at", positions.get("todo"), limit,
+    )
+    diary_rows = _after(
+        Diary.objects.filter(user=user).values("id", "pub_date", "text", "version", "updated_at"),
+        "updated_at", positions.get("diary"), limit,
+    )
+    tombstones = _after(
+        Tombstone.objects.filter(user=user).values("id", "kind", "object_id", "deleted_at"),
+        "deleted_at", positions.get("tombstone"), limit,
+    )
+
+    settled = (now - timedelta(seconds=settings.SYNC_SETTLE_SECONDS), 0)
+    has_more = False
+    next_positions = {}
+    for stream, rows, field in (
+        ("todo", todo_rows, "updated_at"), ("diary", diary_rows, "updated_at"), ("tombstone", tombstones, "deleted_at"),
+    ):
+        if len(rows) > limit:
+            del rows[limit:]
+            has_more = True
+            next_positions[stream] = (rows[-1][field], rows[-1]["id"])
+        else:
+            next_positions[stream] = settled
+
+    deleted = {"todos": [], "diaries": []}
+    for tombstone in tombstones:
+        deleted["todos" if tombstone["kind"] == "todo" else "diaries"].append(tombstone["object_id"])
+
+    return {
+        "todos": _todos_data(todo_rows),
+        "diaries": [
+            {
+                "id": row["id"], "pub_date": row["pub_date"].isoformat(), "text": row["text"],
+                "version": row["version"], "updated_at": datetime_repr(row["updated_at"]),
+            }
+            for row in diary_rows
+        ],
+        "deleted": deleted,
+        "cursor": encode_cursor(next_positions),
+        "has_more": has_more,
+    }
+
+
+def prune_tombstones(now=None):
+    """Delete tombstones older than ``SYNC_TOMBSTONE_DAYS``; returns how many."""
+    cutoff = (now or timezone.now()) - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
+
+
+@contextmanager
+def batched():
+    """Collect the tombstones of a bulk delete and insert them with one statement on exit."""
+    if _pending.get() is not None:
+        yield
+        return
+    pending = []
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    Tombstone.objects.bulk_create(pending, batch_size=2000)
+
+
+def _record_deletion(kind, instance, origin):
+    # Rows of a deleted user go with it, and so do its tombstones.
+    if deleted_with_user(origin):
+        return
+    tombstone = Tombstone(user_id=instance.user_id, kind=kind, object_id=instance.pk)
+    pending = _pending.get()
+    if pending is not None:
+        pending.append(tombstone)
+    else:
+        tombstone.save()
+
+
+@receiver(post_delete, sender=Todo)
+def todo_deleted(sender, instance, origin=None, **kwargs):
+    _record_deletion("todo", instance, origin)
+
+
+@receiver(post_delete, sender=Diary)
+def diary_deleted(sender, instance, origin=None, **kwargs):
+    _record_deletion("diary", instance, origin)
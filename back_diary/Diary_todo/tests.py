@@ -1,3 +1,1270 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+import zipfile
+from io import StringIO
+from unittest import skipUnless
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from django.http import StreamingHttpResponse
+from django.test import AsyncClient, Client, RequestFactory, TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from my_day.compression import CompressionMiddleware, negotiate
+from my_day.metrics import registry
+from my_day.renderers import ORJSONRenderer
+from user_authentication.models import User
+from . import feed, sync
+from .cache import invalidate_day
+from .models import DailyStats, Diary, RecurrenceOverride, RecurrenceRule, Todo, Tombstone
+from .pagination import KeysetPagination
+from .reminders import Broker, EmailBroker, ReminderScheduler
+from .serializer import DiarySerializer, OccurrenceSerializer, TODO_FIELDS, TodoSerializer, diaries_data
+from .views import serialize_todos, with_day_todos
+
+
+def make_todo(user, start, minutes=60, **kwargs):
+    return Todo.objects.create(
+        user=user,
+        title=kwargs.pop("title", "task"),
+        start_time=start,
+        end_time=start + timedelta(minutes=minutes),
+        **kwargs,
+    )
+
+
+class APITestBase(TestCase):
+    timezone = "UTC"
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="a@example.com", username="alice", password="password123",
+            timezone=self.timezone,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class GetAllTodosTests(APITestBase):
+    timezone = "America/New_York"
+
+    def test_date_filter_uses_user_timezone(self):
+        ny = ZoneInfo("America/New_York")
+        # 23:30 in New York is already the next day in UTC.
+        late = make_todo(self.user, datetime(2025, 3, 10, 23, 30, tzinfo=ny), minutes=15, title="late")
+        make_todo(self.user, datetime(2025, 3, 11, 0, 0, tzinfo=ny), title="next day")
+        make_todo(self.user, datetime(2025, 3, 9, 23, 59, tzinfo=ny), title="previous day")
+
+        response = self.client.get("/api/Diary_todo/get_all_todos/", {"date": "2025-03-10"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([t["id"] for t in response.data["results"]], [late.id])
+
+    def test_invalid_date(self):
+        response = self.client.get("/api/Diary_todo/get_all_todos/", {"date": "10/03/2025"})
+        self.assertEqual(response.status_code, 400)
+
+
+class GetTodosRangeTests(APITestBase):
+    def get_range(self, start, end):
+        response = self.client.get("/api/Diary_todo/get_todos_range/", {"start": start, "end": end})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_groups_week_by_day(self):
+        utc = ZoneInfo("UTC")
+        make_todo(self.user, datetime(2025, 3, 10, 9, tzinfo=utc), status="completed")
+        make_todo(self.user, datetime(2025, 3, 10, 14, tzinfo=utc))
+        make_todo(self.user, datetime(2025, 3, 12, 8, tzinfo=utc))
+        make_todo(self.user, datetime(2025, 3, 17, 8, tzinfo=utc))
+        other = User.objects.create_user(email="b@example.com", username="bob", password="password123")
+        make_todo(other, datetime(2025, 3, 10, 9, tzinfo=utc))
+
+        with self.assertNumQueries(2):  # recurrence rules + todos
+            payload = self.get_range("2025-03-10", "2025-03-16")
+
+        self.assertEqual(len(payload["days"]), 7)
+        monday, _, wednesday = payload["days"][:3]
+        self.assertEqual((monday["date"], monday["count"], monday["completed"]), ("2025-03-10", 2, 1))
+        self.assertEqual(monday["completion_ratio"], 0.5)
+        self.assertEqual(wednesday["count"], 1)
+        self.assertEqual(sum(day["count"] for day in payload["days"]), 3)
+
+    def test_rejects_bad_ranges(self):
+        url = "/api/Diary_todo/get_todos_range/"
+        self.assertEqual(self.client.get(url, {"start": "2025-03-10"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"start": "2025-03-10", "end": "2025-03-09"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"start": "2025-01-01", "end": "2025-03-01"}).status_code, 400)
+
+
+class KeysetPaginationTests(APITestBase):
+    def test_pages_through_ties_without_gaps(self):
+        base = datetime(2025, 3, 10, 9, tzinfo=ZoneInfo("UTC"))
+        # Pairs of todos share a start_time so the id tiebreak is exercised.
+        todos = [make_todo(self.user, base + timedelta(hours=i // 2)) for i in range(7)]
+
+        seen, url, params = [], "/api/Diary_todo/get_all_todos/", {"page_size": 3}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["results"]), 3)
+            seen += [t["id"] for t in response.data["results"]]
+            url, params = response.data["next"], None
+            if url:
+                self.assertEqual(response.headers["Link"], f'<{url}>; rel="next"')
+
+        expected = sorted(todos, key=lambda t: (t.start_time, t.id), reverse=True)
+        self.assertEqual(seen, [t.id for t in expected])
+
+    def test_occurrences_are_paged_in_order(self):
+        utc = ZoneInfo("UTC")
+        for hour in (9, 11, 13):
+            make_todo(self.user, datetime(2025, 3, 10, hour, tzinfo=utc), title=f"at {hour}")
+        series = make_todo(self.user, datetime(2025, 3, 1, 10, tzinfo=utc), title="series")
+        RecurrenceRule.objects.create(todo=series, frequency="daily")
+
+        pages, url, params = [], "/api/Diary_todo/get_all_todos/", {"date": "2025-03-10", "page_size": 2}
+        while url:
+            response = self.client.get(url, params)
+            pages.append([t["title"] for t in response.data["results"]])
+            url, params = response.data["next"], None
+        self.assertEqual(pages, [["at 13", "at 11"], ["series", "at 9"]])
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/Diary_todo/get_all_todos/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_requests_without_page_size_get_a_bounded_page(self):
+        base = datetime(2025, 3, 10, 9, tzinfo=ZoneInfo("UTC"))
+        for i in range(KeysetPagination.page_size + 1):
+            make_todo(self.user, base + timedelta(minutes=i))
+
+        first = self.client.get("/api/Diary_todo/get_all_todos/").data
+        self.assertEqual(len(first["results"]), KeysetPagination.page_size)
+        last = self.client.get(first["next"]).data
+        self.assertEqual((len(last["results"]), last["next"]), (1, None))
+
+
+class DiaryTodosPrefetchTests(APITestBase):
+    def add_days(self, first, count):
+        for offset in range(count):
+            day = datetime(2025, 3, first + offset, 9, tzinfo=ZoneInfo("UTC"))
+            Diary.objects.create(user=self.user, pub_date=day.date(), text=f"day {offset}")
+            make_todo(self.user, day)
+            make_todo(self.user, day + timedelta(hours=2))
+
+    def test_todos_attach_to_their_day(self):
+        self.add_days(1, 2)
+        response = self.client.get(f"/api/Diary_todo/user_diaries/{self.user.id}/")
+        self.assertEqual(response.status_code, 200)
+        for diary in response.data["results"]:
+            self.assertEqual(len(diary["todos"]), 2)
+            self.assertTrue(all(t["start_time"].startswith(diary["pub_date"]) for t in diary["todos"]))
+
+    def test_query_count_is_constant(self):
+        self.add_days(1, 1)
+        with self.assertNumQueries(2):
+            self.client.get(f"/api/Diary_todo/user_diaries/{self.user.id}/")
+        self.add_days(2, 10)
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/Diary_todo/user_diaries/{self.user.id}/")
+        self.assertEqual(len(response.data["results"]), 11)
+
+    def test_diary_todos(self):
+        self.add_days(1, 2)
+        diary = Diary.objects.get(pub_date="2025-03-02")
+        response = self.client.get(f"/api/Diary_todo/diary_todos/{diary.id}/")
+        self.assertEqual(len(response.data), 2)
+
+
+class DayCacheTests(APITestBase):
+    def test_diary_read_is_cached_until_saved(self):
+        url = "/api/Diary_todo/get_diary_by_date/"
+        self.assertEqual(self.client.get(url, {"date": "2025-03-10"}).data["status"], "not_found")
+        with self.assertNumQueries(0):
+            self.client.get(url, {"date": "2025-03-10"})
+
+        self.client.post("/api/Diary_todo/save_or_update_diary/", {"date": "2025-03-10", "content": "hello"})
+        response = self.client.get(url, {"date": "2025-03-10"})
+        self.assertEqual(response.data["content"], "hello")
+
+    def test_todo_writes_invalidate_their_day(self):
+        url = "/api/Diary_todo/get_all_todos/"
+        self.assertEqual(self.client.get(url, {"date": "2025-03-10"}).data["results"], [])
+        with self.assertNumQueries(0):
+            self.client.get(url, {"date": "2025-03-10"})
+
+        created = self.client.post("/api/Diary_todo/add_todo/", {
+            "title": "read", "start_time": "2025-03-10T09:00:00Z", "end_time": "2025-03-10T10:00:00Z",
+        }).data
+        self.assertEqual([t["status"] for t in self.client.get(url, {"date": "2025-03-10"}).data["results"]], ["not_started"])
+
+        self.client.patch(f"/api/Diary_todo/check_todo/{created['id']}/true/")
+        self.assertEqual([t["status"] for t in self.client.get(url, {"date": "2025-03-10"}).data["results"]], ["completed"])
+
+        self.client.delete(f"/api/Diary_todo/delete_todo/{created['id']}/")
+        self.assertEqual(self.client.get(url, {"date": "2025-03-10"}).data["results"], [])
+
+
+class ConditionalGetTests(APITestBase):
+    def test_unchanged_day_returns_304_until_written(self):
+        url = "/api/Diary_todo/get_all_todos/"
+        etag = self.client.get(url, {"date": "2025-03-10"}).headers["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {"date": "2025-03-10"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        self.client.post("/api/Diary_todo/add_todo/", {
+            "title": "read", "start_time": "2025-03-10T09:00:00Z", "end_time": "2025-03-10T10:00:00Z",
+        })
+        response = self.client.get(url, {"date": "2025-03-10"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_diary_etag(self):
+        url = "/api/Diary_todo/get_diary_by_date/"
+        etag = self.client.get(url, {"date": "2025-03-10"}).headers["ETag"]
+        self.assertEqual(self.client.get(url, {"date": "2025-03-10"}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, {"date": "2025-03-11"}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.client.post("/api/Diary_todo/save_or_update_diary/", {"date": "2025-03-10", "content": "hello"})
+        self.assertEqual(self.client.get(url, {"date": "2025-03-10"}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class BatchTodosTests(APITestBase):
+    url = "/api/Diary_todo/batch_todos/"
+
+    def slot(self, hour, minutes=60):
+        start = datetime(2025, 3, 10, hour, tzinfo=ZoneInfo("UTC"))
+        return start.isoformat(), (start + timedelta(minutes=minutes)).isoformat()
+
+    def test_applies_mixed_operations_in_few_statements(self):
+        keep = make_todo(self.user, datetime(2025, 3, 10, 8, tzinfo=ZoneInfo("UTC")))
+        drop = make_todo(self.user, datetime(2025, 3, 10, 12, tzinfo=ZoneInfo("UTC")))
+        start, end = self.slot(9)
+        operations = [
+            {"op": "create", "data": {"title": f"t{i}", "start_time": start, "end_time": end}}
+            for i in range(20)
+        ]
+        moved_start, moved_end = self.slot(15)
+        operations += [
+            {"op": "update", "id": keep.id, "data": {"start_time": moved_start, "end_time": moved_end}},
+            {"op": "delete", "id": drop.id},
+        ]
+
+        # lookup, savepoint, insert, update, delete (collect, cascade check, DELETE),
+        # tombstones, DailyStats refresh of the one touched day (todos, diaries,
+        # upsert), release
+        with self.assertNumQueries(12):
+            response = self.client.post(
+                self.url, {"operations": operations, "allow_overlap": True}, format="json"
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["status"] for r in response.data["results"][-3:]], ["created", "updated", "deleted"])
+        self.assertEqual(Todo.objects.filter(user=self.user).count(), 21)
+        keep.refresh_from_db()
+        self.assertEqual(keep.start_time.hour, 15)
+        self.assertFalse(Todo.objects.filter(id=drop.id).exists())
+
+    def test_invalid_item_rejects_whole_batch(self):
+        todo = make_todo(self.user, datetime(2025, 3, 10, 8, tzinfo=ZoneInfo("UTC")))
+        start, end = self.slot(9)
+        response = self.client.post(self.url, {"operations": [
+            {"op": "create", "data": {"title": "ok", "start_time": start, "end_time": end}},
+            {"op": "update", "id": todo.id, "data": {"end_time": "2025-03-10T07:00:00Z"}},
+            {"op": "delete", "id": 999999},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r["status"] for r in response.data["results"]], ["created", "error", "error"])
+        self.assertEqual(Todo.objects.filter(user=self.user).count(), 1)
+
+    def test_recurring_changes_invalidate_every_occurrence_day(self):
+        series = make_todo(self.user, datetime(2025, 3, 10, 7, tzinfo=ZoneInfo("UTC")), title="series")
+        RecurrenceRule.objects.create(todo=series, frequency="daily")
+        url = "/api/Diary_todo/get_all_todos/"
+        first = self.client.get(url, {"date": "2025-03-12"})
+        self.assertEqual([t["title"] for t in first.data["results"]], ["series"])
+
+        response = self.client.post(self.url, {"operations": [{"op": "delete", "id": series.id}]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, {"date": "2025-03-12"}, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 200)
+        self.assertEqual(self.client.get(url, {"date": "2025-03-12"}).data["results"], [])
+
+    def test_rejects_ids_that_are_not_integers(self):
+        todo = make_todo(self.user, datetime(2025, 3, 10, 8, tzinfo=ZoneInfo("UTC")))
+        response = self.client.post(self.url, {"operations": [
+            {"op": "delete", "id": [todo.id]},
+            {"op": "delete", "id": True},
+            {"op": "update", "id": {"id": todo.id}, "data": {}},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [r["errors"] for r in response.data["results"]], [{"id": ["A valid integer is required."]}] * 3
+        )
+        self.assertTrue(Todo.objects.filter(id=todo.id).exists())
+
+
+class OverlapTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.existing = make_todo(self.user, datetime(2025, 3, 10, 9, tzinfo=ZoneInfo("UTC")))
+
+    def add(self, start, end, **extra):
+        return self.client.post("/api/Diary_todo/add_todo/", {
+            "title": "new", "start_time": f"2025-03-10T{start}:00Z", "end_time": f"2025-03-10T{end}:00Z", **extra,
+        })
+
+    def test_add_todo_rejects_overlap_unless_allowed(self):
+        response = self.add("09:30", "10:30")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["conflicts"], [self.existing.id])
+
+        self.assertEqual(self.add("10:00", "11:00").status_code, 201)  # touching is not overlapping
+        self.assertEqual(self.add("09:30", "10:30", allow_overlap="true").status_code, 201)
+
+    def test_batch_rejects_overlaps_inside_the_batch(self):
+        response = self.client.post("/api/Diary_todo/batch_todos/", {"operations": [
+            {"op": "create", "data": {"title": "a", "start_time": "2025-03-10T11:00:00Z", "end_time": "2025-03-10T12:00:00Z"}},
+            {"op": "create", "data": {"title": "b", "start_time": "2025-03-10T11:30:00Z", "end_time": "2025-03-10T12:30:00Z"}},
+            {"op": "update", "id": self.existing.id, "data": {"start_time": "2025-03-10T13:00:00Z", "end_time": "2025-03-10T14:00:00Z"}},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r["status"] for r in response.data["results"]], ["error", "error", "updated"])
+        self.assertEqual(response.data["results"][0]["errors"]["overlaps"], [{"operation": 1}])
+
+    def test_conflicts_endpoint_lists_pairs(self):
+        utc = ZoneInfo("UTC")
+        second = make_todo(self.user, datetime(2025, 3, 10, 9, 30, tzinfo=utc))
+        third = make_todo(self.user, datetime(2025, 3, 10, 9, 45, tzinfo=utc))
+        make_todo(self.user, datetime(2025, 3, 10, 12, tzinfo=utc))
+
+        response = self.client.get("/api/Diary_todo/conflicts/", {"start": "2025-03-10", "end": "2025-03-10"})
+
+        self.assertEqual(response.status_code, 200)
+        pairs = {frozenset((c["first"]["id"], c["second"]["id"])) for c in response.data["conflicts"]}
+        ids = (self.existing.id, second.id, third.id)
+        self.assertEqual(pairs, {frozenset((a, b)) for a in ids for b in ids if a < b})
+
+    def test_recurring_occurrences_count_as_overlaps(self):
+        series = make_todo(self.user, datetime(2025, 3, 1, 7, tzinfo=ZoneInfo("UTC")), title="series")
+        RecurrenceRule.objects.create(todo=series, frequency="daily")
+
+        response = self.add("07:30", "08:30")
+        self.assertEqual((response.status_code, response.data["conflicts"]), (400, [series.id]))
+        response = self.client.post("/api/Diary_todo/batch_todos/", {"operations": [
+            {"op": "create", "data": {"title": "a", "start_time": "2025-03-10T07:30:00Z", "end_time": "2025-03-10T08:30:00Z"}},
+        ]}, format="json")
+        self.assertEqual(response.data["results"][0]["errors"]["overlaps"], [{"todo": series.id}])
+
+        self.assertEqual(self.add("07:30", "08:30", allow_overlap="true").status_code, 201)
+        response = self.client.get("/api/Diary_todo/conflicts/", {"start": "2025-03-09", "end": "2025-03-11"})
+        self.assertEqual(response.data["count"], 1)
+        occurrence = next(row for row in response.data["conflicts"][0].values() if row["id"] == series.id)
+        self.assertEqual(str(occurrence["occurrence"]), "2025-03-10")
+
+
+class RecurrenceTests(APITestBase):
+    def add_gym(self, **rule):
+        response = self.client.post("/api/Diary_todo/add_todo/", {
+            "title": "gym",
+            "start_time": "2025-03-03T14:00:00Z",  # a Monday
+            "end_time": "2025-03-03T16:00:00Z",
+            "recurrence": {"frequency": "weekly", "weekdays": [0, 2], **rule},
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data["id"]
+
+    def week(self, start="2025-03-10", end="2025-03-16"):
+        response = self.client.get("/api/Diary_todo/get_todos_range/", {"start": start, "end": end})
+        return json.loads(b"".join(response.streaming_content))["days"]
+
+    def test_expands_only_inside_the_window(self):
+        gym = self.add_gym()
+        days = self.week()
+        occurrences = [(d["date"], t["id"], t["start_time"]) for d in days for t in d["todos"]]
+        self.assertEqual(occurrences, [
+            ("2025-03-10", gym, "2025-03-10T14:00:00Z"),
+            ("2025-03-12", gym, "2025-03-12T14:00:00Z"),
+        ])
+        self.assertEqual(Todo.objects.count(), 1)
+
+        day = self.client.get("/api/Diary_todo/get_all_todos/", {"date": "2025-03-12"}).data["results"]
+        self.assertEqual([(t["id"], t["occurrence"]) for t in day], [(gym, "2025-03-12")])
+
+    def test_count_and_until_bound_the_series(self):
+        counted = self.add_gym(count=3)  # Mar 3, Mar 5, Mar 10
+        self.assertEqual([d["date"] for d in self.week() if d["todos"]], ["2025-03-10"])
+        self.client.delete(f"/api/Diary_todo/delete_todo/{counted}/")
+
+        self.add_gym(until="2025-03-05")
+        self.assertEqual([d["date"] for d in self.week() if d["todos"]], [])
+        self.assertEqual([d["date"] for d in self.week("2025-03-03", "2025-03-09") if d["todos"]], ["2025-03-03", "2025-03-05"])
+
+    def test_overrides_are_per_occurrence(self):
+        gym = self.add_gym()
+        response = self.client.patch(f"/api/Diary_todo/check_todo/{gym}/true/?occurrence=2025-03-12")
+        self.assertEqual(response.status_code, 200)
+        self.client.delete(f"/api/Diary_todo/delete_todo/{gym}/?occurrence=2025-03-10")
+        self.assertEqual(
+            self.client.patch(f"/api/Diary_todo/check_todo/{gym}/true/?occurrence=2025-03-11").status_code, 404
+        )
+
+        todos = [t for d in self.week() for t in d["todos"]]
+        self.assertEqual([(t["occurrence"], t["status"]) for t in todos], [("2025-03-12", "completed")])
+        self.assertEqual(RecurrenceOverride.objects.count(), 2)
+
+
+class SearchTests(APITestBase):
+    url = "/api/Diary_todo/search/"
+
+    def setUp(self):
+        super().setUp()
+        Diary.objects.create(user=self.user, pub_date="2025-03-01", text="Long walk in the forest with <b>Sam</b>.")
+        Diary.objects.create(user=self.user, pub_date="2025-03-02", text="Forest, forest and more forest.")
+        self.todo = make_todo(
+            self.user, datetime(2025, 3, 3, 9, tzinfo=ZoneInfo("UTC")),
+            title="Forest run", description="Easy pace",
+        )
+        other = User.objects.create_user(email="b@example.com", username="bob", password="password123")
+        Diary.objects.create(user=other, pub_date="2025-03-01", text="Forest secrets")
+
+    def test_ranks_and_highlights_only_own_entries(self):
+        response = self.client.get(self.url, {"q": "forest"})
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual(len(results), 3)
+        diaries = [str(r["date"]) for r in results if r["type"] == "diary"]
+        self.assertEqual(diaries, ["2025-03-02", "2025-03-01"])  # most occurrences ranks first
+        snippets = {r["id"]: r["snippet"] for r in results if r["type"] == "diary"}
+        self.assertIn("<mark>forest</mark>", " ".join(snippets.values()))
+        self.assertIn("&lt;b&gt;Sam&lt;/b&gt;", " ".join(snippets.values()))
+        todo_hit = next(r for r in results if r["type"] == "todo")
+        self.assertEqual(todo_hit["title"], "<mark>Forest</mark> run")
+        self.assertEqual(todo_hit["start_time"], self.todo.start_time)
+
+    def test_index_follows_writes_and_paginates(self):
+        self.todo.description = "Bring a headlamp"
+        self.todo.save()
+        self.assertEqual([r["id"] for r in self.client.get(self.url, {"q": "headl"}).data["results"]], [self.todo.id])
+        self.todo.delete()
+        self.assertEqual(self.client.get(self.url, {"q": "headlamp"}).data["results"], [])
+
+        first = self.client.get(self.url, {"q": "forest", "type": "diary", "page_size": 1}).data
+        self.assertEqual((len(first["results"]), first["next"]), (1, 2))
+        second = self.client.get(self.url, {"q": "forest", "type": "diary", "page_size": 1, "page": 2}).data
+        self.assertIsNone(second["next"])
+
+    def test_query_does_not_match_the_user_id(self):
+        Diary.objects.create(user=self.user, pub_date="2025-03-04", text=f"Room {self.user.id} again")
+        results = self.client.get(self.url, {"q": str(self.user.id)}).data["results"]
+        self.assertEqual([r["date"] for r in results], [datetime(2025, 3, 4).date()])
+        self.assertIn(f"<mark>{self.user.id}</mark>", results[0]["snippet"])
+
+    def test_operators_in_input_are_literal(self):
+        response = self.client.get(self.url, {"q": 'forest" OR NOT ('})
+        self.assertEqual(response.status_code, 200)
+
+
+class RequestMetricsTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+
+    def test_metrics_aggregate_per_view(self):
+        Diary.objects.create(user=self.user, pub_date="2025-03-01", text="hello")
+        self.client.get("/api/Diary_todo/get_diary_by_date/", {"date": "2025-03-01"})
+        self.client.get("/api/Diary_todo/get_diary_by_date/", {"date": "10/03/2025"})
+
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        labels = 'view="get_diary_by_date",method="GET"'
+        self.assertIn(f'my_day_requests_total{{{labels},status="200"}} 1', body)
+        self.assertIn(f'my_day_requests_total{{{labels},status="400"}} 1', body)
+        self.assertIn(f'my_day_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', body)
+        queries = next(line for line in body.splitlines() if line.startswith(f"my_day_request_queries_total{{{labels}}}"))
+        self.assertGreaterEqual(int(queries.split()[-1]), 1)
+
+    def test_sampled_requests_are_logged_as_json(self):
+        make_todo(self.user, datetime(2025, 3, 3, 9, tzinfo=ZoneInfo("UTC")))
+        with self.settings(REQUEST_METRICS_SAMPLE_RATE=1.0), self.assertLogs("my_day.requests") as logs:
+            self.client.get("/api/Diary_todo/get_all_todos/", {"date": "2025-03-03"})
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record["view"], record["status"]), ("get_all_todos", 200))
+        self.assertGreater(record["serializer_ms"], 0)
+        self.assertGreater(record["bytes"], 0)
+
+    def test_metrics_are_not_public(self):
+        response = self.client.get("/metrics", REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(response.status_code, 403)
+
+
+
+@override_settings(COMPRESSION_LEVELS={"gzip": 6})
+class CompressionTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 29):
+            Diary.objects.create(user=self.user, pub_date=f"2025-02-{day:02d}", text="dear diary, today I " * 60)
+
+    def test_large_responses_are_compressed(self):
+        plain = self.client.get("/api/Diary_todo/get_all_diaries/alice/")
+        response = self.client.get("/api/Diary_todo/get_all_diaries/alice/", HTTP_ACCEPT_ENCODING="br, gzip;q=0.8")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertLess(len(response.content), len(plain.content) // 10)
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        refused = self.client.get("/api/Diary_todo/get_all_diaries/alice/", HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertFalse(refused.has_header("Content-Encoding"))
+
+    def test_small_and_exempt_responses_are_not(self):
+        small = self.client.get("/api/Diary_todo/get_all_todos/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(small.status_code, 200)
+        self.assertFalse(small.has_header("Content-Encoding"))
+
+        token = str(RefreshToken.for_user(self.user).access_token)
+        verify = Client().get(
+            "/api/user_authentication/verify_token/", HTTP_AUTHORIZATION=f"Bearer {token}", HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertFalse(verify.has_header("Content-Encoding"))
+
+    def test_streamed_exports_are_compressed_per_chunk(self):
+        plain = b"".join(self.client.get("/api/Diary_todo/export/").streaming_content)
+        response = self.client.get("/api/Diary_todo/export/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertFalse(response.has_header("Content-Length"))
+        unzipped = gzip.decompress(b"".join(response.streaming_content))
+        # Only the header's exported_at differs.
+        self.assertEqual(unzipped.split(b"\n")[1:], plain.split(b"\n")[1:])
+
+        zipped = self.client.get("/api/Diary_todo/export/", {"zip": "1"}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(zipped.has_header("Content-Encoding"))
+
+    def test_weakened_etag_still_revalidates(self):
+        url = "/api/Diary_todo/get_diary_by_date/"
+        response = self.client.get(url, {"date": "2025-02-03"}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        again = self.client.get(url, {"date": "2025-02-03"}, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_negotiation_and_async_streams(self):
+        self.assertEqual(negotiate("deflate, gzip;q=0.5").name, "gzip")
+        self.assertEqual(negotiate("*").name, "gzip")
+        self.assertIsNone(negotiate("identity, deflate"))
+        self.assertIsNone(negotiate(""))
+
+        async def chunks():
+            for i in range(3):
+                yield f"line {i}\n".encode()
+
+        response = StreamingHttpResponse(chunks(), content_type="application/x-ndjson")
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        CompressionMiddleware(lambda request: response).compress(request, response)
+
+        async def consume():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(gzip.decompress(asyncio.run(consume())), b"line 0\nline 1\nline 2\n")
+
+class AsyncViewsTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+        Diary.objects.create(user=self.user, pub_date="2025-03-03", text="hello")
+        for hour in (9, 11, 13):
+            make_todo(self.user, datetime(2025, 3, 3, hour, tzinfo=ZoneInfo("UTC")), title=f"at {hour}")
+        series = make_todo(self.user, datetime(2025, 3, 1, 12, tzinfo=ZoneInfo("UTC")), title="series")
+        RecurrenceRule.objects.create(todo=series, frequency="daily")
+
+    def test_bodies_and_headers_match_the_drf_views(self):
+        for path, params in (
+            ("get_all_todos/", {"date": "2025-03-03", "page_size": 2}),
+            ("get_all_todos/", {"date": "2025-03-03"}),
+            ("get_all_todos/", {"page_size": 2}),
+            ("get_diary_by_date/", {"date": "2025-03-03"}),
+            (f"user_diaries/{self.user.id}/", {"page_size": 1}),
+        ):
+            sync = self.client.get(f"/api/Diary_todo/{path}", params)
+            cache.clear()
+            native = Client().get(f"/api/Diary_todo/async/{path}", params, **self.auth)
+            self.assertEqual(native.status_code, 200, path)
+            self.assertEqual(json.loads(native.content.replace(b"/async/", b"/")), json.loads(sync.content), path)
+            self.assertEqual(native.get("Link", "").replace("/async/", "/"), sync.get("Link", ""), path)
+
+    async def test_etag_and_auth(self):
+        client = AsyncClient()
+        url = "/api/Diary_todo/async/get_diary_by_date/"
+        auth = {"Authorization": self.auth["HTTP_AUTHORIZATION"]}
+        first = await client.get(url, {"date": "2025-03-03"}, headers=auth)
+        self.assertEqual(first.status_code, 200)
+        again = await client.get(url, {"date": "2025-03-03"}, headers={**auth, "If-None-Match": first["ETag"]})
+        self.assertEqual(again.status_code, 304)
+
+        anonymous = await client.get(url)
+        self.assertEqual(anonymous.status_code, 401)
+        forged = await client.get(url, headers={"Authorization": "Bearer not.a.token"})
+        self.assertEqual(forged.status_code, 401)
+
+
+class DailyStatsTests(APITestBase):
+    def stats(self, day):
+        row = DailyStats.objects.filter(user=self.user, day=day).first()
+        return row and (row.todos_planned, row.todos_completed, row.scheduled_minutes, row.diary_words)
+
+    def test_write_paths_keep_the_rollup_current(self):
+        utc = ZoneInfo("UTC")
+        first = make_todo(self.user, datetime(2025, 3, 10, 9, tzinfo=utc), minutes=30)
+        make_todo(self.user, datetime(2025, 3, 10, 11, tzinfo=utc), minutes=90)
+        self.client.patch(f"/api/Diary_todo/check_todo/{first.id}/true/")
+        self.client.post("/api/Diary_todo/save_or_update_diary/", {"date": "2025-03-10", "content": "three short words"})
+        self.assertEqual(self.stats("2025-03-10"), (2, 1, 120, 3))
+
+        # Moving the completed todo to another day refreshes both days.
+        moved = datetime(2025, 3, 11, 9, tzinfo=utc)
+        self.client.post("/api/Diary_todo/batch_todos/", {"operations": [
+            {"op": "update", "id": first.id, "data": {
+                "start_time": moved.isoformat(), "end_time": (moved + timedelta(minutes=30)).isoformat(),
+            }},
+        ]}, format="json")
+        self.assertEqual(self.stats("2025-03-10"), (1, 0, 90, 3))
+        self.assertEqual(self.stats("2025-03-11"), (1, 1, 30, 0))
+
+        self.client.delete(f"/api/Diary_todo/delete_todo/{first.id}/")
+        self.assertIsNone(self.stats("2025-03-11"))
+
+    def test_endpoint_reads_one_row_per_day(self):
+        utc = ZoneInfo("UTC")
+        for day in (3, 4, 5, 7, 8):  # streaks of 3 and 2 days
+            make_todo(self.user, datetime(2025, 3, day, 9, tzinfo=utc), status="completed")
+        make_todo(self.user, datetime(2025, 3, 8, 12, tzinfo=utc))
+
+        with self.assertNumQueries(2):  # the range's rows, the current streak's days
+            response = self.client.get("/api/Diary_todo/stats/", {"start": "2025-03-03", "end": "2025-03-09"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["streak"], {"current": 2, "longest": 3})
+        self.assertEqual(len(response.data["buckets"]), 7)
+        self.assertEqual(response.data["totals"]["completion_rate"], round(5 / 6, 4))
+
+        weeks = self.client.get(
+            "/api/Diary_todo/stats/", {"start": "2025-03-03", "end": "2025-03-16", "group": "week"}
+        ).data["buckets"]
+        self.assertEqual([(str(w["start"]), w["todos_planned"]) for w in weeks], [("2025-03-03", 6), ("2025-03-10", 0)])
+
+    def test_backfill_command_rebuilds_history(self):
+        make_todo(self.user, datetime(2025, 3, 10, 9, tzinfo=ZoneInfo("UTC")), minutes=45)
+        Diary.objects.create(user=self.user, pub_date="2025-03-12", text="one two")
+        expected = sorted(DailyStats.objects.values_list("day", "todos_planned", "scheduled_minutes", "diary_words"))
+        DailyStats.objects.all().delete()
+
+        call_command("backfill_daily_stats", "--chunk-size", "1", stdout=StringIO())
+
+        self.assertEqual(
+            sorted(DailyStats.objects.values_list("day", "todos_planned", "scheduled_minutes", "diary_words")), expected,
+        )
+        self.assertEqual(len(expected), 2)
+
+
+
+class FastSerializationTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        utc = ZoneInfo("UTC")
+        make_todo(self.user, datetime(2025, 3, 10, 9, 0, 0, 123456, tzinfo=utc), title="caf\u00e9 \u2028 \U0001f600",
+                  description='quotes " and \\ and \n', status="completed")
+        make_todo(self.user, datetime(2025, 3, 10, 23, 30, tzinfo=utc), minutes=45)
+        series = make_todo(self.user, datetime(2025, 3, 3, 7, tzinfo=utc), title="standup")
+        RecurrenceRule.objects.create(todo=series, frequency="daily")
+        Diary.objects.create(user=self.user, pub_date="2025-03-10", text="d\u00eda \u2029")
+        Diary.objects.create(user=self.user, pub_date="2025-03-11", text="")
+
+    def test_todo_list_matches_model_serializer_bytes(self):
+        from .recurrence import occurrences_between
+
+        todos = list(Todo.objects.filter(user=self.user).order_by("start_time"))
+        occurrences = occurrences_between(self.user, datetime(2025, 3, 10).date(), datetime(2025, 3, 10).date())
+        rows = list(Todo.objects.filter(user=self.user).order_by("start_time").values(*TODO_FIELDS))
+        for zone in ("UTC", "America/New_York"):
+            with timezone.override(ZoneInfo(zone)):
+                expected = JSONRenderer().render(
+                    TodoSerializer(todos, many=True).data + OccurrenceSerializer(occurrences, many=True).data
+                )
+                actual = ORJSONRenderer().render(serialize_todos(rows + occurrences))
+                self.assertEqual(actual, expected)
+        self.assertIn(b"\\u2028", actual)
+
+        response = self.client.get("/api/Diary_todo/get_all_todos/")
+        expected = {"results": TodoSerializer(todos[::-1], many=True).data, "next": None}
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_diary_list_matches_model_serializer_bytes(self):
+        diaries = with_day_todos(Diary.objects.filter(user=self.user)).order_by("pub_date")
+        expected = JSONRenderer().render(DiarySerializer(diaries, many=True).data)
+        rows = list(Diary.objects.filter(user=self.user).order_by("pub_date").values("id", "pub_date", "text"))
+        with self.assertNumQueries(1):
+            data = diaries_data(rows, self.user.id)
+        self.assertEqual(ORJSONRenderer().render(data), expected)
+
+        response = self.client.get("/api/Diary_todo/get_all_diaries/alice/")
+        expected = {"results": DiarySerializer(diaries.reverse(), many=True).data, "next": None}
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_renderer_falls_back_for_what_orjson_cannot_encode(self):
+        data = {"big": 2 ** 70, 1: timedelta(seconds=90), "when": datetime(2025, 3, 10, 9, 0, 0, 123456, tzinfo=ZoneInfo("UTC"))}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        del data["big"]
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(data, "application/json; indent=2"), JSONRenderer().render(data, "application/json; indent=2"))
+
+    def test_search_payload_matches_drf_bytes(self):
+        # bm25 ranks are floats like -1.04e-06, which orjson would spell -1.04e-6.
+        for day in range(1, 6):
+            Diary.objects.create(user=self.user, pub_date=f"2025-04-0{day}", text="walk " * day)
+        response = self.client.get("/api/Diary_todo/search/", {"q": "walk"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"e-06", response.content)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+
+class ReminderTests(APITestBase):
+    def setUp(self):
+        super().setUp()
+        self.now = datetime(2025, 3, 10, 8, 0, tzinfo=ZoneInfo("UTC"))
+
+    def scheduler(self, **kwargs):
+        return ReminderScheduler(
+            lead=timedelta(minutes=15), max_lateness=timedelta(minutes=10), clock=lambda: self.now, **kwargs,
+        )
+
+    def test_sends_each_reminder_once_across_restarts(self):
+        soon = make_todo(self.user, self.now + timedelta(minutes=10), title="standup")
+        later = make_todo(self.user, self.now + timedelta(minutes=40), title="review")
+
+        scheduler = self.scheduler(refill_interval=timedelta(minutes=30))
+        self.assertEqual(scheduler.tick(), 1)
+        self.assertEqual([m.subject for m in mail.outbox], ["Starting soon: standup"])
+        self.assertEqual(mail.outbox[0].to, ["a@example.com"])
+        self.assertEqual(self.scheduler().tick(), 0)  # a restarted worker
+        self.assertEqual(len(mail.outbox), 1)
+
+        # The worker sleeps until exactly when "review" is due.
+        self.assertEqual(scheduler.next_wakeup(), later.start_time - timedelta(minutes=15))
+        self.now = scheduler.next_wakeup() - timedelta(seconds=1)
+        self.assertEqual(scheduler.tick(), 0)
+        self.now += timedelta(seconds=1)
+        self.assertEqual(scheduler.tick(), 1)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(Todo.objects.filter(id__in=[soon.id, later.id], reminded=True).count(), 2)
+
+    def test_moved_todo_is_reminded_at_its_new_time(self):
+        todo = make_todo(self.user, self.now + timedelta(minutes=10))
+        self.scheduler().tick()
+        moved = self.now + timedelta(minutes=20)
+        self.client.post("/api/Diary_todo/batch_todos/", {"operations": [
+            {"op": "update", "id": todo.id, "data": {
+                "start_time": moved.isoformat(), "end_time": (moved + timedelta(minutes=30)).isoformat(),
+            }},
+        ]}, format="json")
+        todo.refresh_from_db()
+        self.assertFalse(todo.reminded)
+
+        self.now += timedelta(minutes=5)
+        self.assertEqual(self.scheduler().tick(), 1)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_skips_stale_reminders_and_retries_failed_ones(self):
+        stale = make_todo(self.user, self.now - timedelta(minutes=30))
+
+        class FlakyBroker(Broker):
+            def __init__(self):
+                self.fail = True
+
+            def deliver(self, todos):
+                if self.fail:
+                    return list(todos)
+                return EmailBroker().deliver(todos)
+
+        broker = FlakyBroker()
+        todo = make_todo(self.user, self.now + timedelta(minutes=5))
+        with self.assertLogs("Diary_todo.reminders", "WARNING"):
+            self.assertEqual(self.scheduler(broker=broker).tick(), 0)
+        todo.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertFalse(todo.reminded)
+        self.assertTrue(stale.reminded)
+
+        broker.fail = False
+        self.assertEqual(self.scheduler(broker=broker).tick(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_backs_off_while_the_broker_fails(self):
+        class DownBroker(Broker):
+            def deliver(self, todos):
+                return list(todos)
+
+        for minutes in (1, 2):
+            make_todo(self.user, self.now + timedelta(minutes=minutes))
+        scheduler = self.scheduler(broker=DownBroker(), batch_size=2)
+        for expected in (5, 10, 20):
+            self.assertEqual(scheduler.tick(), 0)
+            self.assertEqual(scheduler.next_wakeup() - self.now, timedelta(seconds=expected))
+            self.now = scheduler.next_wakeup()
+        self.assertFalse(Todo.objects.filter(reminded=True).exists())
+
+    def test_command_runs_once(self):
+        make_todo(self.user, datetime.now(ZoneInfo("UTC")) + timedelta(minutes=5))
+        call_command("run_reminders", "--once", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+def current_rss():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+
+
+class ExportTests(APITestBase):
+    url = "/api/Diary_todo/export/"
+
+    def setUp(self):
+        super().setUp()
+        Diary.objects.create(user=self.user, pub_date="2025-03-01", text='Line one,\n"quoted" line two')
+        self.todo = make_todo(self.user, datetime(2025, 3, 1, 9, tzinfo=ZoneInfo("UTC")), title="run")
+
+    def test_ndjson_csv_and_zip(self):
+        lines = b"".join(self.client.get(self.url).streaming_content).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([r["type"] for r in records], ["export", "diary", "todo"])
+        self.assertEqual(records[1]["text"], 'Line one,\n"quoted" line two')
+        self.assertEqual(records[2]["start_time"], "2025-03-01T09:00:00Z")
+
+        response = self.client.get(self.url, {"output": "csv"})
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual([(r["type"], r["title"]) for r in rows], [("diary", ""), ("todo", "run")])
+        self.assertEqual(rows[0]["text"], 'Line one,\n"quoted" line two')
+
+        response = self.client.get(self.url, {"output": "csv", "zip": "1"})
+        self.assertEqual(response["Content-Type"], "application/zip")
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            (name,) = archive.namelist()
+            self.assertTrue(name.endswith(".csv"))
+            self.assertEqual(len(list(csv.DictReader(io.StringIO(archive.read(name).decode())))), 2)
+
+    @skipUnless(os.path.exists("/proc/self/status"), "needs /proc to read RSS")
+    def test_500k_rows_stream_in_constant_memory(self):
+        table = Todo._meta.db_table
+        columns = "user_id, title, description, start_time, end_time, status, day, reminded, updated_at"
+        with connection.cursor() as cursor:
+            for _ in range(19):  # 2 ** 19 = 524288 rows, doubling in SQL
+                cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}")
+        self.assertGreaterEqual(Todo.objects.count(), 500_000)
+
+        response = self.client.get(self.url, {"zip": "1"})
+        baseline = peak = current_rss()
+        size = 0
+        for i, chunk in enumerate(response.streaming_content):
+            size += len(chunk)
+            if i % 50 == 0:
+                peak = max(peak, current_rss())
+        self.assertGreater(size, 1_000_000)
+        self.assertLess(peak - baseline, 50 * 1024 * 1024)
+
+
+ICS_SAMPLE = """BEGIN:VCALENDAR\r
+VERSION:2.0\r
+BEGIN:VEVENT\r
+SUMMARY:Standup\\, daily\r
+DESCRIPTION:A long description that the exporter folded onto\r
+  a second line\r
+DTSTART;TZID=Europe/Paris:20250303T093000\r
+DURATION:PT15M\r
+RRULE:FREQ=WEEKLY;BYDAY=MO,WE,FR;UNTIL=20250331T000000Z\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+SUMMARY:Holiday\r
+DTSTART;VALUE=DATE:20250305\r
+DTEND;VALUE=DATE:20250306\r
+STATUS:COMPLETED\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+SUMMARY:Moved\r
+DTSTART:20250306T100000Z\r
+STATUS:CANCELLED\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+SUMMARY:Broken\r
+DTSTART:tomorrow\r
+END:VEVENT\r
+END:VCALENDAR\r
+"""
+
+
+class ImportTests(APITestBase):
+    url = "/api/Diary_todo/import/"
+
+    def upload(self, name, content, **params):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post(self.url, {"file": upload, **params}, format="multipart")
+
+    def test_ndjson_round_trips_an_export(self):
+        other = User.objects.create_user(email="b@example.com", username="bob", password="password123")
+        Diary.objects.create(user=other, pub_date="2025-03-01", text="first")
+        Diary.objects.create(user=other, pub_date="2025-03-02", text="second")
+        gym = make_todo(other, datetime(2025, 3, 1, 7, tzinfo=ZoneInfo("UTC")), title="gym", status="completed")
+        RecurrenceRule.objects.create(todo=gym, frequency="weekly", weekdays=[0, 5])
+        client = APIClient()
+        client.force_authenticate(other)
+        exported = b"".join(client.get("/api/Diary_todo/export/").streaming_content).decode()
+        lines = exported.splitlines()
+        lines.insert(2, "{not json")
+        lines.append(json.dumps({
+            "type": "todo", "title": "backwards",
+            "start_time": "2025-03-01T10:00:00Z", "end_time": "2025-03-01T09:00:00Z",
+        }))
+
+        report = self.upload("history.ndjson", "\n".join(lines)).data
+
+        self.assertEqual((report["diaries"], report["todos"], report["error_count"]), (2, 1, 2))
+        self.assertEqual([e["line"] for e in report["errors"]], [3, 6])
+        self.assertEqual(report["errors"][1]["error"], "Start time must be before end time")
+        imported = Todo.objects.get(user=self.user)
+        self.assertEqual((imported.title, imported.status, imported.recurrence.weekdays), ("gym", "completed", [0, 5]))
+        self.assertEqual(DailyStats.objects.get(user=self.user, day="2025-03-01").todos_completed, 1)
+
+        again = self.upload("history.ndjson", exported).data
+        self.assertEqual((again["todos"], again["skipped"]), (0, 1))
+        self.assertEqual(Diary.objects.filter(user=self.user).count(), 2)
+
+    def test_recurring_import_invalidates_later_days(self):
+        url = "/api/Diary_todo/get_all_todos/"
+        etag = self.client.get(url, {"date": "2025-03-05"})["ETag"]
+        self.upload("history.ndjson", json.dumps({
+            "type": "todo", "title": "stretch", "start_time": "2025-03-01T07:00:00Z",
+            "end_time": "2025-03-01T07:15:00Z", "recurrence": {"frequency": "daily"},
+        }))
+
+        response = self.client.get(url, {"date": "2025-03-05"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(t["title"], t["occurrence"]) for t in response.data["results"]], [("stretch", "2025-03-05")])
+
+    def test_rejects_rules_the_api_would_reject(self):
+        def todo(hour, **rule):
+            return json.dumps({
+                "type": "todo", "title": "t", "start_time": f"2025-03-01T{hour:02}:00:00Z",
+                "end_time": f"2025-03-01T{hour:02}:30:00Z", "recurrence": {"frequency": "weekly", **rule},
+            })
+
+        report = self.upload("history.ndjson", "\n".join([
+            todo(7, count=0), todo(8, weekdays=[1, 9]), todo(9, interval=0), todo(10, count=3, weekdays=[6]),
+        ])).data
+
+        self.assertEqual((report["todos"], report["error_count"]), (1, 3))
+        self.assertEqual([e["line"] for e in report["errors"]], [1, 2, 3])
+        self.assertIn("count", report["errors"][0]["error"])
+        self.assertIn("weekdays", report["errors"][1]["error"])
+        self.assertEqual(RecurrenceRule.objects.get().count, 3)
+
+    def test_invalid_utf8_reports_what_was_imported(self):
+        good = json.dumps({"type": "diary", "date": "2025-03-01", "text": "kept"}).encode()
+        upload = SimpleUploadedFile("history.ndjson", good + b"\n" + b'{"type": "diary", "text": "\xff"}\n' + good)
+        response = self.client.post(self.url, {"file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["diaries"], 1)
+        self.assertIn("after line 1", response.data["error"])
+        self.assertEqual(response.data["aborted"], response.data["error"])
+        self.assertEqual(Diary.objects.get(user=self.user).text, "kept")
+
+    def test_ics_events_become_todos(self):
+        report = self.upload("calendar.ics", ICS_SAMPLE).data
+
+        self.assertEqual((report["todos"], report["error_count"]), (2, 1))
+        standup = Todo.objects.get(user=self.user, title="Standup, daily")
+        self.assertEqual(standup.description, "A long description that the exporter folded onto a second line")
+        self.assertEqual(standup.start_time, datetime(2025, 3, 3, 8, 30, tzinfo=ZoneInfo("UTC")))
+        self.assertEqual(standup.end_time - standup.start_time, timedelta(minutes=15))
+        self.assertEqual((standup.recurrence.weekdays, str(standup.recurrence.until)), ([0, 2, 4], "2025-03-31"))
+        holiday = Todo.objects.get(user=self.user, title="Holiday")
+        self.assertEqual((holiday.status, holiday.end_time - holiday.start_time), ("completed", timedelta(days=1)))
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".ics", delete=False) as calendar:
+            calendar.write(ICS_SAMPLE)
+        self.addCleanup(os.unlink, calendar.name)
+        out, err = StringIO(), StringIO()
+        call_command("import_history", "alice", calendar.name, stdout=out, stderr=err)
+        self.assertIn("Imported 0 diaries and 2 todos", out.getvalue())
+        self.assertIn("line 22", err.getvalue())
+
+
+class SyncTests(APITestBase):
+    url = "/api/Diary_todo/sync/"
+
+    def sync(self, cursor=None, **params):
+        if cursor:
+            params["since"] = cursor
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_first_sync_returns_everything(self):
+        todo = make_todo(self.user, datetime(2025, 3, 10, 9, tzinfo=ZoneInfo("UTC")), title="plain")
+        gym = make_todo(self.user, datetime(2025, 3, 3, 14, tzinfo=ZoneInfo("UTC")), title="gym")
+        rule = RecurrenceRule.objects.create(todo=gym, frequency="weekly", weekdays=[0])
+        RecurrenceOverride.objects.create(rule=rule, occurrence="2025-03-10", cancelled=True)
+        diary = Diary.objects.create(user=self.user, pub_date="2025-03-10", text="hello")
+        other = User.objects.create_user(email="b@example.com", username="bob", password="password123")
+        make_todo(other, datetime(2025, 3, 10, 9, tzinfo=ZoneInfo("UTC")))
+
+        data = self.sync()
+
+        self.assertEqual([t["id"] for t in data["todos"]], [todo.id, gym.id])
+        self.assertIsNone(data["todos"][0]["recurrence"])
+        self.assertEqual(data["todos"][1]["recurrence"]["weekdays"], [0])
+        self.assertEqual(
+            data["todos"][1]["recurrence"]["overrides"],
+            [{"occurrence": "2025-03-10", "status": None, "cancelled": True}],
+        )
+        self.assertEqual([(d["id"], d["text"]) for d in data["diaries"]], [(diary.id, "hello")])
+        self.assertEqual(data["deleted"], {"todos": [], "diaries": []})
+        self.assertFalse(data["has_more"])
+
+    @override_settings(SYNC_SETTLE_SECONDS=0)
+    def test_next_sync_returns_only_changes(self):
+        start = datetime(2025, 3, 10, 9, tzinfo=ZoneInfo("UTC"))
+        kept, checked, dropped = (make_todo(self.user, start, title=title) for title in ("kept", "checked", "dropped"))
+        Diary.objects.create(user=self.user, pub_date="2025-03-10", text="hello")
+        cursor = self.sync()["cursor"]
+
+        self.client.patch(f"/api/Diary_todo/check_todo/{checked.id}/true/")
+        self.client.delete(f"/api/Diary_todo/delete_todo/{dropped.id}/")
+        self.client.post("/api/Diary_todo/save_or_update_diary/", {"date": "2025-03-11", "content": "next"})
+        data = self.sync(cursor)
+
+        self.assertEqual([(t["id"], t["status"]) for t in data["todos"]], [(checked.id, "completed")])
+        self.assertEqual([d["pub_date"] for d in data["diaries"]], ["2025-03-11"])
+        self.assertEqual(data["deleted"], {"todos": [dropped.id], "diaries": []})
+
+        data = self.sync(data["cursor"])
+        self.assertEqual((data["todos"], data["diaries"], data["deleted"]["todos"]), ([], [], []))
+
+    @override_settings(SYNC_SETTLE_SECONDS=0)
+    def test_bulk_writes_and_overrides_bump_updated_at(self):
+        start = datetime(2025, 3, 3, 14, tzinfo=ZoneInfo("UTC"))
+        gym = make_todo(self.user, start, title="gym")
+        RecurrenceRule.objects.create(todo=gym, frequency="weekly", weekdays=[0])
+        moved = make_todo(self.user, start + timedelta(days=1), title="moved")
+        dropped = make_todo(self.user, start + timedelta(days=2), title="dropped")
+        cursor = self.sync()["cursor"]
+
+        self.client.patch(f"/api/Diary_todo/check_todo/{gym.id}/true/?occurrence=2025-03-10")
+        self.client.post("/api/Diary_todo/batch_todos/", {"allow_overlap": True, "operations": [
+            {"op": "update", "id": moved.id, "data": {"title": "renamed"}},
+            {"op": "delete", "id": dropped.id},
+        ]}, format="json")
+        data = self.sync(cursor)
+
+        self.assertEqual({t["id"] for t in data["todos"]}, {gym.id, moved.id})
+        gym_data = next(t for t in data["todos"] if t["id"] == gym.id)
+        self.assertEqual(gym_data["recurrence"]["overrides"][0]["status"], "completed")
+        self.assertEqual(data["deleted"]["todos"], [dropped.id])
+
+    def test_query_count_does_not_grow_with_changes(self):
+        start = datetime(2025, 3, 3, 14, tzinfo=ZoneInfo("UTC"))
+        for i in range(30):
+            todo = make_todo(self.user, start + timedelta(days=i))
+            rule = RecurrenceRule.objects.create(todo=todo, frequency="daily")
+            RecurrenceOverride.objects.create(rule=rule, occurrence=(start + timedelta(days=i + 1)).date(), status="completed")
+            Diary.objects.create(user=self.user, pub_date=(start + timedelta(days=i)).date(), text="d")
+
+        # todos, overrides of their rules, diaries, tombstones
+        with self.assertNumQueries(4):
+            data = self.sync()
+        self.assertEqual((len(data["todos"]), len(data["diaries"])), (30, 30))
+
+    def test_pages_with_has_more(self):
+        start = datetime(2025, 3, 10, 9, tzinfo=ZoneInfo("UTC"))
+        ids = [make_todo(self.user, start + timedelta(hours=i)).id for i in range(5)]
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            data = self.sync(cursor, limit=2)
+            seen += [t["id"] for t in data["todos"]]
+            cursor, pages = data["cursor"], pages + 1
+            if not data["has_more"]:
+                break
+        self.assertEqual((seen, pages), (ids, 3))
+
+    def test_rejects_bad_and_expired_cursors(self):
+        response = self.client.get(self.url, {"since": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+        long_ago = timezone.now() - timedelta(days=120)
+        stale = sync.encode_cursor({stream: (long_ago, 0) for stream in sync.STREAMS})
+        response = self.client.get(self.url, {"since": stale})
+        self.assertEqual(response.status_code, 410)
+
+    def test_prune_tombstones(self):
+        todo = make_todo(self.user, datetime(2025, 3, 10, 9, tzinfo=ZoneInfo("UTC")))
+        todo.delete()
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=91))
+        make_todo(self.user, datetime(2025, 3, 10, 9, tzinfo=ZoneInfo("UTC"))).delete()
+
+        out = StringIO()
+        call_command("prune_tombstones", stdout=out)
+        self.assertIn("Pruned 1 tombstones", out.getvalue())
+        self.assertEqual(Tombstone.objects.count(), 1)
+
+
+class ChangeFeedTests(APITestBase):
+    url = "/api/Diary_todo/async/changes/"
+
+    async def test_streams_committed_writes_to_the_users_feed(self):
+        token = str(RefreshToken.for_user(self.user).access_token)
+        response = await AsyncClient().get(self.url, {"access_token": token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b"retry: 5000\n\n")
+
+        def write():
+            with self.captureOnCommitCallbacks(execute=True):
+                invalidate_day(self.user.id, datetime(2025, 3, 10).date())
+                invalidate_day(self.user.id + 1, datetime(2025, 3, 10).date())
+
+        await sync_to_async(write)()
+        chunk = await asyncio.wait_for(anext(chunks), 1)
+        self.assertEqual(chunk, b'data: {"type":"day","date":"2025-03-10"}\n\n')
+        # The server cancels the pending read when the client disconnects.
+        waiting = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        self.assertEqual(feed.get_broker().subscriber_count(), 0)
+
+        anonymous = await AsyncClient().get(self.url)
+        self.assertEqual(anonymous.status_code, 401)
+
+    async def test_heartbeat_when_idle(self):
+        broker = feed.LocalBroker()
+        stream = feed.stream(broker.subscribe(self.user.id), broker, heartbeat=0.01)
+        await anext(stream)
+        self.assertEqual(await anext(stream), b": ping\n\n")
+        await stream.aclose()
+
+    @override_settings(CHANGE_FEED_QUEUE_SIZE=8)
+    async def test_slow_subscriber_gets_resync_instead_of_a_growing_queue(self):
+        subscription = feed.LocalBroker().subscribe(self.user.id)
+        for day in range(1, 21):
+            subscription.put({"type": "day", "date": f"2025-03-{day:02}"})
+        subscription.put({"type": "day", "date": "2025-03-20"})  # duplicate, coalesced
+
+        events = await subscription.get(timeout=0)
+        self.assertEqual(events[0], feed.RESYNC)
+        self.assertEqual(len(events), 4)
+        self.assertEqual(events[-1], {"type": "day", "date": "2025-03-20"})
+
+    async def test_5k_idle_subscribers_within_memory_budget(self):
+        broker = feed.LocalBroker()
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        baseline = tracemalloc.get_traced_memory()[0]
+        streams, pending = [], []
+        for i in range(5000):
+            stream = feed.stream(broker.subscribe(i % 100), broker, heartbeat=3600)
+            await anext(stream)
+            streams.append(stream)
+            # Each stream parked on its next event, as under an ASGI server.
+            pending.append(asyncio.ensure_future(anext(stream)))
+        await asyncio.sleep(0)
+        used = tracemalloc.get_traced_memory()[0] - baseline
+        self.assertLess(used, 5000 * 5 * 1024)
+
+        broker.publish(7, {"type": "user"})
+        await asyncio.sleep(0.1)
+        delivered = [task.result() for task in pending if task.done()]
+        self.assertEqual(delivered, [b'data: {"type":"user"}\n\n'] * 50)
+
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for stream in streams:
+            await stream.aclose()
+        self.assertEqual(broker.subscriber_count(), 0)
+
+
+class PatchDiaryTests(APITestBase):
+    url = "/api/Diary_todo/patch_diary/"
+
+    def patch(self, base_version, *ops, date="2025-03-10"):
+        ops = [{"start": start, "end": end, "text": text} for start, end, text in ops]
+        return self.client.patch(self.url, {"date": date, "base_version": base_version, "ops": ops}, format="json")
+
+    def test_creates_then_applies_ranges_to_the_base_version(self):
+        response = self.patch(0, (0, 0, "Rainy day. Stayed in."))
+        self.assertEqual((response.status_code, response.data["version"]), (200, 1))
+
+        response = self.patch(1, (0, 5, "Sunny"), (11, 20, "went out"))
+        self.assertEqual((response.status_code, response.data["version"]), (200, 2))
+        diary = Diary.objects.get(user=self.user)
+        self.assertEqual((diary.text, diary.version), ("Sunny day. went out.", 2))
+        self.assertEqual(DailyStats.objects.get(user=self.user, day="2025-03-10").diary_words, 4)
+        day = self.client.get("/api/Diary_todo/get_diary_by_date/", {"date": "2025-03-10"}).data
+        self.assertEqual((day["content"], day["version"]), ("Sunny day. went out.", 2))
+
+    def test_stale_base_version_is_a_conflict(self):
+        self.patch(0, (0, 0, "first tab"))
+        self.client.post("/api/Diary_todo/save_or_update_diary/", {"date": "2025-03-10", "content": "second tab"})
+
+        response = self.patch(1, (0, 5, "1st"))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual((response.data["version"], response.data["content"]), (2, "second tab"))
+        self.assertEqual(Diary.objects.get(user=self.user).text, "second tab")
+        self.assertEqual(self.patch(0, (0, 0, "again")).status_code, 409)
+
+    def test_one_read_and_one_update_per_edit(self):
+        Diary.objects.create(user=self.user, pub_date="2025-03-10", text="word " * 10_000)
+        # diary read, savepoint, UPDATE, DailyStats refresh (todos, diaries, upsert), release
+        with self.assertNumQueries(7):
+            response = self.patch(1, (50_000, 50_000, "end"))
+        self.assertEqual(response.data["version"], 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.patch(2, (0, 0, "")).data["version"], 2)
+
+    def test_offsets_are_utf16_code_units(self):
+        self.patch(0, (0, 0, "🙂 ok"))
+        self.assertEqual(self.patch(1, (3, 5, "fine")).status_code, 200)
+        self.assertEqual(Diary.objects.get(user=self.user).text, "🙂 fine")
+        self.assertEqual(self.patch(2, (1, 1, "x")).status_code, 400)  # inside the surrogate pair
+
+    def test_rejects_invalid_ops(self):
+        self.patch(0, (0, 0, "hello"))
+        for ops in ([(0, 99, "")], [(3, 4, "a"), (1, 2, "b")], [(2, 1, "")]):
+            self.assertEqual(self.patch(1, *ops).status_code, 400, ops)
+        response = self.client.patch(self.url, {"date": "2025-03-10", "base_version": "1", "ops": []}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Diary.objects.get(user=self.user).version, 1)
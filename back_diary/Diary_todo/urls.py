@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views 
+from . import async_views, views 
 
 urlpatterns = [
    path("create_diary/<int:user_id>/", views.create_diary, name="create_diary"),
@@ -8,12 +8,28 @@ urlpatterns = [
    path("day/<int:user_id>/", views.get_today, name="get_today"),
    path("get_all_diaries/<str:username>/", views.get_all_diaries, name="get_all_diaries"),
    path("get_all_todos/", views.get_all_todos, name="get_all_todos"),
+   path("get_todos_range/", views.get_todos_range, name="get_todos_range"),
+   path("conflicts/", views.get_conflicts, name="get_conflicts"),
    path("delete_todo/<int:pk>/", views.delete_todo, name="delete_todo"),
    path("check_todo/<int:pk>/<str:completed>/", views.check_todo, name="check_todo"),
    path("add_todo/", views.add_todo, name="add_todo"), 
+   path("batch_todos/", views.batch_todos, name="batch_todos"),
 
 
 
    path("save_or_update_diary/", views.save_or_update_diary, name="save_or_update_diary"),
+   path("patch_diary/", views.patch_diary, name="patch_diary"),
    path("get_diary_by_date/", views.get_diary_by_date, name="get_diary_by_date"),
+   path("search/", views.search_entries, name="search_entries"),
+   path("stats/", views.get_stats, name="get_stats"),
+   path("export/", views.export_history, name="export_history"),
+   path("import/", views.import_history, name="import_history"),
+   path("sync/", views.sync_changes, name="sync_changes"),
+   path("cache_stats/", views.cache_stats, name="cache_stats"),
+
+   # Native async variants for ASGI servers (see async_views).
+   path("async/get_all_todos/", async_views.get_all_todos, name="async_get_all_todos"),
+   path("async/get_diary_by_date/", async_views.get_diary_by_date, name="async_get_diary_by_date"),
+   path("async/user_diaries/<int:user_id>/", async_views.user_diaries, name="async_user_diaries"),
+   path("async/changes/", async_views.change_feed, name="change_feed"),
 ]  
\ No newline at end of file
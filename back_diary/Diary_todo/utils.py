@@ -0,0 +1,82 @@
+import heapq
+from datetime import datetime, time, timedelta
+
+from django.db import models
+from django.utils import timezone
+
+from user_authentication.models import User
+from .models import Todo
+
+
+def deleted_with_user(origin):
+    """Whether a ``post_delete`` ``origin`` is the deletion of a User (its rows go with it)."""
+    if isinstance(origin, models.QuerySet):
+        return origin.model is User
+    return isinstance(origin, User)
+
+
+def day_bounds(day, tz):
+    """
+    Return the aware ``[start, end)`` datetimes covering ``day`` in ``tz``.
+
+    Filtering on this half-open range keeps the ``start_time`` column bare,
+    so the ``(user, start_time)`` index can be used instead of a date cast.
+    """
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def group_by_local_day(todos, tz):
+    """
+    Yield ``(date, [todo, ...])`` for todos ordered by ``start_time``,
+    bucketing each one on its start date in ``tz``.
+    """
+    current_day, bucket = None, []
+    for todo in todos:
+        day = timezone.localtime(todo.start_time, tz).date()
+        if day != current_day and bucket:
+            yield current_day, bucket
+            bucket = []
+        current_day = day
+        bucket.append(todo)
+    if bucket:
+        yield current_day, bucket
+
+
+def resync_todo_days(user, chunk_size=2000):
+    """Recompute ``Todo.day`` for all of ``user``'s todos after a timezone change."""
+    tz = user.get_timezone()
+    batch = []
+    for todo in Todo.objects.filter(user=user).only("id", "start_time", "day").iterator(chunk_size=chunk_size):
+        day = timezone.localtime(todo.start_time, tz).date()
+        if day != todo.day:
+            todo.day = day
+            batch.append(todo)
+        if len(batch) >= chunk_size:
+            Todo.objects.bulk_update(batch, ["day"])
+            batch = []
+    if batch:
+        Todo.objects.bulk_update(batch, ["day"])
+
+
+def overlapping(todos, start, end):
+    """Narrow ``todos`` to those intersecting ``[start, end)``."""
+    return todos.filter(start_time__lt=end, end_time__gt=start)
+
+
+def find_overlaps(intervals):
+    """
+    Return every ``(key_a, key_b)`` pair of overlapping half-open intervals.
+
+    ``intervals`` yields ``(start, end, key)``. Sort by start, then sweep
+    while keeping a min-heap of the active intervals' ends: O(n log n + k)
+    for k overlapping pairs, instead of comparing every pair.
+    """
+    active, pairs = [], []
+    for start, end, key in sorted(intervals, key=lambda item: (item[0], item[1])):
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        pairs.extend((other, key) for _, other in active)
+        heapq.heappush(active, (end, key))
+    return pairs
@@ -3,12 +3,29 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from user_authentication.models import User 
+from my_day.metrics import timed
+from my_day.renderers import FLOAT_RENDERER_CLASSES
 from .models import Diary, Todo     
-from .serializer import  DiarySerializer, TodoSerializer
-from datetime import date
+from .serializer import  DiarySerializer, TodoSerializer, RecurrenceRuleSerializer, TODO_FIELDS, diaries_data, todo_data, todo_values
+from .models import RecurrenceOverride
+from .recurrence import is_occurrence, occurrences_between, overlapping_occurrences
+from .search import search
+from . import export, importer, patches, stats as daily_stats, sync
+from .cache import cached_day_payload, day_etag, day_version, invalidate_day, invalidate_user, stats as cache_stats_snapshot
+from .pagination import KeysetPagination, page_response
+from .utils import day_bounds, find_overlaps, group_by_local_day, overlapping
+from datetime import timedelta
+import logging
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.decorators import authentication_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import authentication_classes, renderer_classes
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from datetime import datetime
 
 
@@ -16,14 +33,55 @@ from datetime import datetime
 
 from rest_framework import status as http_status
 
+logger = logging.getLogger(__name__)
 
 
+def with_day_todos(diaries):
+    """Attach each diary day's todos with one extra query for the whole list."""
+    return diaries.prefetch_related(
+        Prefetch("todos", queryset=Todo.objects.order_by("start_time", "id"))
+    )
 
 
+def serialize_todos(todos):
+    """
+    Serialize stored todos (instances or ``TODO_FIELDS`` rows), interleaved
+    with expanded recurring occurrences.
+    """
+    with timed("serializer"):
+        return [todo_data(todo if isinstance(todo, dict) else todo_values(todo)) for todo in todos]
 
 
+def diary_page_response(request, user_id):
+    """A keyset page of ``user_id``'s diaries with each day's todos, built from ``values()`` rows."""
+    paginator = KeysetPagination("pub_date")
+    page = paginator.paginate_queryset(Diary.objects.filter(user_id=user_id).values("id", "pub_date", "text"), request)
+    with timed("serializer"):
+        data = diaries_data(page, user_id)
+    return paginator.get_paginated_response(data)
 
 
+def etag_matches(request, etag):
+    # Weak comparison: CompressionMiddleware hands out W/ versions of our tags.
+    client_etags = {tag.removeprefix("W/") for tag in parse_etags(request.headers.get("If-None-Match", ""))}
+    return etag in client_etags or "*" in client_etags
+
+
+def not_modified(request, etag):
+    """Return a bodyless 304 if the client's If-None-Match already holds ``etag``."""
+    if etag_matches(request, etag):
+        return with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+    return None
+
+
+def wants_overlap(request):
+    return str(request.data.get("allow_overlap", "")).lower() in ("1", "true", "yes")
+
+
+def with_etag(response, etag):
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 @api_view(["POST"])
@@ -37,7 +95,9 @@ def create_diary(request, user_id):
     if not text:
         return Response({"error": "Diary text is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-    diary = Diary.objects.create(user=user, text=text)
+    diary = Diary.objects.create(
+        user=user, pub_date=timezone.localdate(timezone=user.get_timezone()), text=text
+    )
     serializer = DiarySerializer(diary)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -45,9 +105,7 @@ def create_diary(request, user_id):
 
 @api_view(["GET"])
 def user_diaries(request, user_id):
-    diaries = Diary.objects.filter(user_id=user_id)
-    serializer = DiarySerializer(diaries, many=True)
-    return Response(serializer.data)
+    return diary_page_response(request, user_id)
 
 
 # # Add a todo to a diary
@@ -69,7 +127,7 @@ def user_diaries(request, user_id):
 # List all todos of a diary
 @api_view(["GET"])
 def diary_todos(request, diary_id):
-    todos = Todo.objects.filter(diary_id=diary_id)
+    todos = Todo.objects.filter(diary__id=diary_id).order_by("start_time", "id")
     serializer = TodoSerializer(todos, many=True)
     return Response(serializer.data)
 
@@ -77,16 +135,17 @@ def diary_todos(request, diary_id):
 
 @api_view(["GET"])
 def get_today(request, user_id):
-    today = date.today()
     try:
-        diary = Diary.objects.get(user_id=user_id, pub_date=today)
-    except Diary.DoesNotExist:
+        user = User.objects.get(id=user_id)
+        today = timezone.localdate(timezone=user.get_timezone())
+        diary = with_day_todos(Diary.objects.filter(user=user)).get(pub_date=today)
+    except (User.DoesNotExist, Diary.DoesNotExist):
 
         return Response({"error": "No diary for today"}, status=status.HTTP_404_NOT_FOUND)
 
-    diary_data = DiarySerializer(diary).data
-    todos = Todo.objects.filter(diary=diary)
-    todos_data = TodoSerializer(todos, many=True).data
+    with timed("serializer"):
+        diary_data = DiarySerializer(diary).data
+    todos_data = diary_data["todos"]
 
     return Response({
         "diary": diary_data,
@@ -103,9 +162,7 @@ def get_all_diaries(request , username):
     except User.DoesNotExist:
         return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    diaries = Diary.objects.filter(user=user)
-    serializer = DiarySerializer(diaries, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return diary_page_response(request, user.id)
 
 
 
@@ -121,18 +178,162 @@ def get_all_todos(request):
     if date_str:
         try:
             selected_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-            print( selected_date)
-            todos = todos.filter(start_time__date=selected_date)
+            day_start, day_end = day_bounds(selected_date, user.get_timezone())
+            todos = todos.filter(
+                start_time__gte=day_start, start_time__lt=day_end, recurrence__isnull=True
+            )
         except ValueError:
             return Response(
                 {"error": "Invalid date format. Use YYYY-MM-DD."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-    todos = todos.order_by("-start_time")
-    serializer = TodoSerializer(todos, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    paginator = KeysetPagination("start_time")
+
+    def build_page():
+        # The day's recurring occurrences are paged together with its stored todos.
+        occurrences = (
+            [todo_values(todo) for todo in occurrences_between(user, selected_date, selected_date)] if date_str else ()
+        )
+        page = paginator.paginate_queryset(todos.values(*TODO_FIELDS), request, occurrences)
+        return {"data": serialize_todos(page), "next": paginator.get_next_link()}
+
+    if not date_str:
+        payload = build_page()
+        return page_response(payload["data"], payload["next"])
+
+    cursor = request.query_params.get(paginator.cursor_query_param)
+    variant = f"{paginator.get_page_size(request)}:{cursor or ''}"
+    version = day_version(user.id, selected_date)
+    etag = day_etag(user.id, selected_date, "todos", version, variant)
+    response = not_modified(request, etag)
+    if response:
+        return response
+
+    if cursor:
+        payload = build_page()
+    else:
+        payload = cached_day_payload(user.id, selected_date, "todos", build_page, variant, version)
+    return with_etag(page_response(payload["data"], payload["next"]), etag)
+
+
 
+MAX_RANGE_DAYS = 42
+MAX_CONFLICT_RANGE_DAYS = 366
+
+
+def _parse_day_range(request, max_days):
+    """Parse inclusive ``start``/``end`` query params; returns (start, end, error_response)."""
+    try:
+        start_day = datetime.strptime(request.query_params.get("start", ""), "%Y-%m-%d").date()
+        end_day = datetime.strptime(request.query_params.get("end", ""), "%Y-%m-%d").date()
+    except ValueError:
+        return None, None, Response(
+            {"error": "start and end are required. Use YYYY-MM-DD."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    span = (end_day - start_day).days + 1
+    if span < 1:
+        return None, None, Response({"error": "end must not be before start."}, status=status.HTTP_400_BAD_REQUEST)
+    if span > max_days:
+        return None, None, Response(
+            {"error": f"Range is limited to {max_days} days."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return start_day, end_day, None
+
+
+@api_view(["GET"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def get_todos_range(request):
+    """
+    Todos between ``start`` and ``end`` (inclusive, YYYY-MM-DD), grouped by day.
+
+    One indexed range query replaces a ``get_all_todos`` call per day; the
+    body is streamed day by day so month views never build the whole payload.
+    """
+    start_day, end_day, error = _parse_day_range(request, MAX_RANGE_DAYS)
+    if error:
+        return error
+
+    span = (end_day - start_day).days + 1
+    tz = request.user.get_timezone()
+    range_start, _ = day_bounds(start_day, tz)
+    _, range_end = day_bounds(end_day, tz)
+    todos = (
+        Todo.objects.filter(
+            user=request.user, start_time__gte=range_start, start_time__lt=range_end, recurrence__isnull=True
+        )
+        .order_by("start_time", "id")
+        .iterator(chunk_size=500)
+    )
+    occurrences = {}
+    for occurrence in occurrences_between(request.user, start_day, end_day):
+        occurrences.setdefault(occurrence.occurrence, []).append(occurrence)
+
+    return StreamingHttpResponse(
+        _stream_todo_days(start_day, span, group_by_local_day(todos, tz), occurrences),
+        content_type="application/json",
+    )
+
+
+def _stream_todo_days(start_day, span, groups, occurrences):
+    encoder = JSONEncoder()
+    yield '{"start":%s,"end":%s,"days":[' % (
+        encoder.encode(start_day),
+        encoder.encode(start_day + timedelta(days=span - 1)),
+    )
+    pending = next(groups, None)
+    for offset in range(span):
+        day = start_day + timedelta(days=offset)
+        todos = []
+        if pending is not None and pending[0] == day:
+            todos = pending[1]
+            pending = next(groups, None)
+        if day in occurrences:
+            todos = sorted(todos + occurrences[day], key=lambda todo: (todo.start_time, todo.id))
+        completed = sum(1 for todo in todos if todo.status == "completed")
+        yield ("," if offset else "") + encoder.encode({
+            "date": day,
+            "count": len(todos),
+            "completed": completed,
+            "completion_ratio": round(completed / len(todos), 4) if todos else 0.0,
+            "todos": serialize_todos(todos),
+        })
+    yield "]}"
+
+
+@api_view(["GET"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def get_conflicts(request):
+    """All pairs of overlapping todos, recurring occurrences included, between ``start`` and ``end`` (inclusive)."""
+    start_day, end_day, error = _parse_day_range(request, MAX_CONFLICT_RANGE_DAYS)
+    if error:
+        return error
+
+    tz = request.user.get_timezone()
+    range_start, _ = day_bounds(start_day, tz)
+    _, range_end = day_bounds(end_day, tz)
+    rows = {
+        row["id"]: row
+        for row in overlapping(Todo.objects.filter(user=request.user, recurrence__isnull=True), range_start, range_end)
+        .values("id", "title", "start_time", "end_time")
+        .iterator(chunk_size=2000)
+    }
+    # Occurrences share their series' id, so they are keyed by (id, day).
+    for todo in overlapping_occurrences(request.user, range_start, range_end):
+        rows[todo.id, todo.occurrence] = {
+            "id": todo.id, "title": todo.title, "start_time": todo.start_time, "end_time": todo.end_time,
+            "occurrence": todo.occurrence,
+        }
+    pairs = find_overlaps((row["start_time"], row["end_time"], key) for key, row in rows.items())
+    return Response({
+        "count": len(pairs),
+        "conflicts": [{"first": rows[a], "second": rows[b]} for a, b in pairs],
+    }, status=status.HTTP_200_OK)
 
 
 @api_view(["DELETE"])
@@ -140,27 +341,78 @@ def get_all_todos(request):
 @permission_classes([IsAuthenticated])
 def delete_todo(request, pk):
     try:
-        todo = Todo.objects.get(id=pk, user=request.user)
-        todo.delete()
-        return Response({"message": "Todo deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
+        todo = Todo.objects.select_related("recurrence", "user").get(id=pk, user=request.user)
     except Todo.DoesNotExist:
         return Response({"error": "Todo not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    rule = getattr(todo, "recurrence", None)
+    if rule and request.query_params.get("occurrence"):
+        occurrence, error = _parse_occurrence(request, rule)
+        if error:
+            return error
+        RecurrenceOverride.objects.update_or_create(
+            rule=rule, occurrence=occurrence, defaults={"cancelled": True}
+        )
+        sync.touch_todo(todo.pk)
+        invalidate_day(request.user.id, occurrence)
+        return Response({"message": "Occurrence cancelled."}, status=status.HTTP_204_NO_CONTENT)
+
+    todo.delete()
+    if rule:
+        invalidate_user(request.user.id)
+    else:
+        invalidate_day(request.user.id, todo.day)
+    return Response({"message": "Todo deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
+
+
+def _parse_occurrence(request, rule):
+    """Resolve the ``occurrence`` query param of a recurring todo (default: its first day)."""
+    raw = request.query_params.get("occurrence")
+    if not raw:
+        return rule.todo.day, None
+    try:
+        occurrence = datetime.strptime(raw, "%Y-%m-%d").date()
+    except ValueError:
+        return None, Response(
+            {"error": "Invalid occurrence. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST
+        )
+    tz = rule.todo.user.get_timezone()
+    if not is_occurrence(rule, occurrence, tz):
+        return None, Response({"error": "Not an occurrence of this todo."}, status=status.HTTP_404_NOT_FOUND)
+    return occurrence, None
     
 @api_view(["PATCH"])
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAuthenticated])
 def check_todo(request, pk, completed):
     try:
-        todo = Todo.objects.get(id=pk, user=request.user)
+        todo = Todo.objects.select_related("recurrence", "user").get(id=pk, user=request.user)
     except Todo.DoesNotExist:
         return Response({"error": "Todo not found"}, status=http_status.HTTP_404_NOT_FOUND)
     
 
     is_completed = completed.lower() == 'true'
     status_value = 'completed' if is_completed else 'not_started'
+
+    rule = getattr(todo, "recurrence", None)
+    if rule:
+        occurrence, error = _parse_occurrence(request, rule)
+        if error:
+            return error
+        RecurrenceOverride.objects.update_or_create(
+            rule=rule, occurrence=occurrence, defaults={"status": status_value}
+        )
+        sync.touch_todo(todo.pk)
+        invalidate_day(request.user.id, occurrence)
+        return Response({
+            "message": "Todo status updated",
+            "status": status_value,
+            "occurrence": occurrence,
+        }, status=http_status.HTTP_200_OK)
     
     todo.status = status_value
     todo.save()
+    invalidate_day(request.user.id, todo.day)
     
     return Response({
         "message": "Todo status updated", 
@@ -190,25 +442,204 @@ def add_todo(request):
                 status=http_status.HTTP_400_BAD_REQUEST
             )
     
+    recurrence = None
+    if request.data.get("recurrence"):
+        recurrence = RecurrenceRuleSerializer(data=request.data["recurrence"])
+        if not recurrence.is_valid():
+            return Response({"recurrence": recurrence.errors}, status=http_status.HTTP_400_BAD_REQUEST)
+
     serializer = TodoSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save(user=request.user)
+        if not wants_overlap(request):
+            start, end = serializer.validated_data["start_time"], serializer.validated_data["end_time"]
+            conflicts = list(
+                overlapping(Todo.objects.filter(user=request.user, recurrence__isnull=True), start, end)
+                .values_list("id", flat=True)[:10]
+            )
+            conflicts += dict.fromkeys(todo.id for todo in overlapping_occurrences(request.user, start, end))
+            conflicts = conflicts[:10]
+            if conflicts:
+                return Response(
+                    {"error": "Todo overlaps existing todos.", "conflicts": conflicts},
+                    status=http_status.HTTP_400_BAD_REQUEST,
+                )
+        with transaction.atomic():
+            todo = serializer.save(user=request.user)
+            if recurrence:
+                recurrence.save(todo=todo)
+        if recurrence:
+            invalidate_user(request.user.id)
+        else:
+            invalidate_day(request.user.id, todo.day)
         return Response(serializer.data, status=http_status.HTTP_201_CREATED)
     
     return Response(serializer.errors, status=http_status.HTTP_400_BAD_REQUEST)
 
 
+MAX_BATCH_OPERATIONS = 500
+
+
+@api_view(["POST"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def batch_todos(request):
+    """
+    Apply a list of todo operations atomically::
+
+        {"operations": [
+            {"op": "create", "data": {...}},
+            {"op": "update", "id": 3, "data": {...}},
+            {"op": "delete", "id": 4}
+        ]}
+
+    Everything is validated before anything is written; the writes are then
+    one bulk_create, one bulk_update and one DELETE inside a transaction.
+    """
+    operations = request.data.get("operations")
+    if not isinstance(operations, list) or not operations:
+        return Response({"error": "operations must be a non-empty list."}, status=http_status.HTTP_400_BAD_REQUEST)
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return Response(
+            {"error": f"At most {MAX_BATCH_OPERATIONS} operations per batch."},
+            status=http_status.HTTP_400_BAD_REQUEST,
+        )
+
+    user = request.user
+    plan, results = _plan_batch(user, operations)
+    if not wants_overlap(request):
+        _reject_batch_overlaps(user, results)
+    if any(result["status"] == "error" for result in results):
+        for result in results:
+            result.pop("todo")
+        return Response({"results": results}, status=http_status.HTTP_400_BAD_REQUEST)
+
+    creates, updates, deletes, update_fields, touched_days = plan
+    with transaction.atomic(), daily_stats.batched(), sync.batched():
+        Todo.objects.bulk_create(creates)
+        if updates:
+            # bulk_update skips auto_now.
+            now = timezone.now()
+            for todo in updates:
+                todo.updated_at = now
+            Todo.objects.bulk_update(updates, [*update_fields, "updated_at"])
+        if deletes:
+            Todo.objects.filter(user=user, id__in=[todo.id for todo in deletes]).delete()
+        touched_days.update(todo.day for todo in [*creates, *updates])
+        daily_stats.refresh_days(user.id, touched_days)
+
+    if any(getattr(todo, "recurrence", None) for todo in [*updates, *deletes]):
+        invalidate_user(user.id)
+    else:
+        for day in touched_days:
+            invalidate_day(user.id, day)
+
+    for result in results:
+        todo = result.pop("todo")
+        if result["status"] != "deleted":
+            result["todo"] = TodoSerializer(todo).data
+    return Response({"results": results}, status=http_status.HTTP_200_OK)
+
+
+def _reject_batch_overlaps(user, results):
+    """Flag creates/updates that would overlap each other or untouched todos."""
+    candidates = [r for r in results if r["status"] in ("created", "updated")]
+    if not candidates:
+        return
+    replaced = [r["todo"].id for r in results if r["status"] in ("updated", "deleted")]
+    window_start = min(r["todo"].start_time for r in candidates)
+    window_end = max(r["todo"].end_time for r in candidates)
+    existing = (
+        overlapping(Todo.objects.filter(user=user, recurrence__isnull=True), window_start, window_end)
+        .exclude(id__in=replaced)
+        .values_list("start_time", "end_time", "id")
+    )
+    intervals = [(start, end, ("todo", pk)) for start, end, pk in existing]
+    intervals += [
+        (todo.start_time, todo.end_time, ("todo", todo.id))
+        for todo in overlapping_occurrences(user, window_start, window_end)
+        if todo.id not in replaced
+    ]
+    intervals += [(r["todo"].start_time, r["todo"].end_time, ("operation", r["index"])) for r in candidates]
+
+    for a, b in find_overlaps(intervals):
+        for (kind, ref), (other_kind, other_ref) in ((a, b), (b, a)):
+            if kind == "operation":
+                result = results[ref]
+                result["status"] = "error"
+                result.setdefault("errors", {}).setdefault("overlaps", []).append({other_kind: other_ref})
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _plan_batch(user, operations):
+    ids = [op.get("id") for op in operations if isinstance(op, dict) and op.get("op") in ("update", "delete")]
+    existing = Todo.objects.filter(user=user).select_related("recurrence").in_bulk([pk for pk in ids if _is_id(pk)])
+
+    creates, updates, deletes, update_fields, touched_days = [], [], [], set(), set()
+    results, seen_ids = [], set()
+    for index, op in enumerate(operations):
+        kind = op.get("op") if isinstance(op, dict) else None
+        result = {"index": index, "op": kind, "status": "error", "todo": None}
+        results.append(result)
+
+        if kind not in ("create", "update", "delete"):
+            result["errors"] = {"op": ["Must be one of create, update, delete."]}
+            continue
+        if kind == "create":
+            serializer = TodoSerializer(data=op.get("data") or {})
+            if not serializer.is_valid():
+                result["errors"] = serializer.errors
+                continue
+            todo = Todo(user=user, **serializer.validated_data)
+            todo.day = Todo.local_day(todo.start_time, user)
+            creates.append(todo)
+            result.update(status="created", todo=todo)
+            continue
+
+        if not _is_id(op.get("id")):
+            result["errors"] = {"id": ["A valid integer is required."]}
+            continue
+        todo = existing.get(op["id"])
+        if todo is None:
+            result["errors"] = {"id": ["Todo not found."]}
+            continue
+        if todo.id in seen_ids:
+            result["errors"] = {"id": ["Todo appears in more than one operation."]}
+            continue
+        seen_ids.add(todo.id)
+
+        touched_days.add(todo.day)
+        if kind == "delete":
+            deletes.append(todo)
+            result.update(status="deleted", todo=todo)
+            continue
+
+        serializer = TodoSerializer(todo, data=op.get("data") or {}, partial=True)
+        if not serializer.is_valid():
+            result["errors"] = serializer.errors
+            continue
+        for field, value in serializer.validated_data.items():
+            setattr(todo, field, value)
+        update_fields.update(serializer.validated_data)
+        if "start_time" in serializer.validated_data:
+            todo.day = Todo.local_day(todo.start_time, user)
+            if todo.start_time != todo._stored_start:
+                todo.reminded = False
+            update_fields.update(("day", "reminded"))
+        updates.append(todo)
+        result.update(status="updated", todo=todo)
+
+    return (creates, updates, deletes, sorted(update_fields), touched_days), results
+
+
 # =============================== diaries =================================
 
 @api_view(["POST"])
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAuthenticated])
 def save_or_update_diary(request):
-    print("===================================")
-    print(request.user)
-    print(request.data)
-    print("===================================")
-    
     date = request.data.get("date")
     content = request.data.get("content")
 
@@ -221,48 +652,246 @@ def save_or_update_diary(request):
             pub_date=date,
             defaults={"text": content},
         )
+        invalidate_day(request.user.id, Diary._meta.get_field("pub_date").to_python(date))
+        if not created:
+            diary.refresh_from_db(fields=["version"])
 
         return Response({
             "date": diary.pub_date,
             "content": diary.text,
+            "version": diary.version,
             "status": "created" if created else "updated"
         }, status=200)
 
     except Exception as e:
-        print("Error:", e)
+        logger.exception("diary request failed")
         return Response({"error": str(e)}, status=500)
 
 
 
 
+@api_view(["PATCH"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def patch_diary(request):
+    """
+    Apply character-range edits to the diary of ``date``::
+
+        {"date": "2025-03-10", "base_version": 4,
+         "ops": [{"start": 120, "end": 125, "text": "sunny"}]}
+
+    ``ops`` are relative to version ``base_version`` (see ``patches``);
+    ``base_version`` 0 creates the entry. Returns the new version, or 409 with
+    the current text and version when another save got there first.
+    """
+    try:
+        day = datetime.strptime(str(request.data.get("date", "")), "%Y-%m-%d").date()
+    except ValueError:
+        return Response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+    base_version = request.data.get("base_version")
+    if isinstance(base_version, bool) or not isinstance(base_version, int) or base_version < 0:
+        return Response({"error": "base_version must be a non-negative integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+    def conflict(current):
+        return Response({
+            "error": "The entry was changed elsewhere.",
+            "version": current["version"] if current else 0,
+            "content": current["text"] if current else "",
+        }, status=status.HTTP_409_CONFLICT)
+
+    user = request.user
+    diaries = Diary.objects.filter(user=user, pub_date=day)
+    current = diaries.values("id", "text", "version").first()
+    if (current["version"] if current else 0) != base_version:
+        return conflict(current)
+    try:
+        text = patches.apply_ops(current["text"] if current else "", request.data.get("ops"))
+    except patches.InvalidPatch as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if current is None:
+        try:
+            with transaction.atomic():
+                diary = Diary.objects.create(user=user, pub_date=day, text=text)
+        except IntegrityError:
+            return conflict(diaries.values("text", "version").first())
+        version = diary.version
+    elif text == current["text"]:
+        return Response({"date": day, "version": base_version}, status=status.HTTP_200_OK)
+    else:
+        # The version in the WHERE clause makes a save that raced this one a 409, not a lost update.
+        with transaction.atomic():
+            updated = Diary.objects.filter(id=current["id"], version=base_version).update(
+                text=text, version=base_version + 1, updated_at=timezone.now(),
+            )
+            if updated:
+                daily_stats.refresh_days(user.id, [day])
+        if not updated:
+            return conflict(diaries.values("text", "version").first())
+        version = base_version + 1
+
+    invalidate_day(user.id, day)
+    return Response({"date": day, "version": version}, status=status.HTTP_200_OK)
+
+
 @api_view(["GET"])
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAuthenticated])
 def get_diary_by_date(request):
 
-    selected_date = request.query_params.get("date") or str(dt.today())
-    
-    print("===================================")
-    print("User:", request.user)
-    print("Selected Date:", selected_date)
-    print("===================================")
+    date_str = request.query_params.get("date")
+    if date_str:
+        try:
+            selected_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+    else:
+        selected_date = timezone.localdate(timezone=request.user.get_timezone())
 
-    try:
+    def build_payload():
         diary = Diary.objects.filter(user=request.user, pub_date=selected_date).first()
-
         if diary:
-            return Response({
-                "date": diary.pub_date,
-                "content": diary.text,
-                "status": "found"
-            }, status=200)
-        else:
-            return Response({
-                "date": selected_date,
-                "content": "",
-                "status": "not_found"
-            }, status=200)
+            return {"date": diary.pub_date, "content": diary.text, "version": diary.version, "status": "found"}
+        return {"date": selected_date, "content": "", "version": 0, "status": "not_found"}
+
+    version = day_version(request.user.id, selected_date)
+    etag = day_etag(request.user.id, selected_date, "diary", version)
+    response = not_modified(request, etag)
+    if response:
+        return response
+
+    try:
+        payload = cached_day_payload(request.user.id, selected_date, "diary", build_payload, version=version)
+        return with_etag(Response(payload, status=200), etag)
 
     except Exception as e:
-        print("Error:", e)
-        return Response({"error": str(e)}, status=500)
\ No newline at end of file
+        logger.exception("diary request failed")
+        return Response({"error": str(e)}, status=500)
+
+
+EXPORT_FORMATS = {
+    "ndjson": (export.ndjson_chunks, "application/x-ndjson"),
+    "csv": (export.csv_chunks, "text/csv; charset=utf-8"),
+}
+
+
+@api_view(["GET"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def export_history(request):
+    """
+    Stream the user's whole history as ``?output=ndjson|csv``, zipped with
+    ``?zip=1``. (``format`` is taken by DRF's format override.)
+    """
+    fmt = request.query_params.get("output", "ndjson")
+    if fmt not in EXPORT_FORMATS:
+        return Response({"error": "output must be 'ndjson' or 'csv'."}, status=status.HTTP_400_BAD_REQUEST)
+    chunks, content_type = EXPORT_FORMATS[fmt]
+    chunks = chunks(request.user)
+    filename = f"my_day-{request.user.username}-{timezone.localdate()}.{fmt}"
+    if request.query_params.get("zip") in ("1", "true"):
+        chunks = export.zipped(chunks, filename)
+        content_type, filename = "application/zip", f"{filename}.zip"
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@api_view(["POST"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def import_history(request):
+    """
+    Import an uploaded ``file`` of NDJSON (as produced by ``export``) or
+    iCalendar. The format follows the file extension unless ``input=ndjson|ics``
+    is given. Bad rows are reported by line number and skipped.
+    """
+    upload = request.FILES.get("file")
+    if upload is None:
+        return Response({"error": "Upload the file as 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+    fmt = importer.detect_format(upload.name, request.query_params.get("input") or request.data.get("input"))
+    if fmt not in ("ndjson", "ics"):
+        return Response({"error": "input must be 'ndjson' or 'ics'."}, status=status.HTTP_400_BAD_REQUEST)
+
+    report = importer.import_records(request.user, importer.parse(upload, fmt, request.user))
+    if report.aborted:
+        # Rows before the bad bytes were imported; say so alongside the error.
+        return Response({"error": report.aborted, **report.as_dict()}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+
+MAX_STATS_RANGE_DAYS = 366
+
+
+@api_view(["GET"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+@renderer_classes(FLOAT_RENDERER_CLASSES)
+def get_stats(request):
+    """Completion rate, scheduled time and streaks between ``start`` and ``end``, by day or week."""
+    start_day, end_day, error = _parse_day_range(request, MAX_STATS_RANGE_DAYS)
+    if error:
+        return error
+    group = request.query_params.get("group", "day")
+    if group not in ("day", "week"):
+        return Response({"error": "group must be 'day' or 'week'."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(daily_stats.summary(request.user.id, start_day, end_day, group), status=status.HTTP_200_OK)
+
+
+MAX_SEARCH_PAGE_SIZE = 50
+
+
+@api_view(["GET"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+@renderer_classes(FLOAT_RENDERER_CLASSES)
+def search_entries(request):
+    """Ranked full-text search over the user's diaries and todos."""
+    text = request.query_params.get("q", "").strip()
+    kind = request.query_params.get("type", "all")
+    if not text:
+        return Response({"error": "q is required."}, status=status.HTTP_400_BAD_REQUEST)
+    if kind not in ("all", "diary", "todo"):
+        return Response({"error": "type must be all, diary or todo."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        page = max(1, int(request.query_params.get("page", 1)))
+        page_size = max(1, min(int(request.query_params.get("page_size", 20)), MAX_SEARCH_PAGE_SIZE))
+    except ValueError:
+        return Response({"error": "page and page_size must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+    results, has_more = search(request.user, text, kind, limit=page_size, offset=(page - 1) * page_size)
+    return Response({"results": results, "next": page + 1 if has_more else None}, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """
+    Todos and diaries changed, and ids deleted, since ``?since=<cursor>``
+    (everything without one). Pass the returned ``cursor`` back next time and
+    keep going while ``has_more`` is true.
+    """
+    try:
+        limit = max(1, min(int(request.query_params.get("limit", sync.DEFAULT_LIMIT)), sync.MAX_LIMIT))
+    except ValueError:
+        return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        data = sync.changes(request.user, request.query_params.get("since") or None, limit)
+    except ValueError:
+        return Response({"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+    except sync.CursorExpired:
+        return Response(
+            {"error": "Cursor expired; sync again without one."}, status=status.HTTP_410_GONE,
+        )
+    return Response(data, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    return Response(cache_stats_snapshot())
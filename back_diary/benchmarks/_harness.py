@@ -0,0 +1,106 @@
+"""
+Shared helpers for the scripts in this package.
+
+Every benchmark runs against a throwaway test database created through
+Django's test machinery, so the development ``db.sqlite3`` is never touched.
+Run them from ``back_diary/`` as modules, e.g.
+``python -m benchmarks.todo_day_query --todos 100000``.
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "my_day.settings")
+
+
+def setup_django(test_db_name=None):
+    """
+    Configure Django and create the throwaway test database. SQLite test
+    databases live in memory unless ``test_db_name`` names a file.
+    """
+    import django
+
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    if test_db_name:
+        connection.settings_dict["TEST"]["NAME"] = test_db_name
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    return connection
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, samples):
+    """Print p50/p99/max of ``samples`` (seconds) in milliseconds."""
+    print(
+        f"{label:<28} n={len(samples):<7} "
+        f"p50={percentile(samples, 50) * 1000:8.3f}ms "
+        f"p99={percentile(samples, 99) * 1000:8.3f}ms "
+        f"max={max(samples) * 1000:8.3f}ms"
+    )
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def seed_users(count, prefix="bench"):
+    from user_authentication.models import User
+
+    users = [
+        User(email=f"{prefix}{i}@example.com", username=f"{prefix}{i}", password="!")
+        for i in range(count)
+    ]
+    User.objects.bulk_create(users, batch_size=5000)
+    return list(User.objects.filter(username__startswith=prefix).values_list("id", flat=True))
+
+
+def seed_todos(user_ids, count, days=365, seed=0, batch_size=10000):
+    """
+    Insert ``count`` todos spread evenly over ``user_ids`` and ``days`` days
+    starting 2025-01-01 UTC (seeded users keep the default UTC timezone).
+    Returns the first seeded day.
+    """
+    from django.utils import timezone
+    from Diary_todo.models import Todo
+
+    rng = random.Random(seed)
+    first_day = datetime(2025, 1, 1, tzinfo=timezone.get_current_timezone())
+    batch = []
+    for i in range(count):
+        start = first_day + timedelta(
+            days=rng.randrange(days), minutes=rng.randrange(0, 23 * 60, 15)
+        )
+        batch.append(
+            Todo(
+                user_id=user_ids[i % len(user_ids)],
+                title=f"task {i}",
+                start_time=start,
+                day=start.date(),
+                end_time=start + timedelta(minutes=rng.choice((15, 30, 60, 90))),
+                status="completed" if rng.random() < 0.4 else "not_started",
+            )
+        )
+        if len(batch) >= batch_size:
+            Todo.objects.bulk_create(batch)
+            batch.clear()
+    if batch:
+        Todo.objects.bulk_create(batch)
+    return first_day.date()
@@ -0,0 +1,90 @@
+"""
+Minimal closed-loop HTTP/1.1 load generator on asyncio streams, so the load
+tests need nothing beyond the standard library. Each connection is kept alive
+and sends its next request as soon as the previous response is read.
+"""
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+
+class Result:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self):
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    version, status = status_line.split()[:2]
+    length, chunked, close = 0, False, version == b"HTTP/1.0"
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding" and "chunked" in value:
+            chunked = True
+        elif name == "connection":
+            close = value == "close"
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return int(status), close
+
+
+async def _worker(url, request, deadline, result):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, close = await _read_response(reader)
+            result.latencies.append(time.perf_counter() - started)
+            result.statuses[status] = result.statuses.get(status, 0) + 1
+            if close:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            result.errors += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def run(target, connections, duration, method="GET", headers=None, body=b""):
+    """Hammer ``target`` with ``connections`` concurrent keep-alive connections."""
+    url = urlsplit(target)
+    path = url.path + (f"?{url.query}" if url.query else "")
+    lines = [f"{method} {path} HTTP/1.1", f"Host: {url.netloc}", f"Content-Length: {len(body)}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    request = ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+    result = Result()
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(_worker(url, request, deadline, result) for _ in range(connections)))
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,86 @@
+"""
+Bytes on the wire and CPU per response for each available codec and level,
+by response size bucket, on diary-list JSON like ``get_all_diaries`` returns.
+Also compares one-shot compression with the per-chunk flushed stream used
+for streaming responses.
+
+    python -m benchmarks.compression
+"""
+import argparse
+import random
+import time
+
+from benchmarks import _harness  # noqa: F401  (puts back_diary on sys.path)
+from my_day.compression import CODECS
+
+BUCKETS = [512, 1024, 4 * 1024, 32 * 1024, 256 * 1024, 2 * 1024 * 1024]
+LEVELS = {"gzip": [1, 6, 9], "br": [1, 4, 11], "zstd": [1, 3, 19]}
+WORDS = (
+    "today I went for a long walk with the dog and later finished the report "
+    "meeting coffee gym read book called mum dinner friends rain sunny tired happy "
+    "project deadline idea plan weekend travel train station garden cooked pasta"
+).split()
+
+
+def payload(size, rng):
+    import orjson
+
+    diaries, body = [], b"[]"
+    day = 0
+    while len(body) < size:
+        day += 1
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 120)))
+        diaries.append({
+            "id": day, "pub_date": f"2025-{1 + day // 28 % 12:02d}-{1 + day % 28:02d}", "text": text,
+            "todos": [{"id": day * 10 + i, "title": rng.choice(WORDS), "description": "", "start_time": "2025-03-10T09:00:00Z",
+                       "end_time": "2025-03-10T10:00:00Z", "status": "completed", "status_display": "Completed"}
+                      for i in range(rng.randint(0, 3))],
+        })
+        body = orjson.dumps(diaries)
+    return body
+
+
+def cpu_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.process_time()
+        fn()
+        samples.append(time.process_time() - started)
+    return sorted(samples)[len(samples) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=9)
+    parser.add_argument("--chunk", type=int, default=64 * 1024, help="streamed chunk size")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    bodies = {size: payload(size, rng) for size in BUCKETS}
+    print(f"codecs available: {', '.join(CODECS)}")
+    print(f"{'size':>9} {'codec':<8} {'bytes':>9} {'ratio':>6} {'cpu ms':>8} {'MB/s':>8}")
+    for size, body in bodies.items():
+        for name, codec_class in CODECS.items():
+            for level in LEVELS[name]:
+                codec = codec_class(level)
+                out = codec.compress(body)
+                ms = cpu_ms(lambda: codec.compress(body), args.repeat)
+                mbps = len(body) / 1e6 / (ms / 1000) if ms else float("inf")
+                print(f"{len(body):>9} {name}-{level:<3} {len(out):>9} {len(body) / len(out):6.2f} {ms:8.3f} {mbps:8.1f}")
+
+    body = bodies[BUCKETS[-1]]
+    chunks = [body[i:i + args.chunk] for i in range(0, len(body), args.chunk)]
+    print(f"\nstreamed in {args.chunk // 1024} KiB chunks vs one shot, {len(body)} bytes")
+    for name, codec_class in CODECS.items():
+        codec = codec_class(dict(zip(LEVELS, (6, 4, 3)))[name])
+
+        def streamed():
+            compress, finish = codec.stream()
+            return b"".join([*(compress(chunk) for chunk in chunks), finish()])
+
+        print(f"{name:<6} one shot {len(codec.compress(body)):>8} bytes {cpu_ms(lambda: codec.compress(body), args.repeat):7.2f}ms"
+              f"   streamed {len(streamed()):>8} bytes {cpu_ms(streamed, args.repeat):7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
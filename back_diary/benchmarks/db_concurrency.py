@@ -0,0 +1,96 @@
+"""
+Concurrent diary writes (the ``save_or_update_diary`` upsert) and day reads
+(``get_diary_by_date``) from threads, per database profile.
+
+On SQLite it runs twice against a file database: once with the stock
+settings (rollback journal, deferred transactions, 5s busy timeout) and once
+with the WAL profile from ``settings.DATABASES``. On PostgreSQL it runs the
+configured profile (pooled or persistent connections).
+
+    python -m benchmarks.db_concurrency --writers 8 --readers 8 --seconds 10
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from benchmarks._harness import report, seed_users, setup_django
+
+LEGACY_SQLITE_OPTIONS = {"init_command": "PRAGMA journal_mode=DELETE"}
+
+
+def hammer(user_ids, writers, readers, seconds):
+    from django.db import OperationalError, connection
+    from Diary_todo.models import Diary
+    from datetime import date, timedelta
+
+    first = date(2025, 1, 1)
+    deadline = time.perf_counter() + seconds
+    results = {"write": [], "read": [], "errors": 0}
+    lock = threading.Lock()
+
+    def loop(kind, seed):
+        rng = random.Random(seed)
+        latencies, errors = [], 0
+        while time.perf_counter() < deadline:
+            user_id, day = rng.choice(user_ids), first + timedelta(days=rng.randrange(365))
+            started = time.perf_counter()
+            try:
+                if kind == "write":
+                    Diary.objects.update_or_create(user_id=user_id, pub_date=day, defaults={"text": f"entry {seed}"})
+                else:
+                    Diary.objects.filter(user_id=user_id, pub_date=day).first()
+            except OperationalError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            results[kind] += latencies
+            results["errors"] += errors
+
+    threads = [threading.Thread(target=loop, args=("write", i)) for i in range(writers)]
+    threads += [threading.Thread(target=loop, args=("read", 1000 + i)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    connection = setup_django(test_db_name=os.path.join(workdir, "bench.sqlite3"))
+    from django.db import connections
+
+    user_ids = seed_users(args.users)
+    profiles = [("configured", connection.settings_dict["OPTIONS"])]
+    if connection.vendor == "sqlite":
+        profiles.insert(0, ("sqlite defaults", LEGACY_SQLITE_OPTIONS))
+
+    for label, options in profiles:
+        connections.close_all()
+        connection.settings_dict["OPTIONS"] = options
+        results = hammer(user_ids, args.writers, args.readers, args.seconds)
+        print(f"\n-- {connection.vendor} {label}: {args.writers} writers, {args.readers} readers")
+        for kind in ("write", "read"):
+            print(f"{kind + 's/s':<10} {len(results[kind]) / args.seconds:10.1f}")
+            if results[kind]:
+                report(kind, results[kind])
+        print(f"{'errors':<10} {results['errors']:10d}")
+    connections.close_all()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Import throughput: NDJSON through ``importer.import_records`` (chunked
+upserts) vs one ``update_or_create``/``Todo.save()`` per row, which is what
+looping over ``save_or_update_diary``/``add_todo`` amounts to.
+
+    python -m benchmarks.import_history --rows 100000
+"""
+import argparse
+import json
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from benchmarks._harness import seed_users, setup_django
+
+
+def ndjson_lines(rows):
+    first_day = date(2000, 1, 1)
+    start = datetime(2000, 1, 1, 8, tzinfo=dt_timezone.utc)
+    diaries = rows // 4
+    for i in range(diaries):
+        yield json.dumps({"type": "diary", "date": (first_day + timedelta(days=i)).isoformat(), "text": f"entry {i}"})
+    for i in range(rows - diaries):
+        begins = start + timedelta(hours=i)
+        yield json.dumps({
+            "type": "todo", "title": f"todo {i}", "status": "completed" if i % 3 else "not_started",
+            "start_time": begins.isoformat(), "end_time": (begins + timedelta(minutes=45)).isoformat(),
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--per-row", type=int, default=5_000, help="rows for the one-at-a-time baseline")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_django()
+    from Diary_todo import importer
+    from Diary_todo.models import Diary, Todo
+    from user_authentication.models import User
+
+    bulk_user, row_user = User.objects.filter(id__in=seed_users(2)).order_by("id")
+    lines = list(ndjson_lines(args.rows))
+
+    started = time.perf_counter()
+    report = importer.import_records(bulk_user, importer.parse_ndjson(lines), chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - started
+    print(f"chunked import     {args.rows:>8} rows  {args.rows / elapsed:10.0f} rows/s  "
+          f"({report.diaries} diaries, {report.todos} todos, {report.error_count} errors)")
+
+    sample = list(ndjson_lines(args.per_row))
+    started = time.perf_counter()
+    for line in sample:
+        record = json.loads(line)
+        if record["type"] == "diary":
+            Diary.objects.update_or_create(user=row_user, pub_date=record["date"], defaults={"text": record["text"]})
+        else:
+            Todo.objects.create(
+                user=row_user, title=record["title"], status=record["status"],
+                start_time=datetime.fromisoformat(record["start_time"]),
+                end_time=datetime.fromisoformat(record["end_time"]),
+            )
+    elapsed = time.perf_counter() - started
+    print(f"one row at a time  {args.per_row:>8} rows  {args.per_row / elapsed:10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Throughput of the DRF (sync) read endpoints under a WSGI server vs their
+native async variants under an ASGI server, at the same concurrency.
+
+Unlike the other benchmarks this one drives real servers, which you start
+yourself against the same database, e.g.
+
+    gunicorn my_day.wsgi -w 4 --threads 8 -b 127.0.0.1:8001
+    uvicorn my_day.asgi:application --workers 4 --port 8002 --no-access-log
+
+then
+
+    python -m benchmarks.load_async --token "$ACCESS" --date 2025-03-03 \\
+        --wsgi http://127.0.0.1:8001 --asgi http://127.0.0.1:8002
+
+``--token`` is an access token of a user with data on ``--date`` (see
+``/api/token/``); raise ``SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"]`` for long runs.
+"""
+import argparse
+import asyncio
+import resource
+
+from benchmarks._harness import percentile
+from benchmarks._loadgen import run
+
+ENDPOINTS = ("get_all_todos/?date={date}", "get_diary_by_date/?date={date}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wsgi", required=True, help="base URL of the WSGI server")
+    parser.add_argument("--asgi", required=True, help="base URL of the ASGI server")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--date", default="2025-03-03")
+    parser.add_argument("--connections", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=30)
+    args = parser.parse_args()
+
+    # 500 sockets plus the interpreter's own files exceed the usual 256/1024 soft limit.
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (max(soft, min(hard, args.connections * 2 + 64)), hard))
+
+    headers = {"Authorization": f"Bearer {args.token}"}
+    for endpoint in ENDPOINTS:
+        path = endpoint.format(date=args.date)
+        for label, url in (
+            ("wsgi  drf", f"{args.wsgi.rstrip('/')}/api/Diary_todo/{path}"),
+            ("asgi  async", f"{args.asgi.rstrip('/')}/api/Diary_todo/async/{path}"),
+        ):
+            result = asyncio.run(run(url, args.connections, args.duration, headers=headers))
+            print(
+                f"{path.split('/')[0]:<18} {label:<12} {result.throughput:9.1f} req/s "
+                f"p50={percentile(result.latencies, 50) * 1000:8.1f}ms "
+                f"p99={percentile(result.latencies, 99) * 1000:8.1f}ms "
+                f"statuses={result.statuses} errors={result.errors}"
+            )
+
+
+if __name__ == "__main__":
+    main()
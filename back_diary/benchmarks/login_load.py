@@ -0,0 +1,104 @@
+"""
+Login throughput per hasher, reported as logins/sec per core.
+
+By default it runs in-process for each hasher: ``check_password`` on one
+thread (what a sync worker does per login), then concurrent requests to the
+async login view, whose hashing runs on ``PASSWORD_HASH_WORKERS`` threads.
+With ``--url`` it instead drives a running server's login endpoint over HTTP,
+for the hasher that server is configured with:
+
+    uvicorn my_day.asgi:application --workers 4 --port 8002 --no-access-log
+    python -m benchmarks.login_load --url http://127.0.0.1:8002/api/user_authentication/async/login/ \\
+        --email someone@example.com --password ...
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from benchmarks._harness import percentile, setup_django
+from benchmarks._loadgen import run
+
+HASHERS = ["pbkdf2", "scrypt", "argon2"]
+
+
+def line(label, count, elapsed, latencies=()):
+    per_sec = count / elapsed
+    tail = f" p50={percentile(latencies, 50) * 1000:7.1f}ms p99={percentile(latencies, 99) * 1000:7.1f}ms" if latencies else ""
+    print(f"{label:<26} {per_sec:8.1f} logins/s {per_sec / os.cpu_count():8.1f} /core{tail}")
+
+
+async def async_logins(email, password, concurrency, duration):
+    from django.test import AsyncClient
+
+    client, latencies = AsyncClient(), []
+    body = {"email": email, "password": password}
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.post("/api/user_authentication/async/login/", body, content_type="application/json")
+            assert response.status_code == 200, response.content
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+def in_process(args):
+    setup_django()
+    # Every login here is slower than REQUEST_METRICS_SLOW_MS; keep the log quiet.
+    logging.getLogger("my_day.requests").disabled = True
+    from django.conf import settings
+    from django.contrib.auth.hashers import get_hasher
+    from django.test import override_settings
+    from user_authentication.models import User
+
+    print(f"{os.cpu_count()} cores, {args.concurrency} concurrent async logins")
+    for name in HASHERS:
+        path = settings._PASSWORD_HASHERS[name]
+        with override_settings(PASSWORD_HASHERS=[path, *(p for p in settings.PASSWORD_HASHERS if p != path)]):
+            try:
+                get_hasher().encode("probe", "saltsaltsalt")
+            except ValueError as e:  # argon2-cffi not installed
+                print(f"{name:<26} skipped: {e}")
+                continue
+            user = User.objects.create_user(email=f"{name}@example.com", username=name, password=args.password)
+
+            count, started = 0, time.perf_counter()
+            while time.perf_counter() - started < args.duration:
+                assert user.check_password(args.password)
+                count += 1
+            line(f"{name} sync, 1 thread", count, time.perf_counter() - started)
+
+            latencies, elapsed = asyncio.run(async_logins(user.email, args.password, args.concurrency, args.duration))
+            line(f"{name} async view", len(latencies), elapsed, latencies)
+
+
+def over_http(args):
+    body = json.dumps({"email": args.email, "password": args.password}).encode()
+    result = asyncio.run(run(
+        args.url, args.concurrency, args.duration, method="POST",
+        headers={"Content-Type": "application/json"}, body=body,
+    ))
+    line("http", len(result.latencies), result.elapsed, result.latencies)
+    print(f"statuses={result.statuses} errors={result.errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="login endpoint of a running server")
+    parser.add_argument("--email", default="bench@example.com")
+    parser.add_argument("--password", default="correct horse battery staple")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+    over_http(args) if args.url else in_process(args)
+
+
+if __name__ == "__main__":
+    main()
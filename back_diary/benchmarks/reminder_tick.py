@@ -0,0 +1,61 @@
+"""
+Cost of one reminder-worker tick (refill from the pending index, claim and
+email the due batch) as the number of pending todos grows. Every round adds
+``--due`` todos that are due now to a table of ``size`` future todos; with
+the partial ``todo_reminder_due_idx`` the tick only touches the due rows.
+
+    python -m benchmarks.reminder_tick --sizes 10000,100000,1000000
+"""
+import argparse
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from benchmarks._harness import report, seed_todos, seed_users, setup_django, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Pending todos, comma separated.")
+    parser.add_argument("--due", type=int, default=100, help="Todos due per tick.")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core import mail
+    from django.db import connection
+    from Diary_todo.models import Todo
+    from Diary_todo.reminders import ReminderScheduler
+
+    user_ids = seed_users(100)
+    # Seeded todos start in 2025; the worker's clock sits before all of them.
+    now = datetime(2024, 12, 31, tzinfo=dt_timezone.utc)
+    lead = timedelta(minutes=15)
+    scheduler_kwargs = dict(lead=lead, max_lateness=timedelta(minutes=10), batch_size=args.due, clock=lambda: now)
+
+    seeded = 0
+    for size in (int(size) for size in args.sizes.split(",")):
+        seed_todos(user_ids, size - seeded, seed=size)
+        seeded = size
+        samples = []
+        for round_ in range(args.rounds):
+            start = now + lead
+            Todo.objects.bulk_create(
+                Todo(user_id=user_ids[i % len(user_ids)], title=f"due {round_}/{i}", start_time=start,
+                     end_time=start + timedelta(minutes=30), day=start.date())
+                for i in range(args.due)
+            )
+            elapsed, sent = timed(ReminderScheduler(**scheduler_kwargs).tick)
+            assert sent == args.due, sent
+            mail.outbox.clear()
+            samples.append(elapsed)
+        report(f"tick, {size} pending", samples)
+
+    with connection.cursor() as cursor:
+        query = Todo.objects.filter(reminded=False, start_time__lte=now + lead).order_by("start_time")[:args.due]
+        sql, params = query.values_list("id", "start_time").query.sql_with_params()
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            print("refill plan:", "; ".join(row[-1] for row in cursor.fetchall()))
+
+
+if __name__ == "__main__":
+    main()
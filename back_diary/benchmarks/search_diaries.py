@@ -0,0 +1,73 @@
+"""
+Diary search: ``icontains`` (LIKE '%term%') vs the FTS5 index behind
+``/search/``, on a corpus of generated diary entries.
+
+    python -m benchmarks.search_diaries --diaries 1000000
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+from benchmarks._harness import report, seed_users, setup_django, timed
+
+COMMON = (
+    "morning coffee forest walk meeting project deadline gym run family dinner book "
+    "music travel train rain sunny tired happy garden code review lunch friends movie "
+    "letter doctor market bike river mountain sea quiet noisy plan idea dream"
+).split()
+# A long tail of rarer words (Zipf-ish weights) so queries are selective,
+# like names and places in real entries.
+RARE = [f"topic{i}" for i in range(20_000)]
+RARE_WEIGHTS = [1 / (i + 1) for i in range(len(RARE))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--diaries", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from Diary_todo.models import Diary
+    from Diary_todo.search import matching_ids, search
+    from user_authentication.models import User
+
+    users = -(-args.diaries // args.days)
+    print(f"seeding {args.diaries} diaries for {users} users ...")
+    user_ids = seed_users(users)
+    rng = random.Random(3)
+    first = date(2025, 1, 1)
+    batch = []
+    for i in range(args.diaries):
+        text = " ".join(rng.choices(COMMON, k=rng.randint(40, 120)) + rng.choices(RARE, RARE_WEIGHTS, k=8))
+        batch.append(Diary(user_id=user_ids[i // args.days], pub_date=first + timedelta(days=i % args.days), text=text))
+        if len(batch) >= 10_000:
+            Diary.objects.bulk_create(batch)
+            batch.clear()
+    Diary.objects.bulk_create(batch)
+
+    picks = [
+        (User.objects.get(id=rng.choice(user_ids)), f"{rng.choice(RARE[50:2000])} {rng.choice(COMMON)}")
+        for _ in range(args.samples)
+    ]
+
+    def like(queryset, text):
+        for word in text.split():
+            queryset = queryset.filter(text__icontains=word)
+        return list(queryset.values_list("id", flat=True))
+
+    print("\n-- one user's entries (search endpoint)")
+    report("icontains, all matches", [timed(like, Diary.objects.filter(user=user), text)[0] for user, text in picks])
+    report("fts5 ranked, top 20", [timed(search, user, text, "diary", 20)[0] for user, text in picks])
+
+    print("\n-- every user's entries (admin search)")
+    report("icontains", [timed(like, Diary.objects.all(), text)[0] for _, text in picks[:20]])
+    report("fts5 ids", [
+        timed(lambda: list(Diary.objects.filter(id__in=matching_ids("diary", text)).values_list("id", flat=True)))[0]
+        for _, text in picks[:20]
+    ])
+
+
+if __name__ == "__main__":
+    main()
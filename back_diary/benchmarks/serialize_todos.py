@@ -0,0 +1,60 @@
+"""
+Serialization throughput of a todo list: ``TodoSerializer`` over model
+instances rendered by DRF's ``JSONRenderer`` (the old path) vs ``.values()``
+rows through ``serializer.todo_data`` rendered by ``ORJSONRenderer``.
+Query time is included; both paths read the same rows.
+
+    python -m benchmarks.serialize_todos --todos 5000
+"""
+import argparse
+import time
+
+from benchmarks._harness import seed_todos, seed_users, setup_django
+
+
+def rate(label, rows, fn, repeat):
+    best = min(_elapsed(fn) for _ in range(repeat))
+    print(f"{label:<34} {rows / best:12.0f} rows/s  ({best * 1000:8.1f}ms per {rows} rows)")
+    return best
+
+
+def _elapsed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--todos", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+    from Diary_todo.models import Todo
+    from Diary_todo.serializer import TODO_FIELDS, TodoSerializer
+    from Diary_todo.views import serialize_todos
+    from my_day.renderers import ORJSONRenderer
+
+    user_ids = seed_users(1)
+    seed_todos(user_ids, args.todos)
+    todos = Todo.objects.filter(user_id=user_ids[0]).order_by("-start_time", "-id")
+
+    assert (
+        JSONRenderer().render(TodoSerializer(todos, many=True).data)
+        == ORJSONRenderer().render(serialize_todos(list(todos.values(*TODO_FIELDS))))
+    )
+
+    old = rate("ModelSerializer + json", args.todos,
+               lambda: JSONRenderer().render(TodoSerializer(list(todos), many=True).data), args.repeat)
+    rate("  ModelSerializer only", args.todos, lambda: TodoSerializer(list(todos), many=True).data, args.repeat)
+    new = rate("values() + todo_data + orjson", args.todos,
+               lambda: ORJSONRenderer().render(serialize_todos(list(todos.values(*TODO_FIELDS)))), args.repeat)
+    rate("  values() + todo_data only", args.todos,
+         lambda: serialize_todos(list(todos.values(*TODO_FIELDS))), args.repeat)
+    print(f"speedup {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
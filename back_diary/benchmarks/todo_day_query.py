@@ -0,0 +1,65 @@
+"""
+Day view query for ``get_all_todos``: date cast without index vs. the
+half-open range over the ``(user, start_time)`` index.
+
+    python -m benchmarks.todo_day_query --users 10000 --todos 1000000
+"""
+import argparse
+import random
+from datetime import timedelta
+
+from benchmarks._harness import report, seed_todos, seed_users, setup_django, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--todos", type=int, default=1_000_000)
+    parser.add_argument("--samples", type=int, default=2_000)
+    args = parser.parse_args()
+
+    connection = setup_django()
+    from zoneinfo import ZoneInfo
+
+    from Diary_todo.models import Todo
+    from Diary_todo.utils import day_bounds
+
+    print(f"seeding {args.todos} todos across {args.users} users ...")
+    user_ids = seed_users(args.users)
+    first_day = seed_todos(user_ids, args.todos)
+    tz = ZoneInfo("UTC")
+    index = Todo._meta.indexes[0]
+
+    rng = random.Random(1)
+    picks = [
+        (rng.choice(user_ids), first_day + timedelta(days=rng.randrange(365)))
+        for _ in range(args.samples)
+    ]
+
+    def before(user_id, day):
+        qs = Todo.objects.filter(user_id=user_id, start_time__date=day)
+        return qs.order_by("-start_time")
+
+    def after(user_id, day):
+        start, end = day_bounds(day, tz)
+        qs = Todo.objects.filter(user_id=user_id, start_time__gte=start, start_time__lt=end)
+        return qs.order_by("-start_time")
+
+    with connection.schema_editor() as editor:
+        editor.remove_index(Todo, index)
+    run("before (date cast, FK index)", before, picks)
+
+    with connection.schema_editor() as editor:
+        editor.add_index(Todo, index)
+    run("after (range, user+start)", after, picks)
+
+
+def run(label, build, picks):
+    print(f"\n== {label}")
+    print(build(*picks[0]).explain())
+    samples = [timed(list, build(user_id, day))[0] for user_id, day in picks]
+    report(label, samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Overlap checks for a single heavy user: the indexed ``exists()`` probe used
+by ``add_todo`` and the sort-and-sweep behind ``/conflicts/``.
+
+    python -m benchmarks.todo_overlaps --todos 100000
+"""
+import argparse
+import random
+from datetime import timedelta
+
+from benchmarks._harness import report, seed_todos, seed_users, setup_django, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--todos", type=int, default=100_000)
+    parser.add_argument("--samples", type=int, default=1_000)
+    parser.add_argument("--naive-subset", type=int, default=3_000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.utils import timezone
+
+    from Diary_todo.models import Todo
+    from Diary_todo.utils import find_overlaps, overlapping
+
+    (user_id,) = seed_users(1)
+    first_day = seed_todos([user_id], args.todos)
+    todos = Todo.objects.filter(user_id=user_id)
+    first = timezone.make_aware(timezone.datetime.combine(first_day, timezone.datetime.min.time()))
+
+    rng = random.Random(2)
+    probes = []
+    for _ in range(args.samples):
+        start = first + timedelta(days=rng.randrange(365), minutes=rng.randrange(0, 1440, 15))
+        probes.append((start, start + timedelta(minutes=30)))
+    print(overlapping(todos, *probes[0]).explain())
+    report("add_todo overlap probe", [timed(overlapping(todos, s, e).exists)[0] for s, e in probes])
+
+    load, rows = timed(lambda: list(todos.values_list("start_time", "end_time", "id").iterator(chunk_size=5000)))
+    sweep, pairs = timed(find_overlaps, rows)
+    print(f"\nconflicts over {len(rows)} todos: load {load * 1000:.0f}ms, sweep {sweep * 1000:.0f}ms, {len(pairs)} pairs")
+
+    subset = rows[:args.naive_subset]
+    naive, naive_pairs = timed(lambda: [
+        (a[2], b[2]) for i, a in enumerate(subset) for b in subset[i + 1:] if a[0] < b[1] and b[0] < a[1]
+    ])
+    sweep_subset, sweep_pairs = timed(find_overlaps, subset)
+    assert len(naive_pairs) == len(sweep_pairs)
+    print(f"{len(subset)}-todo subset: pairwise {naive * 1000:.0f}ms vs sweep {sweep_subset * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Requests/sec of ``verify_token`` under concurrent load, driven in-process
+through Django's test client from a thread pool.
+
+    python -m benchmarks.verify_token --requests 20000 --concurrency 32
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._harness import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--tokens", type=int, default=200, help="distinct users/tokens in rotation")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client, override_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from benchmarks._harness import seed_users
+    from user_authentication.models import User
+    from user_authentication.tokens import validated_tokens
+
+    seed_users(args.tokens)
+    tokens = [str(AccessToken.for_user(user)) for user in User.objects.all()[:args.tokens]]
+
+    modes = [
+        ("before: DRF + User lookup", {"VERIFY_TOKEN_STATELESS": False}, 0),
+        ("stateless, no LRU", {"VERIFY_TOKEN_STATELESS": True}, 0),
+        ("stateless + LRU", {"VERIFY_TOKEN_STATELESS": True}, 1024),
+    ]
+    for label, overrides, lru_size in modes:
+        validated_tokens.clear()
+        validated_tokens.maxsize = lru_size
+        with override_settings(**overrides):
+            rate = run(Client, tokens, args.requests, args.concurrency)
+        print(f"{label:<28} {rate:10.0f} req/s  ({args.concurrency} threads)")
+
+
+def run(client_class, tokens, total, concurrency):
+    per_worker = total // concurrency
+
+    def worker(offset):
+        client = client_class()
+        for i in range(per_worker):
+            token = tokens[(offset + i) % len(tokens)]
+            response = client.get(
+                "/api/user_authentication/verify_token/", HTTP_AUTHORIZATION=f"Bearer {token}"
+            )
+            assert response.status_code == 200, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    return per_worker * concurrency / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
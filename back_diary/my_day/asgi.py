@@ -2,6 +2,9 @@
 ASGI config for my_day project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (``uvicorn my_day.asgi:application``) for the
+native async views, including the ``async/changes/`` event stream, which holds
+one long-lived request per open tab.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
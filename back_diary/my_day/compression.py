@@ -0,0 +1,195 @@
+"""
+Negotiated response compression.
+
+``CompressionMiddleware`` encodes responses with the first codec in
+``COMPRESSION_LEVELS`` that is installed and accepted by the client's
+``Accept-Encoding``: zstd (``zstandard``), brotli (``brotli``) or gzip
+(always available). Bodies shorter than ``COMPRESSION_MIN_BYTES``, types
+outside ``COMPRESSION_CONTENT_TYPES`` and views marked ``@compress_exempt``
+are sent as they are. Streaming responses (sync or async) are compressed
+chunk by chunk with a flush after each one, so a long export still reaches
+the client as it is produced.
+
+Compressing changes the bytes of the body, so strong ETags become weak ones
+(as Django's ``GZipMiddleware`` does); ``If-None-Match`` compares weakly.
+"""
+import gzip
+import re
+import zlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class GzipCodec:
+    name = "gzip"
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def stream(self):
+        """``(compress_chunk, finish)`` for a streamed body."""
+        encoder = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return (lambda chunk: encoder.compress(chunk) + encoder.flush(zlib.Z_SYNC_FLUSH)), encoder.flush
+
+
+class BrotliCodec(GzipCodec):
+    name = "br"
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.level)
+
+    def stream(self):
+        encoder = brotli.Compressor(quality=self.level)
+        return (lambda chunk: encoder.process(chunk) + encoder.flush()), encoder.finish
+
+
+class ZstdCodec(GzipCodec):
+    name = "zstd"
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def stream(self):
+        encoder = zstandard.ZstdCompressor(level=self.level).compressobj()
+        return (
+            (lambda chunk: encoder.compress(chunk) + encoder.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)),
+            encoder.flush,
+        )
+
+
+CODECS = {"gzip": GzipCodec}
+if brotli is not None:
+    CODECS["br"] = BrotliCodec
+if zstandard is not None:
+    CODECS["zstd"] = ZstdCodec
+
+_coding = re.compile(r"^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$")
+
+
+def accepted_encodings(header):
+    """``{coding: q}`` from an ``Accept-Encoding`` header."""
+    accepted = {}
+    for part in header.lower().split(","):
+        match = _coding.match(part)
+        if match:
+            try:
+                accepted[match[1]] = float(match[2]) if match[2] else 1.0
+            except ValueError:
+                continue
+    return accepted
+
+
+def negotiate(header):
+    """The codec to use for ``header``, or ``None`` to send the body as is."""
+    accepted = accepted_encodings(header)
+    best, best_q = None, 0.0
+    # Ties go to the server's order of preference in COMPRESSION_LEVELS.
+    for name, level in settings.COMPRESSION_LEVELS.items():
+        q = accepted.get(name, accepted.get("*", 0.0))
+        if name in CODECS and q > best_q:
+            best, best_q = CODECS[name](level), q
+    return best
+
+
+def compress_exempt(view):
+    """Mark a view whose responses are never compressed, e.g. tiny or latency-bound ones."""
+    if iscoroutinefunction(view):
+        async def wrapper(*args, **kwargs):
+            return await view(*args, **kwargs)
+    else:
+        def wrapper(*args, **kwargs):
+            return view(*args, **kwargs)
+    wrapper.compress_exempt = True
+    return wraps(view)(wrapper)
+
+
+def _compressible(response):
+    content_type = response.get("Content-Type", "").partition(";")[0].strip().lower()
+    return content_type.startswith("text/") or content_type in settings.COMPRESSION_CONTENT_TYPES
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.compress_exempt = getattr(view_func, "compress_exempt", False)
+
+    def compress(self, request, response):
+        if getattr(request, "compress_exempt", False) or response.has_header("Content-Encoding"):
+            return response
+        if not _compressible(response):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_BYTES:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        codec = negotiate(request.headers.get("Accept-Encoding", ""))
+        if codec is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self._acompress_stream(codec, response.streaming_content)
+            else:
+                response.streaming_content = self._compress_stream(codec, response.streaming_content)
+            response.headers.pop("Content-Length", None)
+        else:
+            compressed = codec.compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = codec.name
+        return response
+
+    @staticmethod
+    def _compress_stream(codec, chunks):
+        compress, finish = codec.stream()
+        for chunk in chunks:
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
+
+    @staticmethod
+    async def _acompress_stream(codec, chunks):
+        compress, finish = codec.stream()
+        async for chunk in chunks:
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
@@ -0,0 +1,209 @@
+"""
+Per-view request instrumentation.
+
+``RequestMetricsMiddleware`` times every request and counts the SQL it ran
+(through ``connection.execute_wrapper``). Views mark their serialization with
+``timed("serializer")``. The numbers are aggregated in process and served by
+the ``metrics`` view in Prometheus text format. A sampled share of requests,
+plus every slow one, is also logged as a one-line JSON record on the
+``my_day.requests`` logger.
+
+Aggregates are per worker process; scrape each worker (or sum them) when
+running several.
+"""
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger("my_day.requests")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+class ViewStats:
+    __slots__ = ("count", "statuses", "buckets", "seconds", "queries", "sql_seconds", "serializer_seconds", "bytes")
+
+    def __init__(self):
+        self.count = 0
+        self.statuses = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.seconds = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.bytes = 0
+
+
+class Registry:
+    """Thread-safe in-process aggregates keyed by (view, method)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, record):
+        key = (record["view"], record["method"])
+        with self._lock:
+            stats = self._views.get(key)
+            if stats is None:
+                stats = self._views[key] = ViewStats()
+            stats.count += 1
+            stats.statuses[record["status"]] = stats.statuses.get(record["status"], 0) + 1
+            stats.buckets[bisect_left(LATENCY_BUCKETS, record["duration_ms"] / 1000)] += 1
+            stats.seconds += record["duration_ms"] / 1000
+            stats.queries += record["queries"]
+            stats.sql_seconds += record["sql_ms"] / 1000
+            stats.serializer_seconds += record["serializer_ms"] / 1000
+            stats.bytes += record["bytes"] or 0
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        """Return every aggregate in the Prometheus text exposition format."""
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+
+            def family(name, kind, help_text):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            family("my_day_requests_total", "counter", "Requests served.")
+            for (view, method), stats in views:
+                for code, count in sorted(stats.statuses.items()):
+                    lines.append(f'my_day_requests_total{{{_labels(view, method)},status="{code}"}} {count}')
+
+            family("my_day_request_duration_seconds", "histogram", "Time spent in the view and middleware.")
+            for (view, method), stats in views:
+                labels = _labels(view, method)
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), stats.buckets):
+                    cumulative += count
+                    lines.append(f'my_day_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"my_day_request_duration_seconds_sum{{{labels}}} {stats.seconds:.6f}")
+                lines.append(f"my_day_request_duration_seconds_count{{{labels}}} {stats.count}")
+
+            for name, attr, help_text in (
+                ("my_day_request_queries_total", "queries", "SQL queries executed."),
+                ("my_day_request_sql_seconds_total", "sql_seconds", "Time spent executing SQL."),
+                ("my_day_request_serializer_seconds_total", "serializer_seconds", "Time spent serializing."),
+                ("my_day_response_bytes_total", "bytes", "Response body bytes (streamed bodies excluded)."),
+            ):
+                family(name, "counter", help_text)
+                for (view, method), stats in views:
+                    value = getattr(stats, attr)
+                    value = f"{value:.6f}" if isinstance(value, float) else value
+                    lines.append(f"{name}{{{_labels(view, method)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(view, method):
+    return f'view="{_escape(view)}",method="{_escape(method)}"'
+
+
+registry = Registry()
+
+
+@contextmanager
+def timed(section):
+    """Attribute the enclosed block's wall time to ``section`` of the current request."""
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        key = f"{section}_ms"
+        current[key] = current.get(key, 0.0) + (time.perf_counter() - started) * 1000
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        current = {"queries": 0, "sql_ms": 0.0, "serializer_ms": 0.0}
+        token = _current.set(current)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self._count_sql):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, current, started)
+        return response
+
+    async def __acall__(self, request):
+        current = {"queries": 0, "sql_ms": 0.0, "serializer_ms": 0.0}
+        token = _current.set(current)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self._count_sql):
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, current, started)
+        return response
+
+    def _finish(self, request, response, current, started):
+        duration_ms = (time.perf_counter() - started) * 1000
+        match = getattr(request, "resolver_match", None)
+        record = {
+            "view": match.view_name if match else "unmatched",
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(duration_ms, 3),
+            "queries": current["queries"],
+            "sql_ms": round(current["sql_ms"], 3),
+            "serializer_ms": round(current["serializer_ms"], 3),
+            "bytes": None if response.streaming else len(response.content),
+        }
+        registry.observe(record)
+        if duration_ms >= settings.REQUEST_METRICS_SLOW_MS or random.random() < settings.REQUEST_METRICS_SAMPLE_RATE:
+            logger.info(json.dumps(record))
+
+    @staticmethod
+    def _count_sql(execute, sql, params, many, context):
+        current = _current.get()
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if current is not None:
+                current["queries"] += 1
+                current["sql_ms"] += (time.perf_counter() - started) * 1000
+
+
+def metrics(request):
+    """Prometheus scrape endpoint; open to METRICS_ALLOWED_IPS and staff users."""
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
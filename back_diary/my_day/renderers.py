@@ -0,0 +1,48 @@
+"""
+orjson-backed drop-ins for DRF's ``JSONRenderer`` and ``JSONParser``.
+
+For payloads without floats the renderer produces the same bytes as DRF's
+compact, unicode ``JSONRenderer``: dates, times and anything orjson does not
+know natively go through DRF's ``JSONEncoder.default``, and U+2028/U+2029 are
+escaped the same way. Indented output (the browsable API, ``; indent=`` in
+``Accept``) and values orjson rejects, like integers wider than 64 bits, fall
+back to DRF.
+
+Floats are where the two differ. orjson writes some of them differently
+(``-1e-6`` instead of ``-1e-06``; both parse to the same value). It also
+renders NaN and infinities as ``null``, where DRF raises ``ValueError``.
+Views whose payloads carry floats (search ranks, stats rates) therefore
+render with ``FLOAT_RENDERER_CLASSES``, i.e. DRF itself; choosing per view
+is free, while scanning every payload for floats costs more than orjson
+saves.
+"""
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+FLOAT_RENDERER_CLASSES = [JSONRenderer, BrowsableAPIRenderer]
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.ensure_ascii or not self.compact or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same JavaScript-safe escaping as JSONRenderer.
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class ORJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
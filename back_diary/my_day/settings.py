@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'my_day.metrics.RequestMetricsMiddleware',
+    'my_day.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,7 +70,17 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated', 
-    ]
+    ],
+    # orjson versions of DRF's JSON renderer and parser (same output bytes; see my_day.renderers).
+    'DEFAULT_RENDERER_CLASSES': [
+        'my_day.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'my_day.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 SIMPLE_JWT = {
@@ -78,6 +91,11 @@ SIMPLE_JWT = {
     "ALGORITHM": "HS256",
 }
 
+# verify_token checks only signature/expiry (no User query) and remembers up
+# to VERIFY_TOKEN_CACHE_SIZE recently validated tokens; set 0 to disable.
+VERIFY_TOKEN_STATELESS = True
+VERIFY_TOKEN_CACHE_SIZE = 1024
+
 
 
 ROOT_URLCONF = 'my_day.urls'
@@ -103,13 +121,147 @@ WSGI_APPLICATION = 'my_day.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default, in WAL mode so readers never wait for a writer and
+# writers queue on the busy timeout instead of failing with "database is
+# locked". BEGIN IMMEDIATE takes the write lock up front, since a deferred
+# transaction that later upgrades to a write cannot wait on busy_timeout.
+#
+# Set POSTGRES_DB (plus POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST,
+# POSTGRES_PORT) to use PostgreSQL instead; this needs
+# `pip install "psycopg[binary,pool]"`. Connections come from a psycopg_pool
+# pool of POSTGRES_POOL_MIN..POSTGRES_POOL_MAX per process. With
+# POSTGRES_POOL=0 they are persistent per thread for CONN_MAX_AGE seconds.
+
+if os.environ.get("POSTGRES_DB"):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ["POSTGRES_DB"],
+            'USER': os.environ.get("POSTGRES_USER", ""),
+            'PASSWORD': os.environ.get("POSTGRES_PASSWORD", ""),
+            'HOST': os.environ.get("POSTGRES_HOST", "localhost"),
+            'PORT': os.environ.get("POSTGRES_PORT", "5432"),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get("POSTGRES_POOL", "1") == "1":
+        # Django requires CONN_MAX_AGE = 0 (the default) with a pool.
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get("POSTGRES_POOL_MIN", "2")),
+                'max_size': int(os.environ.get("POSTGRES_POOL_MAX", "20")),
+                'timeout': 10,
+            },
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get("CONN_MAX_AGE", "60"))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA mmap_size=268435456;'
+                ),
+                'timeout': 20,  # busy timeout, seconds
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+
+# Cache
+# Local memory by default; set REDIS_URL (e.g. redis://127.0.0.1:6379/0) to
+# share the day cache between worker processes.
+
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'my_day',
+        }
     }
+
+# Seconds a serialized day payload (diary / todos of one date) stays cached.
+DAY_CACHE_TIMEOUT = 300
+
+
+# Request metrics
+# Every request is aggregated for /metrics; REQUEST_METRICS_SAMPLE_RATE of
+# them (and all taking REQUEST_METRICS_SLOW_MS or longer) are also logged as
+# JSON lines on the "my_day.requests" logger.
+
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get("REQUEST_METRICS_SAMPLE_RATE", "0.01"))
+REQUEST_METRICS_SLOW_MS = 500
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+
+# Response compression
+# Codecs in order of preference with their level; zstd and br are used only
+# when zstandard / brotli are installed. Smaller bodies are sent as they are.
+
+COMPRESSION_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+COMPRESSION_MIN_BYTES = 1024
+# Besides text/*.
+COMPRESSION_CONTENT_TYPES = ["application/json", "application/x-ndjson", "application/javascript", "image/svg+xml"]
+
+
+# Reminders
+# manage.py run_reminders emails each todo's owner REMINDER_LEAD_MINUTES before
+# it starts, through REMINDER_BROKER; reminders that would go out more than
+# REMINDER_MAX_LATENESS_MINUTES after the start are dropped.
+
+REMINDER_LEAD_MINUTES = int(os.environ.get("REMINDER_LEAD_MINUTES", "15"))
+REMINDER_MAX_LATENESS_MINUTES = 10
+REMINDER_BROKER = "Diary_todo.reminders.EmailBroker"
+EMAIL_BACKEND = os.environ.get("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "reminders@localhost")
+
+
+# Sync
+# /sync/ cursors stop SYNC_SETTLE_SECONDS short of now, so rows whose
+# transaction commits late are still picked up. Tombstones of deleted rows
+# (and cursors) last SYNC_TOMBSTONE_DAYS; run manage.py prune_tombstones daily.
+
+SYNC_SETTLE_SECONDS = 2
+SYNC_TOMBSTONE_DAYS = 90
+
+
+# Change feed
+# /async/changes/ streams each user's writes as Server-Sent Events (ASGI only).
+# LocalBroker fans out within one process; with several workers use
+# "Diary_todo.feed.RedisBroker" and CHANGE_FEED_REDIS_URL. A subscriber that
+# falls CHANGE_FEED_QUEUE_SIZE events behind gets a single "resync" instead.
+
+CHANGE_FEED_BROKER = os.environ.get("CHANGE_FEED_BROKER", "Diary_todo.feed.LocalBroker")
+CHANGE_FEED_REDIS_URL = os.environ.get("CHANGE_FEED_REDIS_URL", "redis://localhost:6379/0")
+CHANGE_FEED_QUEUE_SIZE = 64
+CHANGE_FEED_HEARTBEAT_SECONDS = 15
+CHANGE_FEED_RETRY_MS = 5000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'my_day.requests': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
 }
 
+# Silences the request log above while tests run.
+TEST_RUNNER = "my_day.test_runner.TestRunner"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,6 +282,38 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+
+# Password hashing
+# New hashes use PASSWORD_HASHER (pbkdf2, scrypt or argon2; argon2 needs
+# argon2-cffi); the others stay listed so existing hashes still verify and are
+# upgraded on the next login, as are hashes made with a different cost.
+
+_PASSWORD_HASHERS = {
+    "scrypt": "user_authentication.hashers.ScryptPasswordHasher",
+    "argon2": "user_authentication.hashers.Argon2PasswordHasher",
+    "pbkdf2": "user_authentication.hashers.PBKDF2PasswordHasher",
+}
+PASSWORD_HASHER = os.environ.get("PASSWORD_HASHER", "scrypt")
+PASSWORD_HASHERS = [
+    _PASSWORD_HASHERS[PASSWORD_HASHER],
+    *(path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER),
+]
+# Per-algorithm parameters; anything left out keeps Django's default. scrypt
+# N=2**14, r=8, p=5 and argon2 t=2, m=100 MiB, p=8 are Django's (and OWASP's)
+# recommendations.
+PASSWORD_HASHER_COST = {
+    "scrypt": {
+        "work_factor": int(os.environ.get("PASSWORD_SCRYPT_N", 2 ** 14)),
+        "parallelism": int(os.environ.get("PASSWORD_SCRYPT_P", "5")),
+    },
+    "argon2": {
+        "time_cost": int(os.environ.get("PASSWORD_ARGON2_T", "2")),
+        "memory_cost": int(os.environ.get("PASSWORD_ARGON2_M", "102400")),
+    },
+}
+# Threads hashing for the async views; defaults to the CPU count.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "0")) or None
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -0,0 +1,21 @@
+import logging
+
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    ``DiscoverRunner`` with the sampled and slow request log
+    (``my_day.requests``) silenced, so random metric lines do not end up
+    between the test dots. ``assertLogs`` still sees the records.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        logger = logging.getLogger("my_day.requests")
+        self._request_log_handlers = logger.handlers
+        logger.handlers = [logging.NullHandler()]
+
+    def teardown_test_environment(self, **kwargs):
+        logging.getLogger("my_day.requests").handlers = self._request_log_handlers
+        super().teardown_test_environment(**kwargs)
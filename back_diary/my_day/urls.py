@@ -17,6 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path , include
 from user_authentication import views
+from my_day.metrics import metrics
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -27,4 +28,5 @@ urlpatterns = [
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/user_authentication/', include('user_authentication.urls')),
     path('api/Diary_todo/', include('Diary_todo.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
\ No newline at end of file
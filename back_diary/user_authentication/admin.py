@@ -1,8 +1,14 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from .models import User
 from Diary_todo.models import Diary, Todo
+from Diary_todo import stats as daily_stats
+from Diary_todo.cache import invalidate_day, invalidate_user
+from Diary_todo.search import matching_ids
 from datetime import timedelta
 
 
@@ -29,6 +35,83 @@ class TodoInlineForUser(admin.TabularInline):
     show_change_link = True
 
 
+def count_per_user(model, user_ref="pk"):
+    """
+    Correlated ``COUNT(*)`` of ``model`` rows per user. Counting through
+    subqueries instead of joining ``diaries`` and ``todos`` avoids the
+    diaries x todos row blow-up, and only the listed page is counted.
+    """
+    rows = model.objects.filter(user=OuterRef(user_ref)).order_by().values("user")
+    return Coalesce(Subquery(rows.annotate(n=Count("pk")).values("n")), 0)
+
+
+def touched_todo_days(queryset):
+    """``(user_id, day, rule_id)`` of the todos in ``queryset``; ``rule_id`` is None unless recurring."""
+    return set(queryset.order_by().values_list("user_id", "day", "recurrence__id").distinct())
+
+
+def touched_diary_days(queryset):
+    return {(user_id, day, None) for user_id, day in queryset.order_by().values_list("user_id", "pub_date")}
+
+
+def invalidate_touched(touched):
+    """Bump the day caches (and notify the change feeds) of ``touched_*_days`` rows."""
+    for user_id, day, rule_id in touched:
+        if rule_id:
+            # A recurring todo shows up on days other than its own.
+            invalidate_user(user_id)
+        else:
+            invalidate_day(user_id, day)
+
+
+def set_status(queryset, status):
+    """
+    ``QuerySet.update`` sends no signals and skips ``auto_now``, so bump
+    ``updated_at``, refresh the DailyStats days it touches and invalidate
+    their cached payloads here.
+    """
+    touched = touched_todo_days(queryset)
+    with transaction.atomic(), daily_stats.batched():
+        updated = queryset.update(status=status, updated_at=timezone.now())
+        for user_id, day, _ in touched:
+            daily_stats.refresh_days(user_id, [day])
+        invalidate_touched(touched)
+    return updated
+
+
+class InvalidatesDaysAdmin(admin.ModelAdmin):
+    """
+    Invalidate the day caches of the rows an admin form or delete touches,
+    before and after the write, like the API views do.
+    """
+    # touched_todo_days or touched_diary_days.
+    touched_days = None
+
+    def save_model(self, request, obj, form, change):
+        before = self.touched_days(self.model.objects.filter(pk=obj.pk)) if change else set()
+        super().save_model(request, obj, form, change)
+        invalidate_touched(before | self.touched_days(self.model.objects.filter(pk=obj.pk)))
+
+    def delete_model(self, request, obj):
+        touched = self.touched_days(self.model.objects.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+        invalidate_touched(touched)
+
+    def delete_queryset(self, request, queryset):
+        touched = self.touched_days(queryset)
+        super().delete_queryset(request, queryset)
+        invalidate_touched(touched)
+
+
+def fts_search_results(model_admin, request, queryset, search_term, kind):
+    """Match text columns through the FTS index instead of LIKE '%term%' scans."""
+    ids = matching_ids(kind, search_term)
+    if ids is None:
+        return super(type(model_admin), model_admin).get_search_results(request, queryset, search_term)
+    user_match = models.Q(user__email__icontains=search_term) | models.Q(user__username__icontains=search_term)
+    return queryset.filter(models.Q(id__in=ids) | user_match), False
+
+
 # Custom User Admin
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -55,22 +138,31 @@ class CustomUserAdmin(UserAdmin):
     )
 
     def diary_count(self, obj):
-        return obj.diaries.count()
+        return obj._diary_count
     diary_count.short_description = 'Diaries'
+    diary_count.admin_order_field = '_diary_count'
 
     def todo_count(self, obj):
-        return obj.todos.count()
+        return obj._todo_count
     todo_count.short_description = 'Todos'
+    todo_count.admin_order_field = '_todo_count'
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.prefetch_related('diaries', 'todos')
+        return qs.annotate(_diary_count=count_per_user(Diary), _todo_count=count_per_user(Todo))
+
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        if formset.has_changed():
+            # Inline diaries and todos can land on any day.
+            invalidate_user(form.instance.pk)
 
 
 # Diary Admin
 @admin.register(Diary)
-class DiaryAdmin(admin.ModelAdmin):
+class DiaryAdmin(InvalidatesDaysAdmin):
     """Admin for Diary model"""
+    touched_days = staticmethod(touched_diary_days)
     list_display = ('user_info', 'pub_date', 'text_preview', 'user_todo_count')
     list_filter = ('pub_date', 'user__is_staff', 'user')
     search_fields = ('user__email', 'user__username', 'text')
@@ -92,19 +184,24 @@ class DiaryAdmin(admin.ModelAdmin):
         return obj.text[:80] + '...' if len(obj.text) > 80 else obj.text
     text_preview.short_description = 'Content Preview'
 
+    def get_search_results(self, request, queryset, search_term):
+        return fts_search_results(self, request, queryset, search_term, "diary")
+
     def user_todo_count(self, obj):
-        return obj.user.todos.count()
+        return obj._user_todo_count
     user_todo_count.short_description = 'User Todos'
+    user_todo_count.admin_order_field = '_user_todo_count'
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.select_related('user').prefetch_related('user__todos')
+        return qs.select_related('user').annotate(_user_todo_count=count_per_user(Todo, "user"))
 
 
 # Todo Admin
 @admin.register(Todo)
-class TodoAdmin(admin.ModelAdmin):
+class TodoAdmin(InvalidatesDaysAdmin):
     """Admin for Todo model with DateTime support"""
+    touched_days = staticmethod(touched_todo_days)
     list_display = ('title', 'user_info', 'time_range', 'status', 'duration_display')
     list_filter = ('status', 'user')
     search_fields = ('title', 'description', 'user__email', 'user__username')
@@ -120,6 +217,9 @@ class TodoAdmin(admin.ModelAdmin):
     user_info.short_description = 'User'
     user_info.admin_order_field = 'user__email'
 
+    def get_search_results(self, request, queryset, search_term):
+        return fts_search_results(self, request, queryset, search_term, "todo")
+
     def time_range(self, obj):
         """Show start and end datetime safely"""
         if obj.start_time and obj.end_time:
@@ -149,17 +249,17 @@ class TodoAdmin(admin.ModelAdmin):
     actions = ['mark_completed', 'mark_in_progress', 'mark_not_started']
 
     def mark_completed(self, request, queryset):
-        updated = queryset.update(status='completed')
+        updated = set_status(queryset, 'completed')
         self.message_user(request, f"{updated} todos marked as completed.")
     mark_completed.short_description = "Mark selected todos as completed"
 
     def mark_in_progress(self, request, queryset):
-        updated = queryset.update(status='in_progress')
+        updated = set_status(queryset, 'in_progress')
         self.message_user(request, f"{updated} todos marked as in progress.")
     mark_in_progress.short_description = "Mark selected todos as in progress"
 
     def mark_not_started(self, request, queryset):
-        updated = queryset.update(status='not_started')
+        updated = set_status(queryset, 'not_started')
         self.message_user(request, f"{updated} todos marked as not started.")
     mark_not_started.short_description = "Mark selected todos as not started"
 
@@ -0,0 +1,45 @@
+"""
+Native async login for ASGI deployments. The password check runs on the
+bounded hashing executor (``hashers.acheck_password``), so a slow hash never
+blocks the event loop. Bodies and status codes match ``views.login``.
+"""
+import json
+
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from Diary_todo.async_views import json_response
+from .hashers import acheck_password
+from .models import User
+
+
+def request_data(request):
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    data = request_data(request)
+    if not data:
+        return json_response({"error": "No data provided."}, status=400)
+
+    email = data.get("email")
+    password = data.get("password")
+    if not email or not password:
+        return json_response({"error": "Email and password are required."}, status=400)
+    try:
+        user = await User.objects.aget(email=email)
+    except User.DoesNotExist:
+        return json_response({"error": "User not found."}, status=404)
+    if not await acheck_password(user, password):
+        return json_response({"error": "Invalid credentials."}, status=401)
+    refresh = RefreshToken.for_user(user)
+    return json_response({"refresh": str(refresh), "access": str(refresh.access_token)})
@@ -0,0 +1,76 @@
+"""
+Password hashing: Django's hashers with their cost taken from
+``PASSWORD_HASHER_COST``, and an executor that keeps hashing off the event
+loop in async views.
+
+Changing a cost (or ``PASSWORD_HASHER``) needs no migration: ``must_update``
+compares each stored hash with the current parameters, and both
+``User.check_password`` and ``acheck_password`` below rehash the password on
+the next successful login.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class Cost:
+    """A hasher parameter read from ``PASSWORD_HASHER_COST[algorithm]``, else Django's default."""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.default = getattr(super(owner, owner), name)
+
+    def __get__(self, instance, owner):
+        return settings.PASSWORD_HASHER_COST.get(owner.algorithm, {}).get(self.name, self.default)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    iterations = Cost()
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    work_factor = Cost()
+    block_size = Cost()
+    parallelism = Cost()
+    # Bytes; hashlib's 32 MiB default stops at work_factor * block_size = 2**18.
+    maxmem = Cost()
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Needs ``argon2-cffi``."""
+    time_cost = Cost()
+    memory_cost = Cost()
+    parallelism = Cost()
+
+
+_executor = None
+
+
+def executor():
+    # hashlib and argon2 release the GIL, so these threads hash in parallel.
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "PASSWORD_HASH_WORKERS", None) or os.cpu_count(),
+            thread_name_prefix="password-hash",
+        )
+    return _executor
+
+
+async def acheck_password(user, raw_password):
+    """
+    ``user.check_password`` for async views, with the hashing run on the
+    bounded ``executor()`` instead of the event loop (Django's own
+    ``acheck_password`` hashes inline).
+    """
+    loop = asyncio.get_running_loop()
+    is_correct, must_update = await loop.run_in_executor(
+        executor(), hashers.verify_password, raw_password, user.password,
+    )
+    if is_correct and must_update:
+        user.password = await loop.run_in_executor(executor(), hashers.make_password, raw_password)
+        await user.asave(update_fields=["password"])
+    return is_correct
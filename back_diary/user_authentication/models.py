@@ -1,3 +1,6 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
@@ -10,9 +13,17 @@ class User(AbstractUser):
     email = models.EmailField(unique=True)
     username = models.CharField(unique=True)
     two_fa = models.BooleanField(default=True)
+    timezone = models.CharField(max_length=64, default=settings.TIME_ZONE)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
 
     def __str__(self):
         return self.email
+
+    def get_timezone(self):
+        """Return the user's zone, falling back to the server zone if unknown."""
+        try:
+            return ZoneInfo(self.timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            return ZoneInfo(settings.TIME_ZONE)
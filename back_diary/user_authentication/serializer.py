@@ -5,8 +5,11 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = '__all__'
+        # Uniqueness is left to the database constraints; ``register`` turns
+        # the IntegrityError into the error message, saving a query per field.
         extra_kwargs = {
-            "username": {"required": True, "min_length": 3},
+            "email": {"validators": []},
+            "username": {"required": True, "min_length": 3, "validators": []},
             "password": {"write_only": True, "min_length": 8}  
         }
 
@@ -1,3 +1,224 @@
-from django.test import TestCase
+import tracemalloc
+from datetime import datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Diary_todo.models import Diary, Todo
+from .models import User
+from .tokens import validated_tokens
+
+
+class VerifyTokenTests(TestCase):
+    url = "/api/user_authentication/verify_token/"
+
+    def setUp(self):
+        validated_tokens.clear()
+        self.user = User.objects.create_user(email="a@example.com", username="alice", password="password123")
+
+    def get(self, token):
+        return self.client.get(self.url, HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_valid_token_needs_no_queries(self):
+        token = str(AccessToken.for_user(self.user))
+        with self.assertNumQueries(0):
+            response = self.get(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"valid": True})
+        self.assertTrue(validated_tokens.is_valid(token, 0))
+
+    def test_rejects_tampered_expired_and_missing_tokens(self):
+        token = str(AccessToken.for_user(self.user))
+        self.assertEqual(self.get(token[:-2] + "xx").status_code, 401)
+
+        expired = AccessToken.for_user(self.user)
+        expired.set_exp(lifetime=-timedelta(seconds=1))
+        self.assertEqual(self.get(str(expired)).status_code, 401)
+
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    @override_settings(VERIFY_TOKEN_STATELESS=False)
+    def test_full_authentication_mode(self):
+        token = str(AccessToken.for_user(self.user))
+        with self.assertNumQueries(1):
+            response = self.get(token)
+        self.assertEqual(response.status_code, 200)
+
+
+FAST_SCRYPT = {"scrypt": {"work_factor": 2 ** 10, "parallelism": 1}}
+PBKDF2_FIRST = [
+    "user_authentication.hashers.PBKDF2PasswordHasher",
+    "user_authentication.hashers.ScryptPasswordHasher",
+]
+
+
+@override_settings(PASSWORD_HASHER_COST=FAST_SCRYPT)
+class PasswordTests(TestCase):
+    def register(self, **data):
+        return self.client.post("/api/user_authentication/register/", {
+            "email": "a@example.com", "username": "alice", "password": "password123", **data,
+        }, content_type="application/json")
+
+    def login(self, path, password="password123"):
+        return self.client.post(
+            f"/api/user_authentication/{path}", {"email": "a@example.com", "password": password},
+            content_type="application/json",
+        )
+
+    def test_register_inserts_without_lookups(self):
+        # SAVEPOINT, INSERT, RELEASE, then the response's groups and permissions.
+        with self.assertNumQueries(5):
+            response = self.register()
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(User.objects.get().password.startswith("scrypt$1024$"))
+
+        self.assertEqual(self.register(username="bob").json(), {"error": "Email is already in use."})
+        response = self.register(email="b@example.com")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Username is already in use."})
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_login_rehashes_to_the_current_hasher_and_cost(self):
+        with override_settings(PASSWORD_HASHERS=PBKDF2_FIRST, PASSWORD_HASHER_COST={"pbkdf2_sha256": {"iterations": 1000}}):
+            user = User.objects.create_user(email="a@example.com", username="alice", password="password123")
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$1000$"))
+
+        self.assertEqual(self.login("login/").status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("scrypt$1024$"))
+
+        with override_settings(PASSWORD_HASHER_COST={"scrypt": {"work_factor": 2 ** 11, "parallelism": 1}}):
+            self.assertEqual(self.login("async/login/").status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("scrypt$2048$"))
+        self.assertTrue(user.check_password("password123"))
+
+    async def test_async_login(self):
+        user = await User.objects.acreate(email="a@example.com", username="alice")
+        user.set_password("password123")
+        await user.asave()
+        client = AsyncClient()
+
+        async def login(email, password):
+            return await client.post(
+                "/api/user_authentication/async/login/", {"email": email, "password": password},
+                content_type="application/json",
+            )
+
+        response = await login("a@example.com", "password123")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.json()["access"])["user_id"], str(user.id))
+        self.assertEqual((await login("a@example.com", "wrong")).status_code, 401)
+        self.assertEqual((await login("b@example.com", "password123")).status_code, 404)
+        self.assertEqual((await client.post("/api/user_authentication/async/login/")).status_code, 400)
+
+
+# tracemalloc slows the changelists past the slow-request log threshold.
+@override_settings(REQUEST_METRICS_SLOW_MS=60_000)
+class AdminCountsTests(TestCase):
+    users = 100
+    todos_per_user = 10_000
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([
+            User(email=f"u{i}@example.com", username=f"u{i}", password="!") for i in range(cls.users)
+        ])
+        first, *others = User.objects.values_list("id", flat=True)
+        cls.first_user_id = first
+        start = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        Todo.objects.bulk_create([
+            Todo(
+                user_id=first, title="t", start_time=start + timedelta(minutes=i),
+                end_time=start + timedelta(minutes=i + 1), day=start.date(),
+            )
+            for i in range(cls.todos_per_user)
+        ], batch_size=5000)
+        # Copy the first user's todos to everyone else in SQL; a million
+        # model instances would dominate the test's run time.
+        columns = "title, description, start_time, end_time, status, day, reminded, updated_at"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {Todo._meta.db_table} (user_id, {columns}) "
+                f"SELECT u.id, {', '.join('t.' + c.strip() for c in columns.split(','))} "
+                f"FROM {Todo._meta.db_table} t CROSS JOIN {User._meta.db_table} u "
+                f"WHERE t.user_id = %s AND u.id <> %s",
+                [first, first],
+            )
+        Diary.objects.bulk_create([Diary(user_id=user_id, pub_date=start.date(), text="d") for user_id in [first, *others]])
+        cls.admin = User.objects.create_superuser(email="root@example.com", username="root", password="password123")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def get_changelist(self, url):
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries), peak
+
+    def test_user_changelist_counts_in_constant_queries(self):
+        url = "/admin/user_authentication/user/"
+        response, queries, peak = self.get_changelist(f"{url}?o=7")
+        self.assertContains(response, '<td class="field-todo_count">10000</td>', count=self.users)
+        self.assertLess(peak, 20 * 1024 * 1024)
+        # Same number of queries for a page holding only the admin.
+        _, single_row_queries, _ = self.get_changelist(f"{url}?is_staff__exact=1")
+        self.assertEqual(queries, single_row_queries)
+
+    def test_diary_changelist_counts_in_constant_queries(self):
+        url = "/admin/Diary_todo/diary/"
+        response, queries, peak = self.get_changelist(f"{url}?o=4")
+        self.assertContains(response, '<td class="field-user_todo_count">10000</td>', count=self.users)
+        self.assertLess(peak, 20 * 1024 * 1024)
+        _, single_row_queries, _ = self.get_changelist(f"{url}?user__id__exact={self.first_user_id}")
+        self.assertEqual(queries, single_row_queries)
+
+
+class AdminInvalidationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="a@example.com", username="alice", password="password123")
+        self.client.force_login(User.objects.create_superuser(email="root@example.com", username="root", password="x"))
+        start = datetime(2025, 3, 10, 9, tzinfo=dt_timezone.utc)
+        self.todo = Todo.objects.create(user=self.user, title="t", start_time=start, end_time=start + timedelta(hours=1))
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def day_etag(self, day="2025-03-10"):
+        response = self.client.get("/api/Diary_todo/get_all_todos/", {"date": day}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def assertChanged(self, etag, day="2025-03-10"):
+        response = self.client.get(
+            "/api/Diary_todo/get_all_todos/", {"date": day}, HTTP_IF_NONE_MATCH=etag, **self.auth,
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_status_action_invalidates_the_day(self):
+        etag = self.day_etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/admin/Diary_todo/todo/", {"action": "mark_completed", "_selected_action": [self.todo.pk]})
+        self.assertChanged(etag)
+
+    def test_change_form_invalidates_old_and_new_day(self):
+        old, new = self.day_etag(), self.day_etag("2025-03-11")
+        self.client.post(f"/admin/Diary_todo/todo/{self.todo.pk}/change/", {
+            "user": self.user.pk, "title": "moved", "description": "", "status": "not_started",
+            "start_time_0": "2025-03-11", "start_time_1": "09:00:00",
+            "end_time_0": "2025-03-11", "end_time_1": "10:00:00",
+        })
+        self.todo.refresh_from_db()
+        self.assertEqual(self.todo.title, "moved")
+        self.assertChanged(old)
+        self.assertChanged(new, "2025-03-11")
+
+    def test_delete_invalidates_the_day(self):
+        etag = self.day_etag()
+        self.client.post(f"/admin/Diary_todo/todo/{self.todo.pk}/delete/", {"post": "yes"})
+        self.assertFalse(Todo.objects.filter(pk=self.todo.pk).exists())
+        self.assertChanged(etag)
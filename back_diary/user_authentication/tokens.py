@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+class ValidatedTokenCache:
+    """
+    Small thread-safe LRU of access tokens whose signature was already checked,
+    mapped to their ``exp`` claim. Keyed by the raw token, so a forged token
+    reusing a known ``jti`` never matches an entry.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_valid(self, raw_token, now):
+        with self._lock:
+            exp = self._entries.get(raw_token)
+            if exp is None:
+                return False
+            if exp <= now:
+                del self._entries[raw_token]
+                return False
+            self._entries.move_to_end(raw_token)
+            return True
+
+    def add(self, raw_token, exp):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[raw_token] = exp
+            self._entries.move_to_end(raw_token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+validated_tokens = ValidatedTokenCache(getattr(settings, "VERIFY_TOKEN_CACHE_SIZE", 1024))
+
+
+def verify_access_token(raw_token):
+    """
+    Check an access token's signature, expiry and type without touching the
+    database. Returns ``None`` when valid, otherwise the error message.
+    """
+    if validated_tokens.is_valid(raw_token, time.time()):
+        return None
+    try:
+        token = AccessToken(raw_token)
+    except TokenError as e:
+        return str(e)
+    validated_tokens.add(raw_token, token["exp"])
+    return None
+
+
+def raw_token_from_header(request):
+    """The token from an ``Authorization: Bearer <token>`` header, or ``None``."""
+    header_type, _, raw_token = request.headers.get("Authorization", "").partition(" ")
+    if header_type not in api_settings.AUTH_HEADER_TYPES or not raw_token.strip():
+        return None
+    return raw_token.strip()
+
+
+async def aauthenticate(request, allow_query_token=False):
+    """
+    Async counterpart of DRF's ``JWTAuthentication`` for plain async views.
+    Returns ``(user, None)`` or ``(None, error message)``.
+
+    ``allow_query_token`` also accepts ``?access_token=``, for clients such as
+    ``EventSource`` that cannot set headers.
+    """
+    raw_token = raw_token_from_header(request)
+    if raw_token is None and allow_query_token:
+        raw_token = request.GET.get("access_token") or None
+    if raw_token is None:
+        return None, "Authentication credentials were not provided."
+    try:
+        token = AccessToken(raw_token)
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None, "Given token not valid for any token type"
+    try:
+        user = await get_user_model().objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+    except get_user_model().DoesNotExist:
+        return None, "User not found"
+    if not user.is_active:
+        return None, "User is inactive"
+    return user, None
@@ -1,21 +1,54 @@
+from zoneinfo import available_timezones
+from django.conf import settings as django_settings
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_GET
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework import status
+from my_day.compression import compress_exempt
 from .models import User
 from .serializer import UserSerializer
+from Diary_todo.cache import invalidate_user
+from Diary_todo.stats import rebuild_user
+from Diary_todo.utils import resync_todo_days
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.decorators import authentication_classes
+from .tokens import raw_token_from_header, verify_access_token
 
 @api_view(["GET"])
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAuthenticated])
-def verify_token(request):
+def verify_token_with_user(request):
     return Response({"valid": True})
 
+
+@compress_exempt
+@require_GET
+def verify_token(request):
+    """
+    Called by the frontend middleware on every navigation. Unless
+    VERIFY_TOKEN_STATELESS is off, only the signature and expiry are checked,
+    so there is no DRF dispatch and no User lookup per page view.
+    """
+    if not getattr(django_settings, "VERIFY_TOKEN_STATELESS", True):
+        return verify_token_with_user(request)
+
+    raw_token = raw_token_from_header(request)
+    if raw_token is None:
+        error = "Authentication credentials were not provided."
+    else:
+        error = verify_access_token(raw_token)
+    if error:
+        response = JsonResponse({"detail": error, "code": "token_not_valid"}, status=status.HTTP_401_UNAUTHORIZED)
+        response["WWW-Authenticate"] = 'Bearer realm="api"'
+        return response
+    return JsonResponse({"valid": True})
+
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def register(request):
@@ -29,24 +62,20 @@ def register(request):
             {"error": "Email, username, and password are required."},
             status=status.HTTP_400_BAD_REQUEST
         )
-    email = request.data.get("email")
-    username = request.data.get("username")
-    if User.objects.filter(email=email).exists():
-       return Response(
-           {"error": "Email is already in use."},
-           status=status.HTTP_400_BAD_REQUEST
-       )
-    elif User.objects.filter(username=username).exists():
-       return Response(
-           {"error": "Username is already in use."},
-           status=status.HTTP_400_BAD_REQUEST
-       )
     serializer = UserSerializer(data=request.data)
-    if serializer.is_valid():
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        with transaction.atomic():
+            serializer.save()
+    except IntegrityError:
+        # Only a failed insert pays for finding out which field was taken.
+        if User.objects.filter(email=serializer.validated_data["email"]).exists():
+            error = "Email is already in use."
+        else:
+            error = "Username is already in use."
+        return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 @api_view(["GET"])
 @authentication_classes([JWTAuthentication])  # ✅ Add JWT authentication
@@ -78,6 +107,7 @@ def settings(request):
     username = request.data.get("username")
     new_password = request.data.get("new_password")
     two_fa = request.data.get("two_fa")
+    user_timezone = request.data.get("timezone")
     current_password = request.data.get("current_password")
     
 
@@ -102,8 +132,21 @@ def settings(request):
 
     if two_fa is not None: 
         user.two_fa = two_fa
+
+    if user_timezone:
+        if user_timezone not in available_timezones():
+            return Response(
+                {"error": "Unknown timezone."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        timezone_changed = user_timezone != user.timezone
+        user.timezone = user_timezone
     
     user.save()
+    if user_timezone and timezone_changed:
+        resync_todo_days(user)
+        rebuild_user(user.id)
+        invalidate_user(user.id)
     return Response({"message": "Settings updated successfully."})
 
 
@@ -4,16 +4,34 @@ import apiServer from "@/lib/api-server"
 export async function getAllTodos(date?: string) {
    console.log("Fetching todos for date:", date)
    try {
-      const res = await apiServer.get("/Diary_todo/get_all_todos/", {
+      // The list is paged; follow `next` until the last page.
+      let res = await apiServer.get("/Diary_todo/get_all_todos/", {
          params: { date },
       })
-      return res.data
+      const todos = [...res.data.results]
+      while (res.data.next) {
+         res = await apiServer.get(res.data.next)
+         todos.push(...res.data.results)
+      }
+      return todos
    } catch (error: any) {
       console.error("Error fetching todos:", error.response?.data || error.message)
       throw error
    }
 }
 
+export async function getTodosRange(start: string, end: string) {
+   try {
+      const res = await apiServer.get("/Diary_todo/get_todos_range/", {
+         params: { start, end },
+      })
+      return res.data
+   } catch (error: any) {
+      console.error("Error fetching todos range:", error.response?.data || error.message)
+      throw error
+   }
+}
+
 export async function deleteTodo(id: number) {
    console.log("Deleting todo:", id)
    try {